@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the two-tier detector cascade against full-frame detection.
+
+Runs the expensive detector on every image of a local sample as the
+baseline, then the cascade, and reports time per frame, frames the
+cascade skipped and the recall the cascade loses. If a labels file is
+given, recall against the labelled boxes is reported for both.
+
+The labels file is JSON mapping image file names to lists of boxes:
+    {"frame_0001.jpg": [{"x": 10, "y": 20, "w": 64, "h": 64}], ...}
+
+Usage:
+    python benchmark_cascade.py SAMPLE_DIR [--labels labels.json]
+        [--detector retinaface] [--cascade-detector opencv]
+        [--cascade-mode frame|regions] [--cascade-threshold 0.3]
+        [--region-padding 0.5]
+"""
+
+import os
+import json
+import time
+import argparse
+
+from src.utils.face_tracker import box_iou
+from src.utils.recognition_utils import (
+    IMAGE_EXTS,
+    detect_faces_for_embedding,
+    detect_faces_cascade,
+    screen_for_faces,
+)
+
+# Minimum overlap for a detection to count as finding a face
+MATCH_IOU = 0.5
+
+
+def count_found(expected, detected):
+    """Count expected boxes overlapped by a detected box."""
+    return sum(
+        1 for box in expected
+        if any(box_iou(box, found) >= MATCH_IOU for found in detected)
+    )
+
+
+def run(images, detect):
+    """Run a detector over every image, returning per-image boxes and the total time."""
+    boxes = {}
+    started = time.perf_counter()
+    for path in images:
+        boxes[path] = [face["facial_area"] for face in detect(path)]
+    return boxes, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir")
+    parser.add_argument("--labels")
+    parser.add_argument("--detector", default="retinaface")
+    parser.add_argument("--cascade-detector", default="opencv")
+    parser.add_argument("--cascade-mode", default="frame", choices=["frame", "regions"])
+    parser.add_argument("--cascade-threshold", type=float, default=0.3)
+    parser.add_argument("--region-padding", type=float, default=0.5)
+    parser.add_argument("--confidence-threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.sample_dir, name) for name in os.listdir(args.sample_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTS
+    )
+    if not images:
+        print(f"No images found in {args.sample_dir}")
+        return
+
+    detection_options = {
+        "detector_backend": args.detector,
+        "enforce_detection": False,
+        "align": True,
+        "confidence_threshold": args.confidence_threshold,
+    }
+
+    # Warm both detectors up so model loading is not timed
+    detect_faces_for_embedding(images[0], **detection_options)
+    screen_for_faces(images[0], args.cascade_detector, args.cascade_threshold)
+
+    print(f"Baseline: {args.detector} on {len(images)} frames...")
+    baseline, baseline_time = run(images, lambda path: detect_faces_for_embedding(path, **detection_options))
+
+    print(f"Cascade: {args.cascade_detector} -> {args.detector} ({args.cascade_mode})...")
+    skipped = sum(1 for path in images if not screen_for_faces(path, args.cascade_detector, args.cascade_threshold)[0])
+    cascade, cascade_time = run(images, lambda path: detect_faces_cascade(
+        path,
+        cascade_detector=args.cascade_detector,
+        cascade_mode=args.cascade_mode,
+        cascade_confidence_threshold=args.cascade_threshold,
+        cascade_region_padding=args.region_padding,
+        **detection_options,
+    ))
+
+    baseline_faces = sum(len(boxes) for boxes in baseline.values())
+    cascade_faces = sum(len(boxes) for boxes in cascade.values())
+    kept = sum(count_found(baseline[path], cascade[path]) for path in images)
+
+    print()
+    print(f"Frames:                 {len(images)}")
+    print(f"Frames skipped:         {skipped} ({skipped / len(images):.1%})")
+    print(f"Baseline faces:         {baseline_faces}")
+    print(f"Cascade faces:          {cascade_faces}")
+    print(f"Baseline ms/frame:      {baseline_time / len(images) * 1000:.1f}")
+    print(f"Cascade ms/frame:       {cascade_time / len(images) * 1000:.1f}")
+    print(f"Speedup:                {baseline_time / cascade_time if cascade_time else float('inf'):.2f}x")
+    if baseline_faces:
+        print(f"Recall vs baseline:     {kept / baseline_faces:.1%} ({baseline_faces - kept} faces lost)")
+
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+        labelled = {path: labels.get(os.path.basename(path), []) for path in images}
+        total = sum(len(boxes) for boxes in labelled.values())
+        if total:
+            baseline_found = sum(count_found(labelled[path], baseline[path]) for path in images)
+            cascade_found = sum(count_found(labelled[path], cascade[path]) for path in images)
+            print(f"Labelled faces:         {total}")
+            print(f"Baseline recall:        {baseline_found / total:.1%}")
+            print(f"Cascade recall:         {cascade_found / total:.1%}")
+
+
+if __name__ == "__main__":
+    main()
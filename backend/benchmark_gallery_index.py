@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark approximate gallery search against exact search.
+
+Builds a synthetic consent gallery of PROFILES people with POSES
+embeddings each, plus detections that are noisy views of gallery people
+and of strangers, then matches the detections exhaustively and through
+the IVF index for each probe count. Reports time per detection, recall of
+the exact nearest face, and how many match decisions change at the
+threshold.
+
+Usage:
+    python benchmark_gallery_index.py [--profiles 3000] [--poses 4]
+        [--detections 20000] [--dimensions 512] [--metric euclidean_l2]
+        [--threshold 1.04] [--probes 1,4,8,16,32] [--top-k 10]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from src.utils.face_matcher import ConsentGallery
+
+
+def synthetic_gallery(profiles, poses, dimensions, rng):
+    """Random identities, each seen in several poses around its centre."""
+    centres = rng.normal(size=(profiles, dimensions)).astype(np.float32)
+    embeddings = np.repeat(centres, poses, axis=0) + 0.35 * rng.normal(size=(profiles * poses, dimensions))
+    face_ids = [f"face-{i}" for i in range(profiles * poses)]
+    profile_ids = [f"profile-{i // poses}" for i in range(profiles * poses)]
+    return centres, ConsentGallery(embeddings.astype(np.float32), face_ids, profile_ids)
+
+
+def synthetic_detections(centres, count, rng):
+    """Two thirds views of consented people, one third strangers."""
+    known = centres[rng.integers(0, len(centres), size=count - count // 3)]
+    known = known + 0.45 * rng.normal(size=known.shape)
+    strangers = rng.normal(size=(count // 3, centres.shape[1]))
+    return np.concatenate([known, strangers]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=3000)
+    parser.add_argument("--poses", type=int, default=4)
+    parser.add_argument("--detections", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--metric", default="euclidean_l2", choices=["cosine", "euclidean", "euclidean_l2"])
+    parser.add_argument("--threshold", type=float, default=1.04)
+    parser.add_argument("--probes", default="1,4,8,16,32")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centres, gallery = synthetic_gallery(args.profiles, args.poses, args.dimensions, rng)
+    detections = synthetic_detections(centres, args.detections, rng)
+    print(f"Gallery: {gallery.size} faces of {args.profiles} profiles, {args.detections} detections, {args.metric}")
+
+    started = time.perf_counter()
+    exact_rows, exact_distances, _ = gallery.nearest(detections, args.metric, ann_min_size=0)
+    exact_time = time.perf_counter() - started
+    exact_matched = exact_distances <= args.threshold
+    print(f"Exact:          {exact_time / len(detections) * 1e6:8.1f} us/detection, "
+          f"{int(exact_matched.sum())} matched")
+
+    started = time.perf_counter()
+    gallery.get_index()
+    print(f"Index build:    {time.perf_counter() - started:8.2f} s")
+
+    # Strangers have no meaningful nearest face, so recall is also reported over exact matches only
+    print(f"{'probes':>6}  {'us/detection':>12}  {'speedup':>7}  {'recall@1':>8}  {'matched recall@1':>16}  "
+          f"{'decisions changed':>17}")
+    for n_probe in [int(value) for value in args.probes.split(",")]:
+        started = time.perf_counter()
+        rows, distances, _ = gallery.nearest(
+            detections, args.metric, ann_min_size=1, n_probe=n_probe, top_k=args.top_k
+        )
+        elapsed = time.perf_counter() - started
+        found = rows == exact_rows
+        recall = float(np.mean(found))
+        matched_recall = float(np.mean(found[exact_matched])) if exact_matched.any() else 1.0
+        changed = int(np.sum((distances <= args.threshold) != exact_matched))
+        print(f"{n_probe:>6}  {elapsed / len(detections) * 1e6:>12.1f}  {exact_time / elapsed:>6.2f}x  "
+              f"{recall:>8.2%}  {matched_recall:>16.2%}  {changed:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Check that the ONNX recognition model agrees with TensorFlow.
+
+Detects faces in a local sample of images, embeds them with both engines
+and reports the cosine similarity between the two embeddings of each
+face, for the float model and, with --quantized, the int8 model.
+
+Usage:
+    python check_onnx_parity.py SAMPLE_DIR [--model Facenet512]
+        [--detector retinaface] [--quantized] [--min-cosine 0.99]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from src.utils import onnx_engine
+from src.utils.recognition_utils import IMAGE_EXTS, detect_faces_for_embedding
+
+# Faces are embedded in batches of this size, as in processing
+BATCH_SIZE = 32
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir")
+    parser.add_argument("--model", default="Facenet512")
+    parser.add_argument("--detector", default="retinaface")
+    parser.add_argument("--normalization", default="base")
+    parser.add_argument("--quantized", action="store_true")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    from deepface.modules import modeling, preprocessing
+
+    # Preprocess for the TensorFlow model's input size, which the ONNX export shares
+    target_size = modeling.build_model(task="facial_recognition", model_name=args.model).input_shape
+
+    faces = []
+    for name in sorted(os.listdir(args.sample_dir)):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTS:
+            continue
+        for face in detect_faces_for_embedding(os.path.join(args.sample_dir, name), detector_backend=args.detector):
+            img = preprocessing.resize_image(img=face["face"][:, :, ::-1], target_size=(target_size[1], target_size[0]))
+            faces.append(preprocessing.normalize_input(img=img, normalization=args.normalization))
+    if not faces:
+        print(f"No faces found in {args.sample_dir}")
+        return 1
+
+    reports = [
+        onnx_engine.parity_report(np.concatenate(faces[i:i + BATCH_SIZE]), args.model, quantized=args.quantized)
+        for i in range(0, len(faces), BATCH_SIZE)
+    ]
+    total = sum(report["faces"] for report in reports)
+    summary = {
+        "model_name": args.model,
+        "quantized": args.quantized,
+        "faces": total,
+        "cosine_min": min(report["cosine_min"] for report in reports),
+        "cosine_mean": sum(report["cosine_mean"] * report["faces"] for report in reports) / total,
+        "max_abs_diff": max(report["max_abs_diff"] for report in reports),
+    }
+    print(json.dumps(summary, indent=2))
+
+    if summary["cosine_min"] < args.min_cosine:
+        print(f"FAIL: lowest cosine agreement {summary['cosine_min']:.4f} is below {args.min_cosine}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, Any, Optional
+
+from src.services.match_preview import match_preview_service
+from src.utils.face_matcher import DISTANCE_METRICS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api",
+    tags=["match-preview"],
+)
+
+@router.get("/cards/{card_id}/match-preview")
+async def get_match_preview(
+    card_id: str,
+    threshold: Optional[float] = Query(None, description="Threshold to preview, the card's threshold by default"),
+    distance_metric: Optional[str] = Query(None, description="cosine, euclidean or euclidean_l2, the card's metric by default"),
+    borderline: int = Query(5, ge=0, le=100, description="Examples to return on each side of the threshold"),
+    refresh: bool = Query(False, description="Reload the card's detections, e.g. after it was processed again")
+) -> Dict[str, Any]:
+    """
+    Preview how many of a card's faces would match at another threshold or
+    distance metric, without re-running anything.
+
+    The first request loads the card's stored embeddings and computes each
+    detection's best distance under the card's metric, and the first
+    request for another metric does the same for it; later requests only
+    search the cached sorted distances.
+
+    Returns:
+        Matched and unmatched face counts, per clip counts, and the
+        detections closest to the threshold on either side
+    """
+    if distance_metric is not None and distance_metric not in DISTANCE_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unsupported distance metric: {distance_metric}")
+
+    try:
+        preview = await match_preview_service.get_preview(card_id, refresh=refresh)
+        if preview is None:
+            raise HTTPException(status_code=404, detail=f"Configuration not found for card {card_id}")
+
+        result = await asyncio.to_thread(preview.query, distance_metric, threshold, borderline)
+        result["card_id"] = card_id
+        result["built_at"] = preview.created_at
+        return result
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.exception(f"Error previewing matches for card {card_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error previewing matches: {str(e)}")
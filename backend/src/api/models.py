@@ -0,0 +1,33 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+
+from src.services.inference_pool import inference_pool
+from src.services.model_registry import model_registry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api",
+    tags=["models"],
+)
+
+@router.get("/models")
+async def get_models() -> Dict[str, Any]:
+    """
+    Report which models are loaded, how long they took to load and warm
+    up, and roughly how much memory they use, per process.
+
+    Returns:
+        The API process' registry and one registry snapshot per inference worker
+    """
+    try:
+        return {
+            "inference_workers": inference_pool.max_workers,
+            "api_process": model_registry.stats(),
+            "workers": inference_pool.model_stats(),
+        }
+    except Exception as e:
+        logger.exception(f"Error reading model residency: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading model residency: {str(e)}")
@@ -11,6 +11,8 @@ from src.schemas.processing import (
     StartProcessingResponse,
     StopProcessingRequest,
     StopProcessingResponse,
+    RematchFacesRequest,
+    RematchFacesResponse,
     ProcessingTaskDB # Import the correct model name
 )
 from src.services.graphql_client import GraphQLClient
@@ -79,6 +81,7 @@ async def start_processing(
         # Ensure default values if somehow missing (should be set by DB trigger)
         config.setdefault("scene_sensitivity", 0.2)
         config.setdefault("fallback_frame_rate", 6)
+        config.setdefault("sampling_mode", "scene")
         config.setdefault("use_eq", True)
 
         # 3. Get counts of work at all levels
@@ -201,6 +204,94 @@ async def stop_processing(request: StopProcessingRequest):
         logger.exception(f"Error stopping processing task {task_id_str}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+@router.post("/rematch-faces", response_model=RematchFacesResponse)
+async def rematch_faces(
+    request: RematchFacesRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Re-match the processed cards of a project after consent faces were added
+    or changed, e.g. when a late consent form arrives. Only the stored face
+    embeddings are compared again; nothing is extracted or detected.
+
+    Args:
+        request: The project, and the consent faces that changed or the time since which they changed.
+            Without either, the consent faces that have no embedding yet are used
+        background_tasks: FastAPI background tasks dependency
+
+    Returns:
+        Response with one task ID per re-matched card
+    """
+    graphql_client = GraphQLClient()
+    project_id = str(request.project_id)
+    logger.info(f"Received request to re-match faces for project: {project_id}")
+    card_tasks = []
+
+    try:
+        consent_face_ids = await processing_service.get_changed_consent_faces(
+            project_id,
+            [str(face_id) for face_id in request.consent_face_ids or []],
+            request.since
+        )
+        if not consent_face_ids:
+            return RematchFacesResponse(
+                status="no_work",
+                message=f"No new or changed consent faces for project {project_id}"
+            )
+
+        # Cards still being processed will match against the new consent faces anyway
+        card_configs = []
+        for card_id in await processing_service.get_project_cards(project_id, "complete"):
+            if await graphql_client.get_active_db_task_for_card(card_id):
+                continue
+            config = await processing_service.get_card_config(card_id)
+            if not config:
+                logger.warning(f"Configuration not found for card {card_id}, skipping re-match")
+                continue
+            if request.config:
+                config.update(request.config)
+            card_configs.append((card_id, config))
+
+        if not card_configs:
+            return RematchFacesResponse(
+                status="no_work",
+                message=f"No processed cards to re-match in project {project_id}",
+                consent_faces_count=len(consent_face_ids)
+            )
+
+        for card_id, config in card_configs:
+            task_id = await graphql_client.create_db_task(card_id)
+            if not task_id:
+                raise RuntimeError(f"Failed to create processing task record for card {card_id}")
+            card_tasks.append({"task_id": task_id, "card_id": card_id, "config": config})
+
+        background_tasks.add_task(
+            processing_service.rematch_project,
+            project_id=project_id,
+            consent_face_ids=consent_face_ids,
+            card_tasks=card_tasks
+        )
+
+        logger.info(f"Scheduled re-match of {len(card_tasks)} cards against {len(consent_face_ids)} consent faces")
+        return RematchFacesResponse(
+            status="pending",
+            message=f"Re-matching {len(card_tasks)} cards against {len(consent_face_ids)} new or changed consent faces",
+            task_ids=[card_task["task_id"] for card_task in card_tasks],
+            consent_faces_count=len(consent_face_ids)
+        )
+
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.exception(f"Error starting re-match for project {project_id}: {e}")
+        # Tasks created before the failure would otherwise stay pending and block their cards
+        for card_task in card_tasks:
+            try:
+                await graphql_client.update_db_task(card_task["task_id"], status="error", message=f"Failed to start: {e}")
+            except Exception as update_err:
+                logger.error(f"Failed to update task {card_task['task_id']} to error status: {update_err}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
 @router.get("/processing-tasks", response_model=List[ProcessingTaskDB])
 async def get_processing_tasks():
     """
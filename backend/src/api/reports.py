@@ -49,11 +49,13 @@ query GetReportData($cardId: uuid!) {
       frames(order_by: {timestamp: asc}) {
         frame_id
         timestamp
+        duplicate_of_frame_id
         raw_frame_image_path
         processed_frame_image_path
         detected_faces {
           detection_id
           facial_area # {x, y, w, h}
+          status
           face_matches {
             match_id # Presence indicates a match
           }
@@ -193,23 +195,32 @@ def process_report_data(data: dict) -> tuple:
     for clip in card_data.get("clips", []):
         total_frames_in_clip = len(clip.get("frames", []))
         unmatched_frames_count = 0
+        low_quality_faces_count = 0
         clip_unmatched_faces = []
         logger.debug(f"Processing clip: {clip.get('filename')}, Frames: {total_frames_in_clip}")
 
+        # Near-duplicate frames were skipped during detection, they share their representative's faces
+        frames_by_id = {frame.get("frame_id"): frame for frame in clip.get("frames", [])}
+
         for frame in clip.get("frames", []):
             frame_has_unmatched = False
-            detected_faces = frame.get("detected_faces", [])
+            source_frame = frames_by_id.get(frame.get("duplicate_of_frame_id")) or frame
+            detected_faces = source_frame.get("detected_faces", [])
             if not detected_faces:
                 continue # Skip frames with no detected faces
 
             for face in detected_faces:
+                # Faces too small, blurred or turned away to match are counted, not listed
+                if face.get("status") == "low_quality":
+                    low_quality_faces_count += 1
+                    continue
                 # Check if face_matches array exists and has length > 0
                 is_matched = isinstance(face.get("face_matches"), list) and len(face["face_matches"]) > 0
                 if not is_matched:
                     frame_has_unmatched = True
                     any_unmatched_found = True
                     # Prioritize processed path if available
-                    image_path = frame.get("processed_frame_image_path") or frame.get("raw_frame_image_path")
+                    image_path = source_frame.get("processed_frame_image_path") or source_frame.get("raw_frame_image_path")
                     facial_area = face.get("facial_area")
 
                     if image_path and facial_area:
@@ -237,6 +248,7 @@ def process_report_data(data: dict) -> tuple:
             "total_frames": total_frames_in_clip,
             "unmatched_frames_count": unmatched_frames_count,
             "safe_frames_count": safe_frames_count,
+            "low_quality_faces_count": low_quality_faces_count,
         })
 
         if clip_unmatched_faces:
@@ -17,6 +17,24 @@ ENV: Dict[str, str] = {
     "AWS_SECRET_ACCESS_KEY": os.getenv("AWS_SECRET_ACCESS_KEY", ""),
     "AWS_REGION": os.getenv("AWS_REGION", "us-east-1"),
     "AWS_BUCKET_NAME": os.getenv("AWS_BUCKET_NAME", "chwarel-sandbox"),
+
+    # Processing settings
+    "MAX_FFMPEG_PROCESSES": os.getenv("MAX_FFMPEG_PROCESSES", str(os.cpu_count() or 1)),
+    "EXTRACTION_CACHE_DIR": os.getenv("EXTRACTION_CACHE_DIR", "outputs/extraction_cache"),
+    # Size budget of the extraction cache; 0 (the default) disables it
+    "EXTRACTION_CACHE_MAX_GB": os.getenv("EXTRACTION_CACHE_MAX_GB", "0"),
+    "INFERENCE_WORKERS": os.getenv("INFERENCE_WORKERS", ""),
+    # "tensorflow" or "onnx"; ONNX needs the onnx extra (poetry install -E onnx)
+    "INFERENCE_ENGINE": os.getenv("INFERENCE_ENGINE", "tensorflow"),
+    "ONNX_QUANTIZE": os.getenv("ONNX_QUANTIZE", "false"),
+    "ONNX_MODEL_DIR": os.getenv("ONNX_MODEL_DIR", "outputs/onnx_models"),
+    # Models loaded into the inference workers at startup; an empty model name disables preloading
+    "PRELOAD_MODEL_NAME": os.getenv("PRELOAD_MODEL_NAME", "Facenet512"),
+    "PRELOAD_DETECTOR_BACKEND": os.getenv("PRELOAD_DETECTOR_BACKEND", "retinaface"),
+    "MODEL_MEMORY_BUDGET_MB": os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"),
+    # Memory-mapped consent gallery snapshots, re-checked against the database at most this often
+    "GALLERY_SNAPSHOT_DIR": os.getenv("GALLERY_SNAPSHOT_DIR", "outputs/gallery_snapshots"),
+    "GALLERY_REFRESH_SECONDS": os.getenv("GALLERY_REFRESH_SECONDS", "60"),
 }
 
 # Validate required environment variables
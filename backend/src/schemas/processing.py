@@ -33,4 +33,18 @@ class ProcessingTaskDB(BaseModel):
     progress: float = Field(0.0, description="Progress percentage (0.0 to 1.0)")
     message: Optional[str] = Field(None, description="Current status message or error")
     created_at: datetime = Field(..., description="Timestamp when the task was created")
-    updated_at: datetime = Field(..., description="Timestamp when the task was last updated") 
\ No newline at end of file
+    updated_at: datetime = Field(..., description="Timestamp when the task was last updated") 
+
+class RematchFacesRequest(BaseModel):
+    """Request model for re-matching a project's processed cards against new or changed consent faces"""
+    project_id: UUID = Field(..., description="ID of the project whose consent faces changed")
+    consent_face_ids: Optional[List[UUID]] = Field(None, description="Consent faces that were added or changed")
+    since: Optional[datetime] = Field(None, description="Use the consent faces updated since this time instead")
+    config: Optional[Dict[str, Any]] = Field(None, description="Optional configuration overrides")
+
+class RematchFacesResponse(BaseModel):
+    """Response model for the re-match operation"""
+    status: str = Field(..., description="Status of the operation")
+    message: str = Field(..., description="Description of the result")
+    task_ids: List[str] = Field(default_factory=list, description="One task per re-matched card")
+    consent_faces_count: int = Field(0, description="Number of new or changed consent faces compared")
@@ -21,7 +21,11 @@ from src.api import scan_watch_folder  # Import the new scan_watch_folder router
 from src.api import watch_folder_monitor  # Import the new watch folder monitoring API
 from src.api import processing # Import processing API
 from src.api import reports # Import the new reports router
+from src.api import models # Import the model residency API
+from src.api import match_preview # Import the threshold what-if preview API
 from src.services.watch_folder_monitor import cleanup_monitors  # Import the cleanup function for watch folders
+from src.services.inference_pool import inference_pool
+from src.config import ENV
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +54,16 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to create output directories: {str(e)}")
 
+    # Load and warm up the default models in the background so the first card does not wait for them
+    if ENV["PRELOAD_MODEL_NAME"]:
+        app.state.preload_task = asyncio.create_task(preload_models())
+
+async def preload_models():
+    try:
+        await inference_pool.start(ENV["PRELOAD_MODEL_NAME"], ENV["PRELOAD_DETECTOR_BACKEND"] or None)
+    except Exception as e:
+        logger.exception(f"Failed to preload models: {str(e)}")
+
 # Register a shutdown event to cleanup resources, especially active monitors
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -58,6 +72,9 @@ async def shutdown_event():
         await cleanup_monitors() # Keep watch folder cleanup
         logger.info("Cleaned up watch folder monitors")
 
+        inference_pool.shutdown()
+        logger.info("Stopped inference workers")
+
     except Exception as e:
         logger.exception(f"Error during cleanup: {str(e)}")
 
@@ -77,6 +94,8 @@ app.include_router(scan_watch_folder.router)
 app.include_router(watch_folder_monitor.router)
 app.include_router(processing.router)
 app.include_router(reports.router)
+app.include_router(models.router)
+app.include_router(match_preview.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple, Set
+
+import numpy as np
+
+from src.services.inference_pool import inference_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Collects preprocessed face crops from concurrently processed frames and
+    embeds them in batches, one forward pass per batch.
+
+    A batch is sent as soon as it holds batch_size faces, or max_wait
+    seconds after its first face arrived, whichever comes first.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32, max_wait: float = 0.05):
+        """
+        Initialize the batcher.
+
+        Args:
+            model_name: Face recognition model the faces were preprocessed for
+            batch_size: Maximum number of faces per forward pass
+            max_wait: Seconds a face may wait for its batch to fill
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def embed(self, faces: List[np.ndarray]) -> List[List[float]]:
+        """
+        Embed faces, sharing forward passes with faces from other frames.
+
+        Args:
+            faces: Preprocessed face crops of shape (1, h, w, 3)
+
+        Returns:
+            One embedding per face, in order
+        """
+        if not faces:
+            return []
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for face in faces:
+            future = loop.create_future()
+            self._pending.append((face, future))
+            futures.append(future)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self) -> None:
+        """Send the oldest pending faces, up to batch_size, as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending[:self.batch_size]
+        self._pending = self._pending[self.batch_size:]
+        if batch:
+            task = asyncio.create_task(self._embed_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _embed_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """
+        Run one batch through the recognition model and fan the embeddings
+        back out to the waiting frames.
+
+        Args:
+            batch: Pending faces and the futures waiting for their embeddings
+        """
+        try:
+            embeddings = await inference_pool.embed_faces(
+                np.concatenate([face for face, _ in batch]),
+                self.model_name
+            )
+            logger.debug(f"Embedded a batch of {len(batch)} faces")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
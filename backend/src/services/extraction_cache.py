@@ -0,0 +1,238 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+
+from src.config import ENV
+from src.utils.datetime_utils import format_for_database
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bytes hashed from each end of a clip when fingerprinting it
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted frames.
+
+    Entries are keyed by a fingerprint of the clip file and the settings
+    that affect which frames FFmpeg selects and how they look, so the same
+    footage re-processed on any card reuses the frames of the first run.
+    Frames are hard linked between the cache and each clip's output
+    directory where the filesystem allows, and copied otherwise. Entries
+    are evicted least recently used first once the cache outgrows its size
+    budget.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        """
+        Initialize the extraction cache.
+
+        Args:
+            root: Directory the cache entries are stored in
+            max_bytes: Size budget of the cache, 0 disables caching
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def fingerprint(self, clip_path: str) -> Dict[str, Any]:
+        """
+        Cheaply fingerprint a clip without reading all of it.
+
+        Args:
+            clip_path: Path to the video clip
+
+        Returns:
+            Dictionary with the size, mtime and a hash of the head and tail of the file
+        """
+        stat = os.stat(clip_path)
+        digest = hashlib.sha256()
+        with open(clip_path, "rb") as f:
+            digest.update(f.read(FINGERPRINT_CHUNK_SIZE))
+            if stat.st_size > FINGERPRINT_CHUNK_SIZE:
+                f.seek(max(FINGERPRINT_CHUNK_SIZE, stat.st_size - FINGERPRINT_CHUNK_SIZE))
+                digest.update(f.read(FINGERPRINT_CHUNK_SIZE))
+
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "head_tail_sha256": digest.hexdigest(),
+        }
+
+    def key_for(self, clip_path: str, settings: Dict[str, Any]) -> str:
+        """
+        Compute the cache key of a clip extracted with the given settings.
+
+        Args:
+            clip_path: Path to the video clip
+            settings: Extraction settings that affect the extracted frames
+
+        Returns:
+            Hex digest identifying the cache entry
+        """
+        payload = {"clip": self.fingerprint(clip_path), "settings": settings}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def restore(self, key: str, output_dir: Path) -> Optional[List[Dict[str, Any]]]:
+        """
+        Materialize a cached extraction into a clip's output directory.
+
+        Args:
+            key: Cache key from key_for
+            output_dir: Directory the clip's frames are written to
+
+        Returns:
+            Frame data in the format produced by FrameExtractor, or None on a cache miss
+        """
+        entry_dir = self.root / key
+        manifest_path = entry_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return None
+
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+            frame_data = []
+            for frame in manifest["frames"]:
+                target = output_dir / frame["file"]
+                self._link(entry_dir / frame["file"], target)
+                proxy_source = entry_dir / "proxy" / frame["file"]
+                if proxy_source.exists():
+                    self._link(proxy_source, output_dir / "proxy" / frame["file"])
+                frame_data.append({
+                    "timestamp": frame["timestamp"],
+                    "path": target,
+                    "selection_reason": frame["selection_reason"],
+                })
+        except Exception as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {key}: {str(e)}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        # The manifest's mtime records when the entry was last used
+        manifest_path.touch()
+        logger.info(f"Extraction cache hit {key}: restored {len(frame_data)} frames")
+        return frame_data
+
+    def store(self, key: str, frame_data: List[Dict[str, Any]], settings: Dict[str, Any]) -> None:
+        """
+        Add an extraction to the cache and evict old entries if the cache is over budget.
+
+        Args:
+            key: Cache key from key_for
+            frame_data: Frame data in the format produced by FrameExtractor, ordered by timestamp
+            settings: Extraction settings recorded in the manifest
+        """
+        entry_dir = self.root / key
+        if (entry_dir / MANIFEST_NAME).exists():
+            return
+
+        # Build the entry next to its final location so concurrent stores never see a partial entry
+        staging_dir = self.root / f".{key}.{uuid.uuid4().hex}"
+        try:
+            (staging_dir / "proxy").mkdir(parents=True)
+            frames = []
+            size_bytes = 0
+            for i, data in enumerate(frame_data):
+                name = f"frame_{i:06d}.png"
+                self._link(data["path"], staging_dir / name)
+                size_bytes += (staging_dir / name).stat().st_size
+                proxy_path = data["path"].parent / "proxy" / data["path"].name
+                if proxy_path.exists():
+                    self._link(proxy_path, staging_dir / "proxy" / name)
+                    size_bytes += proxy_path.stat().st_size
+                frames.append({
+                    "file": name,
+                    "timestamp": data["timestamp"],
+                    "selection_reason": data["selection_reason"],
+                })
+
+            manifest = {
+                "key": key,
+                "settings": settings,
+                "created_at": format_for_database(datetime.now(timezone.utc)),
+                "size_bytes": size_bytes,
+                "frames": frames,
+            }
+            with open(staging_dir / MANIFEST_NAME, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+            try:
+                staging_dir.rename(entry_dir)
+            except OSError:
+                # Another extraction of the same footage stored it first
+                return
+            logger.info(f"Stored {len(frames)} frames in extraction cache entry {key}")
+        except Exception as e:
+            logger.warning(f"Failed to store extraction cache entry {key}: {str(e)}")
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits its size budget.
+
+        Returns:
+            Number of entries removed
+        """
+        entries = []
+        for manifest_path in self.root.glob(f"*/{MANIFEST_NAME}"):
+            try:
+                with open(manifest_path) as f:
+                    size_bytes = json.load(f).get("size_bytes", 0)
+                entries.append((manifest_path.stat().st_mtime, size_bytes, manifest_path.parent))
+            except Exception:
+                continue
+
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size_bytes, entry_dir in sorted(entries, key=lambda entry: entry[0]):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= size_bytes
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} extraction cache entries, {total_bytes / 1024 ** 3:.2f} GB remain")
+        return removed
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> None:
+        """
+        Hard link a file, copying it instead across filesystems.
+
+        Args:
+            source: Existing file
+            target: Path to create, replaced if it exists
+        """
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            target.unlink()
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+# Global instance
+extraction_cache = ExtractionCache(
+    root=ENV["EXTRACTION_CACHE_DIR"],
+    max_bytes=int(float(ENV["EXTRACTION_CACHE_MAX_GB"]) * 1024 ** 3)
+)
@@ -1,19 +1,28 @@
 import logging
 import os
+import asyncio
 import uuid
 import cv2
 import numpy as np
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union, Tuple, Callable, Awaitable
 from pathlib import Path
 
-from deepface import DeepFace
-from deepface.modules import representation, detection, verification
-
 from src.services.graphql_client import GraphQLClient
+from src.services.inference_pool import inference_pool
+from src.services.embedding_batcher import EmbeddingBatcher
+from src.utils.perceptual_hash import dhash, hamming_distance
+from src.utils.face_tracker import FaceTrackLinker
+from src.utils.face_quality import quality_thresholds, quality_failures, face_quality_score
+from src.utils.face_matcher import ConsentGallery, resolve_threshold, search_options
+from src.utils.frame_filters import FILTER_RULES, filter_thresholds, frame_thumbnail, classify_frames
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def get_proxy_frame_path(raw_image_path: str) -> str:
+    """Path of the detection-resolution proxy written alongside a raw frame"""
+    return os.path.join(os.path.dirname(raw_image_path), "proxy", os.path.basename(raw_image_path))
+
 class FrameAnalysisService:
     """
     Service for analyzing frames, detecting faces, and matching against consent profiles.
@@ -24,6 +33,7 @@ class FrameAnalysisService:
         """Initialize with a GraphQL client for database operations"""
         self.graphql_client = graphql_client
         self.logger = logging.getLogger(__name__)
+        self._embedding_batchers: Dict[Tuple[str, int, float], EmbeddingBatcher] = {}
     
     async def process_frames(self, card_id: str, task_id: str, config: Dict[str, Any]) -> bool:
         """
@@ -41,146 +51,572 @@ class FrameAnalysisService:
         try:
             # Get frames with status 'queued' or 'detecting_faces'
             frames = await self.get_frames_to_process(card_id)
-            total_frames = len(frames)
             
             if not frames:
                 self.logger.info(f"No frames to process for card {card_id}")
                 return True
             
+            # Skip black, blank and near-identical frames before spending detection on them
+            frames = await self.filter_blank_frames(frames, config)
+            frames = await self.suppress_duplicate_frames(frames, config)
+            total_frames = len(frames)
+            
             self.logger.info(f"Processing {total_frames} frames for card {card_id}")
             
             # Track progress
-            processed_frames = 0
-            failed_frames = 0
+            counts = {"processed": 0, "failed": 0, "finished": 0}
             
-            # Process each frame
-            for i, frame in enumerate(frames):
-                frame_id = frame["frame_id"]
-                raw_image_path = frame["raw_frame_image_path"]
-                
-                # Check for cancellation every 5 frames
-                if i % 5 == 0:
-                    cancelled = await self._check_cancellation(task_id)
-                    if cancelled:
-                        return False
-                
-                try:
-                    self.logger.debug(f"Processing frame {i+1}/{total_frames}: {frame_id}")
-                    
-                    # Update frame status to 'detecting_faces'
-                    await self.update_frame_status(frame_id, "detecting_faces")
-                    
-                    # Detect faces in the frame
-                    detection_success = await self.process_frame(frame_id, raw_image_path, config)
-                    
-                    if detection_success:
+            async def record_frames(finished: List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]]) -> None:
+                for frame, stored_faces in finished:
+                    if stored_faces is not None:
                         # Update frame status to 'detection_complete'
-                        await self.update_frame_status(frame_id, "detection_complete")
-                        processed_frames += 1
+                        await self.update_frame_status(frame["frame_id"], "detection_complete")
+                        counts["processed"] += 1
                     else:
                         # Set to error if detection failed
-                        await self.update_frame_status(frame_id, "error")
-                        failed_frames += 1
-                
-                except Exception as e:
-                    self.logger.error(f"Error processing frame {frame_id}: {str(e)}")
-                    await self.update_frame_status(frame_id, "error")
-                    failed_frames += 1
+                        await self.update_frame_status(frame["frame_id"], "error")
+                        counts["failed"] += 1
                 
                 # Update task progress
-                progress = (i + 1) / total_frames
+                counts["finished"] += len(finished)
                 await self.graphql_client.update_db_task(
                     task_id, 
-                    progress=progress, 
-                    message=f"Processed {i+1}/{total_frames} frames. {failed_frames} failures."
+                    progress=counts["finished"] / total_frames, 
+                    message=f"Processed {counts['finished']}/{total_frames} frames. {counts['failed']} failures."
                 )
             
-            self.logger.info(f"Completed frame processing: {processed_frames} successful, {failed_frames} failed")
+            # Keep every inference worker busy, with a batch queued behind each
+            batch_slots = asyncio.Semaphore(inference_pool.max_workers * 2)
+            
+            # Clips are detected concurrently; the frames of each clip are linked into face tracks in order
+            clip_results = await asyncio.gather(*(
+                self.process_clip_frames(clip_frames, config, task_id, batch_slots, record_frames)
+                for clip_frames in self._group_frames_by_clip(frames)
+            ))
+            
+            if not all(clip_results):
+                return False
+            
+            self.logger.info(f"Completed frame processing: {counts['processed']} successful, {counts['failed']} failed")
             return True
         
         except Exception as e:
             self.logger.exception(f"Critical error during frame processing for card {card_id}: {str(e)}")
             return False
     
-    async def process_frame(self, frame_id: str, raw_image_path: str, config: Dict[str, Any]) -> bool:
+    async def filter_blank_frames(self, frames: List[Dict[str, Any]], config: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Process a single frame to detect faces.
+        Drop frames that cannot contain a detectable face: black leader and
+        fades, flat fields such as blank slates, and, when min_skin_fraction
+        is set, frames with almost no skin-toned pixels.
+        
+        All frames are judged at once on small thumbnails. Rejected frames
+        are marked detection_complete with zero faces and their filter_reason
+        in one bulk write, and the frames each rule removed are logged per clip.
         
         Args:
-            frame_id: ID of the frame to process
-            raw_image_path: Path to the raw frame image
+            frames: Frames to process
             config: Configuration parameters for face detection
             
         Returns:
-            bool: True if successful, False otherwise
+            List[Dict[str, Any]]: The frames that still need face detection
         """
-        try:
-            # Extract faces from the frame
-            face_objs = DeepFace.extract_faces(
-                img_path=raw_image_path,
-                detector_backend=config.get('detector_backend', 'retinaface'),
-                enforce_detection=config.get('enforce_detection', False),
-                align=config.get('align', True),
-                expand_percentage=config.get('expand_percentage', 0),
-                grayscale=False
-            )
+        thresholds = filter_thresholds(config)
+        if not any(thresholds.values()) or not frames:
+            return frames
+        
+        thumbnails = await asyncio.to_thread(self._load_filter_thumbnails, frames)
+        readable = [i for i, thumbnail in enumerate(thumbnails) if thumbnail is not None]
+        reasons: List[Optional[str]] = [None] * len(frames)
+        if readable:
+            verdicts = classify_frames(np.stack([thumbnails[i] for i in readable]), thresholds)
+            for i, reason in zip(readable, verdicts):
+                reasons[i] = reason
+        
+        rejected: Dict[str, List[str]] = {}
+        removed_per_clip: Dict[str, Dict[str, int]] = {}
+        for frame, reason in zip(frames, reasons):
+            if reason:
+                rejected.setdefault(reason, []).append(frame["frame_id"])
+                clip_counts = removed_per_clip.setdefault(frame["clip_id"], dict.fromkeys(FILTER_RULES, 0))
+                clip_counts[reason] += 1
+        
+        if not rejected:
+            return frames
+        if not await self.mark_frames_filtered(rejected):
+            # Nothing was written, so detect the frames rather than leave them queued
+            return frames
+        
+        for clip_id, clip_counts in removed_per_clip.items():
+            summary = ", ".join(f"{rule}={count}" for rule, count in clip_counts.items() if count)
+            self.logger.info(f"Filtered {sum(clip_counts.values())} frames of clip {clip_id} before detection ({summary})")
+        
+        kept_frames = [frame for frame, reason in zip(frames, reasons) if not reason]
+        self.logger.info(f"Skipped {len(frames) - len(kept_frames)} black or blank frames, "
+                         f"{len(kept_frames)} frames left for detection")
+        return kept_frames
+    
+    @staticmethod
+    def _load_filter_thumbnails(frames: List[Dict[str, Any]]) -> List[Optional[np.ndarray]]:
+        """
+        Load the filter thumbnail of each frame, from its proxy when there is one.
+        
+        Args:
+            frames: Frames with raw_frame_image_path
             
-            self.logger.debug(f"Found {len(face_objs)} faces in frame {frame_id}")
-            
-            # Process and store faces that meet confidence threshold
-            for face_obj in face_objs:
-                confidence = face_obj['confidence']
-                if confidence >= config.get('detection_confidence_threshold', 0.5):
-                    # Generate embedding for the detected face
-                    embedding_obj = representation.represent(
-                        img_path=face_obj['face'],  # Pass the extracted face array
-                        model_name=config.get('model_name', 'Facenet512'),
-                        enforce_detection=False,  # Already detected
-                        detector_backend="skip",  # Skip detection since we have the face
-                        align=config.get('align', True),
-                        normalization=config.get('normalization', 'base')
-                    )
-                    
-                    # Create facial area object
-                    facial_area = {
-                        'x': int(face_obj['facial_area']['x']),
-                        'y': int(face_obj['facial_area']['y']),
-                        'w': int(face_obj['facial_area']['w']),
-                        'h': int(face_obj['facial_area']['h'])
-                    }
-                    
-                    # Add eye coordinates if available
-                    if 'left_eye' in face_obj['facial_area']:
-                        facial_area['left_eye'] = face_obj['facial_area']['left_eye']
-                    if 'right_eye' in face_obj['facial_area']:
-                        facial_area['right_eye'] = face_obj['facial_area']['right_eye']
-                    
-                    # Get embeddings as a list
-                    embeddings = embedding_obj[0]['embedding']
-                    if hasattr(embeddings, 'tolist'):
-                        embeddings = embeddings.tolist()
-                    
-                    # Store the detected face in the database
-                    detection_id = await self.store_detected_face(
-                        frame_id,
-                        facial_area,
-                        float(confidence),
-                        embeddings
-                    )
+        Returns:
+            Per frame, the thumbnail, or None if the image could not be read
+        """
+        thumbnails = []
+        for frame in frames:
+            raw_image_path = frame["raw_frame_image_path"]
+            proxy_path = get_proxy_frame_path(raw_image_path)
+            if os.path.isfile(proxy_path):
+                image = cv2.imread(proxy_path)
+            else:
+                # Let the JPEG decoder skip most of the work for full resolution frames
+                image = cv2.imread(raw_image_path, cv2.IMREAD_REDUCED_COLOR_4)
+            thumbnails.append(frame_thumbnail(image) if image is not None else None)
+        return thumbnails
+    
+    async def suppress_duplicate_frames(self, frames: List[Dict[str, Any]], config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Drop frames that look the same as the previous kept frame of their clip.
+        
+        Each frame gets a difference hash, computed off the event loop;
+        frames within frame_dedup_threshold bits of the last kept frame are
+        marked detection_complete and linked to that frame through
+        duplicate_of_frame_id in one bulk write, so reports can reuse its
+        faces for the skipped timecode. A threshold of 0 disables the stage.
+        
+        Args:
+            frames: Frames to process, ordered by timestamp
+            config: Configuration parameters for face detection
+            
+        Returns:
+            List[Dict[str, Any]]: The frames that still need face detection
+        """
+        threshold = int(config.get('frame_dedup_threshold', 0) or 0)
+        if threshold <= 0:
+            return frames
+        
+        hashes = await asyncio.to_thread(self._hash_frames, frames)
+        
+        kept_frames = []
+        last_kept: Dict[str, Any] = {}  # clip_id -> (hash, frame_id)
+        duplicates: Dict[str, str] = {}  # frame_id -> representative frame_id
+        
+        for frame, frame_hash in zip(frames, hashes):
+            if frame_hash is None:
+                kept_frames.append(frame)
+                continue
+            
+            previous = last_kept.get(frame["clip_id"])
+            if previous and hamming_distance(frame_hash, previous[0]) <= threshold:
+                duplicates[frame["frame_id"]] = previous[1]
+                continue
+            
+            last_kept[frame["clip_id"]] = (frame_hash, frame["frame_id"])
+            kept_frames.append(frame)
+        
+        if duplicates and not await self.mark_frames_duplicate(duplicates):
+            # Nothing was written, so detect the frames rather than leave them queued
+            return frames
+        
+        self.logger.info(f"Skipped {len(duplicates)} near-duplicate frames, {len(kept_frames)} frames left for detection")
+        return kept_frames
+    
+    @staticmethod
+    def _hash_frames(frames: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Compute the difference hash of each frame, from its proxy when there is one.
+        
+        Args:
+            frames: Frames with raw_frame_image_path
+            
+        Returns:
+            Per frame, the hash, or None if the image could not be read
+        """
+        hashes = []
+        for frame in frames:
+            raw_image_path = frame["raw_frame_image_path"]
+            proxy_path = get_proxy_frame_path(raw_image_path)
+            image = cv2.imread(proxy_path if os.path.isfile(proxy_path) else raw_image_path, cv2.IMREAD_GRAYSCALE)
+            hashes.append(dhash(image) if image is not None else None)
+        return hashes
+    
+    @staticmethod
+    def _group_frames_by_clip(frames: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Group frames by clip, keeping their order within each clip.
+        
+        Args:
+            frames: Frames to group
+            
+        Returns:
+            List of frame lists, one per clip
+        """
+        by_clip: Dict[str, List[Dict[str, Any]]] = {}
+        for frame in frames:
+            by_clip.setdefault(frame["clip_id"], []).append(frame)
+        return list(by_clip.values())
+    
+    async def process_clip_frames(
+        self,
+        frames: List[Dict[str, Any]],
+        config: Dict[str, Any],
+        task_id: str,
+        batch_slots: asyncio.Semaphore,
+        on_frames: Callable[[List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]]], Awaitable[None]]
+    ) -> bool:
+        """
+        Detect faces in the frames of one clip, store them and hand the
+        finished frames to on_frames.
+        
+        Frames are detected in batches of detection_batch_size, several
+        batches at a time as batch_slots allows, but their detections are
+        linked into face tracks in timestamp order, so a track carries on
+        from one batch to the next until a shot start, a frame without faces
+        or the end of the clip. A track's faces are embedded once it has
+        ended, with the embedding of its best passing face, so a frame is
+        stored only when every track it shows has ended. Frames still
+        waiting when the task is cancelled keep the detecting_faces status.
+        
+        Args:
+            frames: Frames of one clip ordered by timestamp, with frame_id and raw_frame_image_path
+            config: Configuration parameters for face detection
+            task_id: ID of the processing task, checked for cancellation before every batch
+            batch_slots: Semaphore shared by all clips being detected, bounding the batches in the inference pool
+            on_frames: Coroutine receiving finished frames as (frame, stored faces) pairs, where the
+                stored faces are None if processing the frame failed
+            
+        Returns:
+            bool: False if the task was cancelled
+        """
+        batch_size = max(1, int(config.get("detection_batch_size", 8)))
+        batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+        # Detect ahead of the batch being linked, enough to keep every inference worker busy
+        lookahead = inference_pool.max_workers * 2
+        
+        linker = None
+        if config.get("face_tracking", True):
+            linker = FaceTrackLinker(
+                iou_threshold=config.get('tracking_iou_threshold', 0.3),
+                similarity_threshold=config.get('tracking_similarity_threshold', 0.5)
+            )
+        # track_id -> best passing face so far of each open track, whose crop is kept for embedding
+        best_faces: Dict[str, Dict[str, Any]] = {}
+        # Detected frames waiting for their tracks to end
+        pending: List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]] = []
+        counts = {"faces": 0, "tracks": 0}
+        
+        async def detect(batch: List[Dict[str, Any]]) -> Optional[List[Optional[List[Dict[str, Any]]]]]:
+            async with batch_slots:
+                # Check for cancellation before every batch
+                if await self._check_cancellation(task_id):
+                    return None
+                self.logger.debug(f"Processing batch of {len(batch)} frames starting at {batch[0]['frame_id']}")
+                for frame in batch:
+                    await self.update_frame_status(frame["frame_id"], "detecting_faces")
+                raw_paths = [frame["raw_frame_image_path"] for frame in batch]
+                # Detect on the proxy frames when extraction wrote them
+                proxy_paths = [get_proxy_frame_path(path) for path in raw_paths]
+                detection_images = [path if os.path.isfile(path) else None for path in proxy_paths]
+                return await self._detect_frames(raw_paths, config, detection_images)
+        
+        async def end_tracks(tracks: List[List[Dict[str, Any]]]) -> None:
+            counts["tracks"] += len(tracks)
+            try:
+                await self._embed_tracks(tracks, config)
+            except Exception as e:
+                self.logger.error(f"Error embedding {len(tracks)} face tracks: {str(e)}")
+                for track in tracks:
+                    for face in track:
+                        face.pop("face", None)
+                        face["status"] = "error"
+            for track in tracks:
+                best_faces.pop(track[0].get("track_id"), None)
+        
+        async def release_frames() -> None:
+            nonlocal pending
+            finished = []
+            waiting = []
+            for frame, faces in pending:
+                if faces is not None and any("status" not in face for face in faces):
+                    waiting.append((frame, faces))
+                else:
+                    finished.append((frame, await self._store_frame_faces(frame, faces)))
+            pending = waiting
+            if finished:
+                await on_frames(finished)
+        
+        tasks = [asyncio.create_task(detect(batch)) for batch in batches[:lookahead]]
+        try:
+            for i, batch in enumerate(batches):
+                if i + lookahead < len(batches):
+                    tasks.append(asyncio.create_task(detect(batches[i + lookahead])))
+                try:
+                    results = await tasks[i]
+                except Exception as e:
+                    self.logger.error(f"Error processing batch starting at frame {batch[0]['frame_id']}: {str(e)}")
+                    results = [None] * len(batch)
+                if results is None:
+                    return False
+                
+                faces_of_batch = [face for faces in results for face in faces or []]
+                counts["faces"] += len(faces_of_batch)
+                if linker is None:
+                    await end_tracks([[face] for face in faces_of_batch])
+                else:
+                    previous_last = [track[-1] for track in linker.active]
+                    # A frame kept for a scene change starts a new shot, so face tracks never cross it
+                    shot_starts = [frame.get("selection_reason") == "scene" for frame in batch]
+                    ended = linker.link(results, shot_starts)
+                    for face in faces_of_batch:
+                        if face["quality"]["failures"]:
+                            continue
+                        best = best_faces.get(face["track_id"])
+                        if best is None or face_quality_score(face["quality"]) > face_quality_score(best["quality"]):
+                            best_faces[face["track_id"]] = face
+                    await end_tracks(ended)
                     
-                    if not detection_id:
-                        self.logger.warning(f"Failed to store detected face for frame {frame_id}")
+                    # Open tracks only need the crops of their last face, to link the next
+                    # frame, and of their best passing face, to be embedded
+                    keep = {id(track[-1]) for track in linker.active} | {id(face) for face in best_faces.values()}
+                    for face in previous_last + faces_of_batch:
+                        if id(face) not in keep:
+                            face.pop("face", None)
+                
+                pending += list(zip(batch, results))
+                await release_frames()
             
+            if linker is not None:
+                await end_tracks(linker.close())
+                self.logger.debug(f"Linked {counts['faces']} faces of clip {frames[0]['clip_id']} into {counts['tracks']} tracks")
+            await release_frames()
             return True
         
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _store_frame_faces(
+        self,
+        frame: Dict[str, Any],
+        faces: Optional[List[Dict[str, Any]]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Store the detected faces of a frame.
+        
+        Args:
+            frame: Frame with frame_id
+            faces: Detected faces, each with its status, or None if detection failed
+            
+        Returns:
+            The stored faces (each with its detection_id), or None if processing the frame failed
+        """
+        if faces is None or any(face["status"] == "error" for face in faces):
+            return None
+        try:
+            self.logger.debug(f"Found {len(faces)} faces above threshold in frame {frame['frame_id']}")
+            await self.store_detected_faces(frame["frame_id"], faces)
+            return [face for face in faces if face.get("detection_id")]
         except Exception as e:
-            self.logger.error(f"Error processing frame {frame_id}: {str(e)}")
-            return False
+            self.logger.error(f"Error storing faces for frame {frame['frame_id']}: {str(e)}")
+            return None
+    
+    async def detect_faces(
+        self,
+        img: Union[str, np.ndarray],
+        config: Dict[str, Any],
+        detection_image: Optional[Union[str, np.ndarray]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Detect faces in a frame and generate embeddings for those that meet
+        the detection confidence threshold. Does not touch the database.
+        
+        Args:
+            img: Path to the frame image or a decoded BGR frame array
+            config: Configuration parameters for face detection
+            detection_image: Optional downscaled proxy of the frame to detect on;
+                facial areas are still returned in full resolution coordinates
+            
+        Returns:
+            List of dicts with facial_area, confidence and embedding for each face
+        """
+        faces = (await self.detect_faces_batch([img], config, [detection_image]))[0]
+        if faces is None:
+            raise RuntimeError("Face detection failed")
+        return faces
+    
+    async def detect_faces_batch(
+        self,
+        imgs: List[Union[str, np.ndarray]],
+        config: Dict[str, Any],
+        detection_images: Optional[List[Optional[Union[str, np.ndarray]]]] = None
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Detect faces in a batch of frames and generate embeddings for those
+        that meet the detection confidence threshold and pass the quality
+        gate. Faces are not linked into tracks. Does not touch the database.
+        
+        Args:
+            imgs: Paths to the frame images or decoded BGR frame arrays, ideally all the same size
+            config: Configuration parameters for face detection
+            detection_images: Optional downscaled proxy per frame to detect on;
+                facial areas are still returned in full resolution coordinates
+            
+        Returns:
+            Per frame, a list of dicts with facial_area, confidence, quality,
+            status and embedding for each face, or None if detection failed for that frame
+        """
+        results = await self._detect_frames(imgs, config, detection_images)
+        await self._embed_tracks([[face] for faces in results for face in faces or []], config)
+        return results
+    
+    async def _detect_frames(
+        self,
+        imgs: List[Union[str, np.ndarray]],
+        config: Dict[str, Any],
+        detection_images: Optional[List[Optional[Union[str, np.ndarray]]]] = None
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Detect faces in a batch of frames and apply the quality gate, without
+        embedding them. Detection runs as one job in the inference worker
+        pool with the detector already loaded, so the event loop stays free
+        and the per-call overhead is paid once per batch.
+        
+        Args:
+            imgs: Paths to the frame images or decoded BGR frame arrays, ideally all the same size
+            config: Configuration parameters for face detection
+            detection_images: Optional downscaled proxy per frame to detect on
+            
+        Returns:
+            Per frame, a list of dicts with facial_area, confidence, quality
+            (with its failures) and the preprocessed face crop for each face,
+            or None if detection failed for that frame
+        """
+        # 0 is a valid setting for both, so only a missing value falls back to the default
+        cascade_confidence_threshold = config.get('cascade_confidence_threshold')
+        cascade_region_padding = config.get('cascade_region_padding')
+        options = {
+            "model_name": config.get('model_name', 'Facenet512'),
+            "detector_backend": config.get('detector_backend', 'retinaface'),
+            "enforce_detection": config.get('enforce_detection', False),
+            "align": config.get('align', True),
+            "expand_percentage": config.get('expand_percentage', 0),
+            "normalization": config.get('normalization', 'base'),
+            "confidence_threshold": config.get('detection_confidence_threshold', 0.5),
+            "cascade_detector": config.get('cascade_detector'),
+            "cascade_mode": config.get('cascade_mode') or 'frame',
+            "cascade_confidence_threshold": 0.3 if cascade_confidence_threshold is None else float(cascade_confidence_threshold),
+            "cascade_region_padding": 0.5 if cascade_region_padding is None else float(cascade_region_padding),
+        }
+        results = await inference_pool.detect_faces_batch(imgs, options, detection_images)
+        
+        thresholds = quality_thresholds(config)
+        for faces in results:
+            for face in faces or []:
+                face["quality"]["failures"] = quality_failures(face["quality"], thresholds)
+        return results
+    
+    async def _embed_tracks(self, tracks: List[List[Dict[str, Any]]], config: Dict[str, Any]) -> None:
+        """
+        Embed the best passing face of each track and share its embedding
+        across the track. Face crops are embedded in batches shared with
+        other frames being processed at the same time.
+        
+        Faces failing the quality gate (too small, blurred, too dark or
+        bright, extreme pose) are not embedded unless their track has a face
+        that passes. They get status 'low_quality' and no embedding; the
+        others get status 'queued'. Every face loses its crop.
+        
+        Args:
+            tracks: Tracks of detected faces whose quality failures are set
+            config: Configuration parameters for face detection
+        """
+        embedded_tracks = []
+        representatives = []
+        low_quality = 0
+        for track in tracks:
+            passing = [face for face in track if not face["quality"]["failures"]]
+            if passing:
+                embedded_tracks.append(track)
+                representatives.append(max(passing, key=lambda face: face_quality_score(face["quality"])))
+            else:
+                for face in track:
+                    face.pop("face", None)
+                    face["status"] = "low_quality"
+                    face["embedding"] = None
+                low_quality += len(track)
+        
+        embeddings = await self._get_embedding_batcher(config).embed([face["face"] for face in representatives])
+        for track, embedding in zip(embedded_tracks, embeddings):
+            for face in track:
+                face.pop("face", None)
+                face["status"] = "queued"
+                face["embedding"] = embedding
+        
+        if low_quality:
+            self.logger.debug(f"Skipped embedding {low_quality} of {sum(len(track) for track in tracks)} "
+                              f"faces that failed the quality gate")
+    
+    def _get_embedding_batcher(self, config: Dict[str, Any]) -> EmbeddingBatcher:
+        """
+        Get the embedding batcher for the model and batching settings in config.
+        
+        Args:
+            config: Configuration parameters for face detection
+            
+        Returns:
+            EmbeddingBatcher shared by all frames processed with these settings
+        """
+        key = (
+            config.get('model_name', 'Facenet512'),
+            int(config.get('embedding_batch_size', 32)),
+            float(config.get('embedding_batch_max_wait_ms', 50)) / 1000
+        )
+        if key not in self._embedding_batchers:
+            self._embedding_batchers[key] = EmbeddingBatcher(*key)
+        return self._embedding_batchers[key]
+    
+    async def store_detected_faces(self, frame_id: str, faces: List[Dict[str, Any]]) -> int:
+        """
+        Store faces returned by detect_faces against a frame. Each stored
+        face gets its detection_id set.
+        
+        Args:
+            frame_id: ID of the frame the faces belong to
+            faces: Faces returned by detect_faces
+            
+        Returns:
+            int: Number of faces stored successfully
+        """
+        stored = 0
+        for face in faces:
+            detection_id = await self.store_detected_face(
+                frame_id,
+                face['facial_area'],
+                face['confidence'],
+                face['embedding'],
+                status=face.get('status', 'queued'),
+                quality=face.get('quality')
+            )
+            
+            if detection_id:
+                face['detection_id'] = detection_id
+                stored += 1
+            else:
+                self.logger.warning(f"Failed to store detected face for frame {frame_id}")
+        return stored
     
     async def match_faces(self, card_id: str, task_id: str, config: Dict[str, Any], embeddings_cache: Dict[str, Any]) -> bool:
         """
         Match all detected faces against consent profiles.
         
+        Faces are matched in chunks of match_chunk_size, each with one
+        gallery search and bulk writes (see match_detected_faces).
+        
         Args:
             card_id: ID of the card being processed
             task_id: ID of the processing task
@@ -201,52 +637,35 @@ class FrameAnalysisService:
             
             self.logger.info(f"Matching {total_faces} faces for card {card_id}")
             
+            chunk_size = max(1, int(config.get('match_chunk_size', 1000)))
+            
             # Track progress
             matched_faces = 0
             failed_faces = 0
             
-            # Process each face
-            for i, face in enumerate(faces):
-                detection_id = face["detection_id"]
-                frame_id = face["frame_id"]
-                embeddings = face["face_embeddings"]
-                
-                # Check for cancellation every 10 faces
-                if i % 10 == 0:
-                    cancelled = await self._check_cancellation(task_id)
-                    if cancelled:
-                        return False
-                
-                try:
-                    self.logger.debug(f"Matching face {i+1}/{total_faces}: {detection_id}")
-                    
-                    # Update face status to 'matching_faces'
-                    await self.update_detected_face_status(detection_id, "matching_faces")
-                    
-                    # Match face against consent profiles
-                    match_success = await self.match_face(
-                        detection_id, 
-                        embeddings, 
-                        face["facial_area"],
-                        embeddings_cache, 
-                        config
-                    )
-                    
-                    # Update face status to 'matching_complete'
-                    await self.update_detected_face_status(detection_id, "matching_complete")
-                    matched_faces += 1
+            for start in range(0, total_faces, chunk_size):
+                # Check for cancellation before every chunk
+                if await self._check_cancellation(task_id):
+                    return False
                 
-                except Exception as e:
-                    self.logger.error(f"Error matching face {detection_id}: {str(e)}")
-                    await self.update_detected_face_status(detection_id, "error")
-                    failed_faces += 1
+                chunk = faces[start:start + chunk_size]
+                completed, failed = await self.match_detected_faces(
+                    [
+                        {"detection_id": face["detection_id"], "facial_area": face["facial_area"], "embedding": face.get("face_embeddings")}
+                        for face in chunk
+                    ],
+                    embeddings_cache,
+                    config
+                )
+                matched_faces += len(completed)
+                failed_faces += len(failed)
                 
                 # Update task progress
-                progress = (i + 1) / total_faces
+                done = start + len(chunk)
                 await self.graphql_client.update_db_task(
                     task_id, 
-                    progress=progress, 
-                    message=f"Matched {i+1}/{total_faces} faces. {failed_faces} failures."
+                    progress=done / total_faces, 
+                    message=f"Matched {done}/{total_faces} faces. {failed_faces} failures."
                 )
             
             # Visualize all frames after matching
@@ -258,89 +677,245 @@ class FrameAnalysisService:
         except Exception as e:
             self.logger.exception(f"Critical error during face matching for card {card_id}: {str(e)}")
             return False
-    
-    async def match_face(
-        self, 
-        detection_id: str, 
-        embeddings: List[float], 
-        facial_area: Dict[str, Any],
-        embeddings_cache: Dict[str, Any], 
+
+    async def match_detected_faces(
+        self,
+        faces: List[Dict[str, Any]],
+        embeddings_cache: Dict[str, Any],
         config: Dict[str, Any]
-    ) -> bool:
+    ) -> Tuple[List[str], List[str]]:
         """
-        Match a detected face against consent profiles.
+        Match detected faces against consent profiles. The faces are compared
+        against the compiled consent gallery with one search, and their
+        status updates and matches are written in bulk.
         
         Args:
-            detection_id: ID of the detected face
-            embeddings: Face embeddings to match
-            facial_area: Facial area coordinates
+            faces: Faces with detection_id, facial_area and embedding, which is None if missing
             embeddings_cache: Dictionary of consent profile embeddings
             config: Configuration parameters for face matching
             
         Returns:
-            bool: True if matching was successful (even if no match found), False if error
+            Tuple of the detection_ids matched (with or without a consent face) and of those that failed
         """
+        await self.update_detected_faces_status([face["detection_id"] for face in faces], "matching_faces")
+        
+        usable = [face for face in faces if face.get("embedding")]
+        failed = [face["detection_id"] for face in faces if not face.get("embedding")]
         try:
-            if not embeddings_cache or 'profiles' not in embeddings_cache:
-                self.logger.warning("Empty embeddings cache - no matches possible")
-                return True  # Not an error, just no matches possible
+            # Searching a large gallery, and building its index on first use, takes seconds
+            results = await asyncio.to_thread(
+                self._get_gallery(embeddings_cache).match,
+                np.asarray([face["embedding"] for face in usable], dtype=np.float32).reshape(len(usable), -1),
+                config.get('distance_metric', 'euclidean_l2'),
+                resolve_threshold(config),
+                **search_options(config)
+            ) if usable else []
             
-            best_match = None
-            best_distance = float('inf')
-            
-            # Get distance metric from config
+            matches = [
+                self._face_match_object(face["detection_id"], match, face["facial_area"])
+                for face, match in zip(usable, results) if match
+            ]
+            if matches and not await self.store_face_matches(matches):
+                raise RuntimeError(f"Failed to store {len(matches)} face matches")
+            completed = [face["detection_id"] for face in usable]
+        
+        except Exception as e:
+            self.logger.error(f"Error matching {len(usable)} faces: {str(e)}")
+            completed = []
+            failed += [face["detection_id"] for face in usable]
+        
+        if completed:
+            await self.update_detected_faces_status(completed, "matching_complete")
+        if failed:
+            await self.update_detected_faces_status(failed, "error")
+        return completed, failed
+
+    async def rematch_faces(
+        self,
+        card_id: str,
+        task_id: str,
+        config: Dict[str, Any],
+        embeddings_cache: Dict[str, Any],
+        consent_face_ids: List[str]
+    ) -> Optional[int]:
+        """
+        Re-match a card's already matched faces after consent faces were added
+        or changed, without detecting anything again.
+
+        The stored detection embeddings are compared against the new and
+        changed consent faces only. Detections they would match closer than
+        their current match, and detections currently matched to a changed
+        face, are then matched against the whole gallery and their match is
+        replaced where it differs. The frames of those detections are
+        visualized again. Detections that keep their match get a new
+        second_distance when a new face of another profile is closer than
+        the stored one.
+
+        Args:
+            card_id: ID of the card to re-match
+            task_id: ID of the processing task
+            config: Configuration parameters for face matching
+            embeddings_cache: Dictionary of consent profile embeddings, already including the changes
+            consent_face_ids: IDs of the consent faces that were added or changed
+
+        Returns:
+            Number of detections whose match changed, or None if cancelled or failed
+        """
+        try:
+            gallery = self._get_gallery(embeddings_cache)
+            changed_ids = set(consent_face_ids)
+            rows = [row for row, face_id in enumerate(gallery.face_ids) if face_id in changed_ids]
+            delta = ConsentGallery(
+                gallery.embeddings[rows],
+                gallery.face_ids[rows].tolist(),
+                gallery.profile_ids[rows].tolist(),
+                normalized=gallery.normalized[rows]
+            ) if rows else None
+            profile_of = dict(zip(gallery.face_ids, gallery.profile_ids))
+
             distance_metric = config.get('distance_metric', 'euclidean_l2')
-            
-            # Iterate through all profiles and their faces
-            for profile in embeddings_cache['profiles']:
-                for face in profile['faces']:
-                    if face['embedding'] is None:
+            threshold = resolve_threshold(config)
+            search = search_options(config)
+            # A stored second_distance of None means "no other profile" only for exact searches
+            exact_search = search["ann_min_size"] <= 0 or gallery.size < search["ann_min_size"]
+            chunk_size = max(1, int(config.get('match_chunk_size', 1000)))
+
+            changed_faces = 0
+            compared_faces = 0
+            frames_to_refresh: Dict[str, str] = {}
+            after = None
+
+            while True:
+                if await self._check_cancellation(task_id):
+                    return None
+
+                faces = await self.get_matched_faces(card_id, chunk_size, after)
+                if not faces:
+                    break
+                after = faces[-1]["detection_id"]
+                faces = [face for face in faces if face.get("face_embeddings")]
+                compared_faces += len(faces)
+                if not faces:
+                    continue
+
+                queries = np.asarray([face["face_embeddings"] for face in faces], dtype=np.float32).reshape(len(faces), -1)
+                delta_distances = await asyncio.to_thread(
+                    delta.distances, queries, distance_metric
+                ) if delta else np.zeros((len(faces), 0))
+                delta_best = delta_distances.min(axis=1, initial=np.inf)
+
+                # Only detections the changes could affect go through the full gallery
+                candidates = []
+                second_distances: Dict[str, float] = {}
+                for i, face in enumerate(faces):
+                    current = face.get("face_matches") or []
+                    if any(match["consent_face_id"] in changed_ids for match in current):
+                        candidates.append(i)
+                    elif delta_best[i] <= threshold and (
+                        not current or delta_best[i] < min(float(match["distance"]) for match in current)
+                    ):
+                        candidates.append(i)
+                    elif delta is not None:
+                        # The match is kept, but a new face of another profile may be its closer runner-up
+                        for match in current:
+                            other_profile = delta.profile_ids != profile_of.get(match["consent_face_id"])
+                            if not other_profile.any():
+                                continue
+                            runner_up = float(delta_distances[i, other_profile].min())
+                            stored = match.get("second_distance")
+                            if (stored is None and exact_search) or (stored is not None and runner_up < float(stored)):
+                                second_distances[match["match_id"]] = runner_up
+
+                if second_distances and not await self.update_face_match_second_distances(second_distances):
+                    raise RuntimeError(f"Failed to update the second distance of {len(second_distances)} face matches")
+                if not candidates:
+                    continue
+
+                results = await asyncio.to_thread(gallery.match, queries[candidates], distance_metric, threshold, **search)
+                stale_match_ids, new_matches = [], []
+                for i, best in zip(candidates, results):
+                    face = faces[i]
+                    current = face.get("face_matches") or []
+                    if best and len(current) == 1 and current[0]["consent_face_id"] == best["consent_face_id"] \
+                            and abs(float(current[0]["distance"]) - best["distance"]) < 1e-6:
                         continue
-                    
-                    # Calculate distance between embeddings
-                    source_embedding = face['embedding']
-                    distance = verification.find_distance(
-                        source_embedding,
-                        embeddings,
-                        distance_metric
-                    )
-                    
-                    # Get threshold (from config or use default based on model)
-                    threshold = config.get('threshold')
-                    if threshold is None:
-                        threshold = verification.find_threshold(
-                            config.get('model_name', 'Facenet512'),
-                            distance_metric
-                        )
-                    
-                    # Check if this is the best match so far
-                    if distance <= threshold and distance < best_distance:
-                        best_distance = distance
-                        best_match = {
-                            'consent_face_id': face['consent_face_id'],
-                            'distance': distance,
-                            'threshold': threshold
-                        }
-            
-            # If we found a match, create and store a FaceMatch object
-            if best_match:
-                match_id = await self.store_face_match(
-                    detection_id, 
-                    best_match['consent_face_id'],
-                    best_match['distance'],
-                    best_match['threshold'],
-                    facial_area,  # Source coordinates
-                    facial_area   # Target coordinates (using same for now)
+                    stale_match_ids += [match["match_id"] for match in current]
+                    if best:
+                        new_matches.append(self._face_match_object(face["detection_id"], best, face["facial_area"]))
+                    frames_to_refresh[face["frame_id"]] = face["frame"]["raw_frame_image_path"]
+                    changed_faces += 1
+
+                if stale_match_ids and not await self.delete_face_matches(stale_match_ids):
+                    raise RuntimeError(f"Failed to delete {len(stale_match_ids)} superseded face matches")
+                if new_matches and not await self.store_face_matches(new_matches):
+                    raise RuntimeError(f"Failed to store {len(new_matches)} face matches")
+
+                await self.graphql_client.update_db_task(
+                    task_id,
+                    message=f"Compared {compared_faces} faces, {changed_faces} matches changed"
                 )
-                
-                if not match_id:
-                    self.logger.warning(f"Failed to store face match for detection {detection_id}")
+
+            self.logger.info(f"Re-matched card {card_id} against {len(rows)} new or changed consent faces: "
+                             f"{changed_faces} of {compared_faces} detections changed match")
+
+            # Visualize the frames whose matches changed
+            for i, (frame_id, raw_image_path) in enumerate(frames_to_refresh.items()):
+                if i % 10 == 0 and await self._check_cancellation(task_id):
+                    return None
+                processed_path = await self.visualize_frame(frame_id, raw_image_path)
+                if processed_path:
+                    await self.update_frame_with_processed_image(frame_id, processed_path, "recognition_complete")
+
+            return changed_faces
+
+        except Exception as e:
+            self.logger.exception(f"Error re-matching faces for card {card_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _get_gallery(embeddings_cache: Dict[str, Any]) -> ConsentGallery:
+        """
+        Get the compiled consent gallery of an embeddings cache, compiling it
+        on first use so it is built once per match pass.
+        
+        Args:
+            embeddings_cache: Dictionary of consent profile embeddings
             
-            return True
+        Returns:
+            The compiled gallery
+        """
+        if 'gallery' not in embeddings_cache:
+            embeddings_cache['gallery'] = ConsentGallery.from_embeddings_cache(embeddings_cache)
+        return embeddings_cache['gallery']
+    
+    @staticmethod
+    def _face_match_object(detection_id: str, match: Dict[str, Any], facial_area: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the face_matches row of a match.
+        
+        Args:
+            detection_id: ID of the detected face
+            match: Match returned by ConsentGallery.match
+            facial_area: Facial area of the detection, used as source and target coordinates
             
-        except Exception as e:
-            self.logger.error(f"Error matching face {detection_id}: {str(e)}")
-            return False
+        Returns:
+            Insert object for face_matches
+        """
+        return {
+            "detection_id": detection_id,
+            "consent_face_id": match["consent_face_id"],
+            "distance": match["distance"],
+            "second_distance": match["second_distance"],
+            "threshold": match["threshold"],
+            "source_x": facial_area["x"],
+            "source_y": facial_area["y"],
+            "source_w": facial_area["w"],
+            "source_h": facial_area["h"],
+            "target_x": facial_area["x"],
+            "target_y": facial_area["y"],
+            "target_w": facial_area["w"],
+            "target_h": facial_area["h"],
+        }
     
     async def visualize_all_frames(self, card_id: str, task_id: str) -> bool:
         """
@@ -421,6 +996,7 @@ class FrameAnalysisService:
                     detection_id
                     facial_area
                     confidence
+                    status
                     face_matches {
                         match_id
                     }
@@ -450,8 +1026,13 @@ class FrameAnalysisService:
                 facial_area = face["facial_area"]
                 face_matches = face.get("face_matches", [])
                 
-                # Green if matched, Red if unmatched
-                color = (0, 255, 0) if face_matches else (0, 0, 255)  # BGR format in OpenCV
+                low_quality = face.get("status") == "low_quality"
+                
+                # Green if matched, Red if unmatched, Orange if too poor to match
+                if low_quality:
+                    color = (0, 165, 255)  # BGR format in OpenCV
+                else:
+                    color = (0, 255, 0) if face_matches else (0, 0, 255)
                 thickness = 2
                 
                 # Draw bounding box
@@ -474,7 +1055,7 @@ class FrameAnalysisService:
                 )
                 
                 # Add match/no match indicator
-                label = "Matched" if face_matches else "Unmatched"
+                label = "Low quality" if low_quality else ("Matched" if face_matches else "Unmatched")
                 cv2.putText(
                     frame_image,
                     label,
@@ -523,6 +1104,7 @@ class FrameAnalysisService:
                 timestamp
                 raw_frame_image_path
                 status
+                selection_reason
             }
         }
         """
@@ -569,6 +1151,56 @@ class FrameAnalysisService:
             self.logger.error(f"Error getting faces to match: {str(e)}")
             return []
 
+    async def get_matched_faces(self, card_id: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get a page of detected faces with status 'matching_complete', with their
+        embeddings and current matches, in detection_id order.
+
+        Args:
+            card_id: ID of the card
+            limit: Maximum number of faces to return
+            after: detection_id of the last face of the previous page
+
+        Returns:
+            List of detected faces
+        """
+        query = """
+        query GetMatchedFaces($card_id: uuid!, $limit: Int!, $after: uuid!) {
+            detected_faces(
+                where: {
+                    frame: {clip: {card_id: {_eq: $card_id}}},
+                    status: {_eq: "matching_complete"},
+                    detection_id: {_gt: $after}
+                },
+                order_by: {detection_id: asc},
+                limit: $limit
+            ) {
+                detection_id
+                frame_id
+                face_embeddings
+                facial_area
+                frame {
+                    raw_frame_image_path
+                }
+                face_matches {
+                    match_id
+                    consent_face_id
+                    distance
+                    second_distance
+                }
+            }
+        }
+        """
+
+        variables = {
+            "card_id": card_id,
+            "limit": limit,
+            "after": after or "00000000-0000-0000-0000-000000000000"
+        }
+
+        result = await self.graphql_client.execute_async(query, variables)
+        return result.get("detected_faces", [])
+
     async def update_frame_status(self, frame_id: str, status: str) -> bool:
         """Update frame status in the database"""
         mutation = """
@@ -594,6 +1226,63 @@ class FrameAnalysisService:
             self.logger.error(f"Error updating frame status: {str(e)}")
             return False
 
+    async def mark_frames_filtered(self, rejected: Dict[str, List[str]]) -> bool:
+        """Mark frames rejected by the pre-detection filters as done with no faces, in one request"""
+        updates = []
+        variable_types = []
+        variables = {}
+        for i, (reason, frame_ids) in enumerate(rejected.items()):
+            variable_types.append(f"$frame_ids_{i}: [uuid!]!")
+            variables[f"frame_ids_{i}"] = frame_ids
+            updates.append(f"""
+            {reason}: update_frames(
+                where: {{frame_id: {{_in: $frame_ids_{i}}}}},
+                _set: {{status: "detection_complete", filter_reason: "{reason}"}}
+            ) {{
+                affected_rows
+            }}""")
+        
+        mutation = f"""
+        mutation MarkFramesFiltered({", ".join(variable_types)}) {{{"".join(updates)}
+        }}
+        """
+        
+        try:
+            await self.graphql_client.execute_async(mutation, variables)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error marking filtered frames: {str(e)}")
+            return False
+
+    async def mark_frames_duplicate(self, duplicates: Dict[str, str]) -> bool:
+        """Mark frames as near-duplicates of already kept frames, in one request"""
+        updates = []
+        variable_types = []
+        variables = {}
+        for i, (frame_id, representative_frame_id) in enumerate(duplicates.items()):
+            variable_types.append(f"$frame_id_{i}: uuid!, $duplicate_of_{i}: uuid!")
+            variables[f"frame_id_{i}"] = frame_id
+            variables[f"duplicate_of_{i}"] = representative_frame_id
+            updates.append(f"""
+            frame_{i}: update_frames_by_pk(
+                pk_columns: {{frame_id: $frame_id_{i}}},
+                _set: {{duplicate_of_frame_id: $duplicate_of_{i}, status: "detection_complete"}}
+            ) {{
+                frame_id
+            }}""")
+        
+        mutation = f"""
+        mutation MarkFramesDuplicate({", ".join(variable_types)}) {{{"".join(updates)}
+        }}
+        """
+        
+        try:
+            await self.graphql_client.execute_async(mutation, variables)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error marking duplicate frames: {str(e)}")
+            return False
+
     async def update_frame_with_processed_image(self, frame_id: str, processed_image_path: str, status: str) -> bool:
         """Update frame with processed image path and status"""
         mutation = """
@@ -623,42 +1312,51 @@ class FrameAnalysisService:
             self.logger.error(f"Error updating frame with processed image: {str(e)}")
             return False
 
-    async def update_detected_face_status(self, detection_id: str, status: str) -> bool:
-        """Update detected face status in the database"""
+    async def update_detected_faces_status(self, detection_ids: List[str], status: str) -> bool:
+        """Update the status of many detected faces in one request"""
         mutation = """
-        mutation UpdateDetectedFaceStatus($detection_id: uuid!, $status: String!) {
-            update_detected_faces_by_pk(
-                pk_columns: {detection_id: $detection_id},
+        mutation UpdateDetectedFacesStatus($detection_ids: [uuid!]!, $status: String!) {
+            update_detected_faces(
+                where: {detection_id: {_in: $detection_ids}},
                 _set: {status: $status}
             ) {
-                detection_id
+                affected_rows
             }
         }
         """
         
         variables = {
-            "detection_id": detection_id,
+            "detection_ids": detection_ids,
             "status": status
         }
         
         try:
             result = await self.graphql_client.execute_async(mutation, variables)
-            return bool(result.get("update_detected_faces_by_pk"))
+            return bool(result.get("update_detected_faces"))
         except Exception as e:
-            self.logger.error(f"Error updating detected face status: {str(e)}")
+            self.logger.error(f"Error updating detected faces status: {str(e)}")
             return False
 
-    async def store_detected_face(self, frame_id: str, facial_area: Dict[str, Any], confidence: float, embeddings: List[float]) -> Optional[str]:
+    async def store_detected_face(
+        self,
+        frame_id: str,
+        facial_area: Dict[str, Any],
+        confidence: float,
+        embeddings: Optional[List[float]],
+        status: str = "queued",
+        quality: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
         """Store detected face and return detection_id"""
         mutation = """
-        mutation InsertDetectedFace($frame_id: uuid!, $facial_area: jsonb!, $confidence: float8!, $embeddings: jsonb!) {
+        mutation InsertDetectedFace($frame_id: uuid!, $facial_area: jsonb!, $confidence: float8!, $embeddings: jsonb, $status: String!, $quality: jsonb) {
             insert_detected_faces_one(
                 object: {
                     frame_id: $frame_id,
                     facial_area: $facial_area,
                     confidence: $confidence,
                     face_embeddings: $embeddings,
-                    status: "queued"
+                    status: $status,
+                    quality: $quality
                 }
             ) {
                 detection_id
@@ -670,7 +1368,9 @@ class FrameAnalysisService:
             "frame_id": frame_id,
             "facial_area": facial_area,
             "confidence": confidence,
-            "embeddings": embeddings
+            "embeddings": embeddings,
+            "status": status,
+            "quality": quality
         }
         
         try:
@@ -683,76 +1383,60 @@ class FrameAnalysisService:
             self.logger.error(f"Error storing detected face: {str(e)}")
             return None
 
-    async def store_face_match(
-        self, 
-        detection_id: str, 
-        consent_face_id: str, 
-        distance: float, 
-        threshold: float,
-        source_coords: Dict[str, Any],
-        target_coords: Dict[str, Any]
-    ) -> Optional[str]:
-        """Store face match and return match_id"""
+    async def store_face_matches(self, matches: List[Dict[str, Any]]) -> bool:
+        """Store many face matches in one insert"""
         mutation = """
-        mutation InsertFaceMatch(
-            $detection_id: uuid!, 
-            $consent_face_id: uuid!, 
-            $distance: numeric!,
-            $threshold: numeric!,
-            $source_x: Int!,
-            $source_y: Int!,
-            $source_w: Int!,
-            $source_h: Int!,
-            $target_x: Int!,
-            $target_y: Int!,
-            $target_w: Int!,
-            $target_h: Int!
-        ) {
-            insert_face_matches_one(
-                object: {
-                    detection_id: $detection_id,
-                    consent_face_id: $consent_face_id,
-                    distance: $distance,
-                    threshold: $threshold,
-                    source_x: $source_x,
-                    source_y: $source_y,
-                    source_w: $source_w,
-                    source_h: $source_h,
-                    target_x: $target_x,
-                    target_y: $target_y,
-                    target_w: $target_w,
-                    target_h: $target_h
-                }
-            ) {
-                match_id
+        mutation InsertFaceMatches($objects: [face_matches_insert_input!]!) {
+            insert_face_matches(objects: $objects) {
+                affected_rows
             }
         }
         """
         
-        variables = {
-            "detection_id": detection_id,
-            "consent_face_id": consent_face_id,
-            "distance": distance,
-            "threshold": threshold,
-            "source_x": source_coords["x"],
-            "source_y": source_coords["y"],
-            "source_w": source_coords["w"],
-            "source_h": source_coords["h"],
-            "target_x": target_coords["x"],
-            "target_y": target_coords["y"],
-            "target_w": target_coords["w"],
-            "target_h": target_coords["h"]
+        try:
+            result = await self.graphql_client.execute_async(mutation, {"objects": matches})
+            return bool(result.get("insert_face_matches"))
+        except Exception as e:
+            self.logger.error(f"Error storing face matches: {str(e)}")
+            return False
+
+    async def delete_face_matches(self, match_ids: List[str]) -> bool:
+        """Delete many face matches in one mutation"""
+        mutation = """
+        mutation DeleteFaceMatches($match_ids: [uuid!]!) {
+            delete_face_matches(where: {match_id: {_in: $match_ids}}) {
+                affected_rows
+            }
         }
-        
+        """
+
         try:
-            result = await self.graphql_client.execute_async(mutation, variables)
-            match = result.get("insert_face_matches_one")
-            if match:
-                return match.get("match_id")
-            return None
+            result = await self.graphql_client.execute_async(mutation, {"match_ids": match_ids})
+            return bool(result.get("delete_face_matches"))
         except Exception as e:
-            self.logger.error(f"Error storing face match: {str(e)}")
-            return None
+            self.logger.error(f"Error deleting face matches: {str(e)}")
+            return False
+    
+    async def update_face_match_second_distances(self, second_distances: Dict[str, float]) -> bool:
+        """Update the second distance of many face matches in one mutation"""
+        mutation = """
+        mutation UpdateFaceMatchSecondDistances($updates: [face_matches_updates!]!) {
+            update_face_matches_many(updates: $updates) {
+                affected_rows
+            }
+        }
+        """
+
+        updates = [
+            {"where": {"match_id": {"_eq": match_id}}, "_set": {"second_distance": second_distance}}
+            for match_id, second_distance in second_distances.items()
+        ]
+        try:
+            result = await self.graphql_client.execute_async(mutation, {"updates": updates})
+            return bool(result.get("update_face_matches_many"))
+        except Exception as e:
+            self.logger.error(f"Error updating face match second distances: {str(e)}")
+            return False
     
     async def _check_cancellation(self, task_id: str) -> bool:
         """Helper method to check if task has been cancelled"""
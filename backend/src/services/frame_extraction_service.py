@@ -1,19 +1,87 @@
 import os
 import re
+import math
 import uuid
 import logging
 import asyncio
+import json
+import time
 import subprocess
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, AsyncIterator, Callable, Awaitable
 from datetime import datetime, timedelta
 
+import cv2
+import numpy as np
+
+from src.config import ENV
 from src.services.graphql_client import GraphQLClient
+from src.services.frame_analysis_service import FrameAnalysisService
+from src.services.extraction_cache import extraction_cache
 from src.utils.datetime_utils import format_for_database
+from src.utils.recognition_utils import resize_to_long_edge
+from src.utils.perceptual_hash import dhash, hamming_distance
+from src.utils.frame_filters import FILTER_RULES, filter_thresholds, frame_thumbnail, classify_frames
+from src.utils.lut_utils import load_cube_lut, apply_lut
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Timestamps come from showinfo, scene scores from the metadata filter that precedes it
+SHOWINFO_PTS_PATTERN = re.compile(r'Parsed_showinfo_\d+.*pts_time:(\d+(?:\.\d+)?)')
+SCENE_SCORE_PATTERN = re.compile(r'lavfi\.scene_score=(\d+(?:\.\d+)?)')
+
+# Minimum seconds between extraction progress reports for a clip
+PROGRESS_REPORT_INTERVAL = 2.0
+
+# Called with the fraction of the clip extracted and the throughput in media seconds per second
+ProgressCallback = Callable[[float, Optional[float]], Awaitable[None]]
+
+# Called with the frame records created for a clip once its extraction is complete
+FrameSink = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# scene: decode every frame, keep scene changes and interval frames
+# keyframes: decode keyframes only, then apply the same selection to them
+# seek: seek straight to each interval timestamp and decode a single frame there
+SAMPLING_MODES = ("scene", "keyframes", "seek")
+
+# Machine-wide limit on concurrently running FFmpeg processes, shared by all cards
+_ffmpeg_slots = asyncio.Semaphore(max(1, int(ENV["MAX_FFMPEG_PROCESSES"])))
+
+class FrameLogParser:
+    """
+    Parses FFmpeg log lines as they are emitted. The metadata filter prints
+    each frame's scene score just before showinfo prints its timestamp, so
+    the two are paired in order.
+    """
+    
+    def __init__(self):
+        self.scene_score: Optional[float] = None
+    
+    def feed(self, line: str) -> Optional[Tuple[float, Optional[float]]]:
+        """
+        Consume one log line.
+        
+        Args:
+            line: A line of FFmpeg stderr output
+            
+        Returns:
+            Tuple of (pts_time, scene_score) when the line completes a frame, None otherwise
+        """
+        score_match = SCENE_SCORE_PATTERN.search(line)
+        if score_match:
+            self.scene_score = float(score_match.group(1))
+            return None
+        
+        match = SHOWINFO_PTS_PATTERN.search(line)
+        if match:
+            frame_info = (float(match.group(1)), self.scene_score)
+            self.scene_score = None
+            return frame_info
+        return None
+
+
 class FrameExtractionService:
     """Service for extracting frames from video clips."""
     
@@ -26,13 +94,22 @@ class FrameExtractionService:
         """
         self.graphql_client = graphql_client
         
-    async def process_clip(self, clip_id: str, config: Dict[str, Any]) -> bool:
+    async def process_clip(
+        self,
+        clip_id: str,
+        config: Dict[str, Any],
+        progress_callback: Optional[ProgressCallback] = None,
+        frame_sink: Optional[FrameSink] = None
+    ) -> bool:
         """
         Process a clip by extracting frames and updating database.
         
         Args:
             clip_id: The ID of the clip to process
             config: The card configuration for processing
+            progress_callback: Optional coroutine receiving extraction progress for the clip
+            frame_sink: Optional coroutine receiving the queued frame records of the clip,
+                so face detection can start on them while other clips are still extracting
             
         Returns:
             bool: True if successful, False otherwise
@@ -55,7 +132,8 @@ class FrameExtractionService:
             extractor = FrameExtractor(
                 clip_path=clip_data["path"],
                 clip_id=clip_id,
-                config=config
+                config=config,
+                progress_callback=progress_callback
             )
             
             # Check if FFmpeg is installed
@@ -64,16 +142,28 @@ class FrameExtractionService:
                 await self.update_clip_status(clip_id, "error", error_message="FFmpeg not installed")
                 return False
             
+            if config.get("streaming_extraction", False):
+                if extractor.sampling_mode != "seek":
+                    return await self._process_clip_streaming(clip_id, extractor, config)
+                # Seeking runs one FFmpeg process per frame, there is no single stream to pipe
+                logger.warning(f"Streaming extraction does not support seek sampling, "
+                               f"extracting clip {clip_id} to image files instead")
+            
             frames = await extractor.extract_frames()
             
             # 4. Create frame records in database
             logger.info(f"Extracted {len(frames)} frames from clip {clip_id}")
+            created_frames = []
             for frame in frames:
-                await self._create_frame_record(frame)
+                if await self._create_frame_record(frame):
+                    created_frames.append(frame)
             
             # 5. Update clip status to extraction_complete
             await self.update_clip_status(clip_id, "extraction_complete")
             logger.info(f"Successfully completed frame extraction for clip {clip_id}")
+            
+            if frame_sink and created_frames:
+                await frame_sink(created_frames)
             return True
             
         except Exception as e:
@@ -82,6 +172,89 @@ class FrameExtractionService:
             await self.update_clip_status(clip_id, "error", error_message=str(e))
             return False
     
+    async def _process_clip_streaming(self, clip_id: str, extractor: "FrameExtractor", config: Dict[str, Any]) -> bool:
+        """
+        Process a clip by streaming decoded frames from FFmpeg straight into
+        face detection. Frames are only written to disk, and only get a
+        frame record, when at least one face is found in them.
+        
+        Args:
+            clip_id: The ID of the clip to process
+            extractor: The frame extractor for the clip
+            config: The card configuration for processing
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        frame_analysis_service = FrameAnalysisService(self.graphql_client)
+        dedup_threshold = int(config.get("frame_dedup_threshold", 0) or 0)
+        thresholds = filter_thresholds(config)
+        filter_enabled = any(thresholds.values())
+        filtered_frames = dict.fromkeys(FILTER_RULES, 0)
+        streamed_frames = 0
+        kept_frames = 0
+        duplicate_frames = 0
+        representative = None  # (hash, stored frame or None) of the last frame sent to detection
+        
+        async for frame in extractor.stream_frames():
+            streamed_frames += 1
+            
+            if filter_enabled:
+                reason = classify_frames(frame_thumbnail(frame["image"])[np.newaxis], thresholds)[0]
+                if reason:
+                    filtered_frames[reason] += 1
+                    continue
+            
+            if dedup_threshold > 0:
+                frame_hash = dhash(frame["image"])
+                if representative and hamming_distance(frame_hash, representative[0]) <= dedup_threshold:
+                    duplicate_frames += 1
+                    stored_frame = representative[1]
+                    if stored_frame:
+                        # Keep the timecode, pointing at the representative frame's image and faces
+                        frame["raw_frame_image_path"] = stored_frame["raw_frame_image_path"]
+                        frame["duplicate_of_frame_id"] = stored_frame["frame_id"]
+                        await self._create_frame_record(frame, status="detection_complete")
+                    continue
+                representative = (frame_hash, None)
+            
+            # Grade only the frames that reach detection
+            frame["image"] = extractor.grade_image(frame["image"])
+            
+            detection_image = None
+            if extractor.detection_resolution:
+                detection_image = resize_to_long_edge(frame["image"], extractor.detection_resolution)
+            
+            try:
+                faces = await frame_analysis_service.detect_faces(frame["image"], config, detection_image)
+            except Exception as e:
+                logger.error(f"Face detection failed for streamed frame {frame['index']} of clip {clip_id}: {str(e)}")
+                continue
+            
+            if not faces:
+                continue
+            
+            # Persist the full-resolution frame only now that we know it has faces
+            frame["raw_frame_image_path"] = extractor.save_frame(frame)
+            frame_id = await self._create_frame_record(frame, status="detecting_faces")
+            if not frame_id:
+                continue
+            
+            await frame_analysis_service.store_detected_faces(frame_id, faces)
+            await frame_analysis_service.update_frame_status(frame_id, "detection_complete")
+            kept_frames += 1
+            if representative:
+                representative = (representative[0], frame)
+        
+        filter_summary = ", ".join(f"{rule}={count}" for rule, count in filtered_frames.items() if count) or "none"
+        logger.info(f"Streamed {streamed_frames} frames from clip {clip_id}, kept {kept_frames} frames with faces, "
+                    f"skipped {duplicate_frames} near-duplicates, filtered {sum(filtered_frames.values())} "
+                    f"black or blank frames ({filter_summary})")
+        
+        await self.update_clip_status(clip_id, "extraction_complete")
+        logger.info(f"Successfully completed streaming extraction for clip {clip_id}")
+        return True
+    
     async def update_clip_status(self, clip_id: str, status: str, error_message: Optional[str] = None) -> bool:
         """
         Update clip status in database.
@@ -150,24 +323,27 @@ class FrameExtractionService:
             logger.error(f"Failed to get clip data: {str(e)}")
             return None
     
-    async def _create_frame_record(self, frame: Dict[str, Any]) -> Optional[str]:
+    async def _create_frame_record(self, frame: Dict[str, Any], status: str = "queued") -> Optional[str]:
         """
         Create a frame record in the database.
         
         Args:
             frame: Frame data dictionary
+            status: Initial status for the frame
             
         Returns:
             frame_id if successful, None otherwise
         """
         mutation = """
-        mutation CreateFrame($frame_id: uuid!, $clip_id: uuid!, $timestamp: String!, $raw_frame_image_path: String!, $status: String!) {
+        mutation CreateFrame($frame_id: uuid!, $clip_id: uuid!, $timestamp: String!, $raw_frame_image_path: String!, $status: String!, $selection_reason: String, $duplicate_of_frame_id: uuid) {
             insert_frames_one(object: {
                 frame_id: $frame_id,
                 clip_id: $clip_id,
                 timestamp: $timestamp,
                 raw_frame_image_path: $raw_frame_image_path,
-                status: $status
+                status: $status,
+                selection_reason: $selection_reason,
+                duplicate_of_frame_id: $duplicate_of_frame_id
             }) {
                 frame_id
             }
@@ -179,7 +355,9 @@ class FrameExtractionService:
             "clip_id": frame["clip_id"],
             "timestamp": frame["timestamp"],
             "raw_frame_image_path": frame["raw_frame_image_path"],
-            "status": "queued"  # Initial status for new frames
+            "status": status,
+            "selection_reason": frame.get("selection_reason"),
+            "duplicate_of_frame_id": frame.get("duplicate_of_frame_id")
         }
         
         try:
@@ -197,7 +375,7 @@ class FrameExtractor:
     Extracts frames from a video file using FFmpeg.
     """
     
-    def __init__(self, clip_path: str, clip_id: str, config: Dict[str, Any]):
+    def __init__(self, clip_path: str, clip_id: str, config: Dict[str, Any], progress_callback: Optional[ProgressCallback] = None):
         """
         Initialize the frame extractor.
         
@@ -205,15 +383,30 @@ class FrameExtractor:
             clip_path: Path to the video clip
             clip_id: The ID of the clip
             config: Configuration for frame extraction
+            progress_callback: Optional coroutine receiving extraction progress
         """
         self.clip_path = clip_path
         self.clip_id = clip_id
         self.config = config
+        self.progress_callback = progress_callback
+        self.duration: Optional[float] = None
+        
+        # Media seconds done and total per running FFmpeg job, used for progress reports
+        self._progress: Dict[Any, Tuple[float, float]] = {}
+        self._progress_started = time.monotonic()
+        self._last_progress_report = 0.0
         
         # Set defaults if not specified in config
         self.scene_sensitivity = config.get("scene_sensitivity", 0.3)
         self.fallback_frame_rate = config.get("fallback_frame_rate", 5)
         self.use_eq = config.get("use_eq", True)
+        self.extraction_segments = int(config.get("extraction_segments", 1))
+        self.min_segment_duration = float(config.get("min_segment_duration", 600))
+        self.detection_resolution = int(config.get("detection_resolution") or 0)
+        self.sampling_mode = config.get("sampling_mode") or "scene"
+        if self.sampling_mode not in SAMPLING_MODES:
+            logger.warning(f"Unknown sampling_mode '{self.sampling_mode}', falling back to scene detection")
+            self.sampling_mode = "scene"
         
         # Setup output directory with clip_id for uniqueness
         self.output_dir = Path("outputs/extracted_frames") / self.clip_id
@@ -223,6 +416,12 @@ class FrameExtractor:
         self.lut_file = None
         if not self.use_eq and config.get("lut_file"):
             self._initialize_lut(config.get("lut_file"))
+        
+        # Optionally apply the LUT with NumPy after extraction instead of in FFmpeg, so extractions
+        # stay un-graded in the cache and changing the LUT does not require decoding the clip again.
+        # Off by default: scene detection, dedup and the blank-frame filters then score log footage
+        # rather than graded frames, which changes which frames are selected
+        self.grade_in_process = bool(self.lut_file) and bool(config.get("lut_in_process", False))
 
     def check_ffmpeg(self) -> bool:
         """
@@ -265,6 +464,9 @@ class FrameExtractor:
         """
         Extract frames from the video using ffmpeg.
         
+        Long clips are split into time segments that are extracted
+        concurrently when extraction_segments is greater than 1.
+        
         Returns:
             List of dictionaries containing frame data
         """
@@ -276,69 +478,48 @@ class FrameExtractor:
                     f"use_eq={self.use_eq}")
         
         try:
-            # Build ffmpeg command
-            ffmpeg_cmd = self._build_ffmpeg_command()
-            logger.info(f"FFmpeg command: {' '.join(ffmpeg_cmd)}")
-            log_file = self.output_dir / "ffmpeg_output.log"
-            
-            # Run ffmpeg process
-            try:
-                process = subprocess.run(
-                    ffmpeg_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                self.ffmpeg_output = process.stderr
-                logger.info("FFmpeg process completed successfully")
-            except subprocess.CalledProcessError as e:
-                logger.error("FFmpeg process failed!")
-                logger.error("FFmpeg stderr output:")
-                for line in e.stderr.splitlines():
-                    logger.error(f"FFmpeg: {line}")
-                raise RuntimeError(f"FFmpeg failed with error: {e.stderr}")
-            
-            # Log ffmpeg output
-            with open(log_file, 'w') as f:
-                f.write(self.ffmpeg_output)
-            
-            # Get all output files
-            logger.info("Checking for extracted frames...")
-            frame_files = sorted(self.output_dir.glob('*.png'))
-            logger.info(f"Found {len(frame_files)} extracted frames")
-            
-            if not frame_files:
+            # Fingerprinting, linking and evicting touch thousands of files, so they run off the event loop
+            segments = await self._plan_segments()
+            cache_key = await asyncio.to_thread(self._cache_key, segments)
+            frame_data = await asyncio.to_thread(extraction_cache.restore, cache_key, self.output_dir) if cache_key else None
+
+            if frame_data is None:
+                frame_data = await self._extract_uncached(segments)
+
+            logger.info(f"Found {len(frame_data)} extracted frames")
+
+            if not frame_data:
                 logger.error("No frames were extracted!")
                 logger.error("FFmpeg output directory contents:")
                 for item in self.output_dir.iterdir():
                     logger.error(f"  {item.name} ({item.stat().st_size} bytes)")
                 raise RuntimeError("No frames were extracted from the video")
+
+            # Order all frames by their absolute timestamp, frames without one go last
+            frame_data.sort(key=lambda x: (x['timestamp'] is None, x['timestamp'] or 0.0))
+
+            if cache_key:
+                await asyncio.to_thread(extraction_cache.store, cache_key, frame_data, self._cache_settings(segments))
             
+            if self.grade_in_process:
+                await asyncio.to_thread(self._grade_frames, frame_data)
+
             # Create Frame objects from the files
             frames = []
-            for frame_file in frame_files:
+            for data in frame_data:
                 frame_id = str(uuid.uuid4())
                 
                 frame = {
                     "frame_id": frame_id,
                     "clip_id": self.clip_id,
                     "timestamp": "00:00:00:00",  # Default timestamp
-                    "raw_frame_image_path": str(frame_file.absolute()),
+                    "raw_frame_image_path": str(data['path'].absolute()),
+                    "selection_reason": data['selection_reason'],
                 }
+                if data['timestamp'] is not None:
+                    frame["timestamp"] = self._format_timecode(data['timestamp'])
                 frames.append(frame)
             
-            # Try to parse timestamps if possible
-            try:
-                frame_data = self._parse_ffmpeg_output(self.ffmpeg_output)
-                if frame_data and len(frame_data) == len(frames):
-                    for i, data in enumerate(frame_data):
-                        frames[i]["timestamp"] = self._format_timecode(data['timestamp'])
-                else:
-                    logger.warning(f"Timestamp count mismatch: {len(frame_data)} timestamps for {len(frames)} frames")
-            except Exception as e:
-                logger.warning(f"Failed to parse frame timestamps: {str(e)}")
-                logger.warning("Using default timestamps for frames")
-            
             logger.info(f"Successfully processed {len(frames)} frames")
             logger.info("=== Frame extraction completed successfully ===")
             return frames
@@ -347,122 +528,749 @@ class FrameExtractor:
             logger.error(f"Frame extraction failed: {str(e)}")
             raise
 
-    def _build_ffmpeg_command(self) -> List[str]:
+    async def _extract_uncached(self, segments: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
         """
-        Build ffmpeg command with appropriate filters.
+        Run FFmpeg over the clip with the configured sampling mode.
+
+        Args:
+            segments: Time ranges from _plan_segments, extracted in parallel when there are several
+
+        Returns:
+            List of dictionaries with the path, timestamp and selection reason of each frame
+        """
+        if self.sampling_mode == "seek":
+            return await self._extract_seek_frames()
+
+        if len(segments) > 1:
+            logger.info(f"Extracting clip in {len(segments)} parallel segments")
+            segment_results = await asyncio.gather(*(
+                self._extract_segment(i, start, end, is_last=(i == len(segments) - 1))
+                for i, (start, end) in enumerate(segments)
+            ))
+            return [frame for segment in segment_results for frame in segment]
+
+        return await self._run_ffmpeg(
+            self._build_ffmpeg_command(),
+            self.output_dir,
+            progress_key="clip",
+            progress_total=await self._duration_for_progress()
+        )
+
+    def _cache_settings(self, segments: List[Tuple[float, float]]) -> Dict[str, Any]:
+        """
+        Settings that change which frames are extracted or how they look.
+        Interval and scene selection restart in every segment, so the
+        segment boundaries are part of the key. A LUT applied in process is
+        applied after the cache, so it is left out.
+
+        Args:
+            segments: Time ranges from _plan_segments
+
+        Returns:
+            Dictionary of settings included in the extraction cache key
+        """
+        lut = None
+        if self.lut_file and not self.grade_in_process:
+            lut_stat = os.stat(self.lut_file)
+            lut = {"path": self.lut_file, "size": lut_stat.st_size, "mtime_ns": lut_stat.st_mtime_ns}
+
+        return {
+            "scene_sensitivity": self.scene_sensitivity,
+            "fallback_frame_rate": self.fallback_frame_rate,
+            "use_eq": self.use_eq,
+            "lut_file": lut,
+            "sampling_mode": self.sampling_mode,
+            "detection_resolution": self.detection_resolution,
+            "segments": [[start, end] for start, end in segments] if len(segments) > 1 else None,
+        }
+
+    def _cache_key(self, segments: List[Tuple[float, float]]) -> Optional[str]:
+        """
+        Extraction cache key of this clip, or None when caching is disabled.
+
+        Args:
+            segments: Time ranges from _plan_segments
+
+        Returns:
+            Cache key, or None
+        """
+        if not extraction_cache.enabled or not self.config.get("use_extraction_cache", True):
+            return None
+        try:
+            return extraction_cache.key_for(self.clip_path, self._cache_settings(segments))
+        except OSError as e:
+            logger.warning(f"Could not fingerprint clip {self.clip_path}, skipping extraction cache: {str(e)}")
+            return None
+
+    async def _run_ffmpeg(
+        self,
+        ffmpeg_cmd: List[str],
+        output_dir: Path,
+        progress_key: Any = None,
+        progress_total: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run an ffmpeg extraction command and collect the frames it wrote.
         
+        Args:
+            ffmpeg_cmd: Command built by _build_ffmpeg_command
+            output_dir: Directory the command writes frames to
+            progress_key: Key identifying this run in progress reports
+            progress_total: Media seconds this run will decode, if known
+            
         Returns:
-            List of command components
+            List of dictionaries with the path and timestamp of each frame
         """
-        # Base command with input
-        cmd = ["ffmpeg", "-i", str(self.clip_path)]
+        logger.info(f"FFmpeg command: {' '.join(ffmpeg_cmd)}")
+        log_file = output_dir / "ffmpeg_output.log"
         
-        # Build filter complex based on settings
-        filter_complex = self._build_filter_complex()
+        frame_info = await self._execute_ffmpeg(ffmpeg_cmd, log_file, progress_key, progress_total)
+        logger.info("FFmpeg process completed successfully")
         
-        # Add filter and output options
-        scene_pattern = str(self.output_dir / f"scene_%04d.png")
-        fallback_pattern = str(self.output_dir / f"fallback_%04d.png")
+        return self._collect_frames(frame_info, output_dir)
 
-        command = cmd + [
-            "-filter_complex", filter_complex,
-            "-map", "[vout1]", "-vsync", "vfr", "-q:v", "2", scene_pattern,
-            "-map", "[vout2]", "-vsync", "vfr", "-q:v", "2", fallback_pattern
-        ]
+    async def _execute_ffmpeg(
+        self,
+        ffmpeg_cmd: List[str],
+        log_file: Optional[Path] = None,
+        progress_key: Any = None,
+        progress_total: Optional[float] = None
+    ) -> List[Tuple[float, Optional[float]]]:
+        """
+        Run an ffmpeg command without blocking the event loop, waiting for a
+        free machine-wide FFmpeg slot first.
+        
+        Stderr is parsed line by line as it is emitted and streamed to the
+        log file rather than held in memory, and the -progress key/value
+        blocks on stdout are turned into progress reports.
+        
+        Args:
+            ffmpeg_cmd: Command to run
+            log_file: Optional file to write the FFmpeg log to
+            progress_key: Key identifying this run in progress reports
+            progress_total: Media seconds this run will decode, if known
+            
+        Returns:
+            List of (pts_time, scene_score) for each frame showinfo reported
+        """
+        frame_info: List[Tuple[float, Optional[float]]] = []
+        stderr_tail = deque(maxlen=50)
+        
+        async with _ffmpeg_slots:
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            log = open(log_file, 'w') if log_file else None
+            
+            async def read_stderr() -> None:
+                parser = FrameLogParser()
+                async for raw_line in process.stderr:
+                    line = raw_line.decode(errors="replace").rstrip()
+                    stderr_tail.append(line)
+                    if log:
+                        log.write(line + "\n")
+                    parsed = parser.feed(line)
+                    if parsed:
+                        frame_info.append(parsed)
+            
+            async def read_progress() -> None:
+                block: Dict[str, str] = {}
+                async for raw_line in process.stdout:
+                    key, _, value = raw_line.decode(errors="replace").strip().partition("=")
+                    block[key] = value
+                    if key != "progress":
+                        continue
+                    out_time_us = block.get("out_time_us") or block.get("out_time_ms")
+                    if progress_total and out_time_us and out_time_us.isdigit():
+                        await self._report_progress(
+                            progress_key, int(out_time_us) / 1_000_000, progress_total,
+                            force=(value == "end")
+                        )
+                    block = {}
+            
+            try:
+                await asyncio.gather(read_stderr(), read_progress())
+                await process.wait()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                if log:
+                    log.close()
+        
+        if process.returncode != 0:
+            logger.error("FFmpeg process failed!")
+            logger.error("FFmpeg stderr output:")
+            for line in stderr_tail:
+                logger.error(f"FFmpeg: {line}")
+            last_line = stderr_tail[-1] if stderr_tail else "no output"
+            raise RuntimeError(f"FFmpeg failed with exit code {process.returncode}: {last_line}")
+        return frame_info
 
-        return command
+    async def _report_progress(self, key: Any, done: float, total: float, force: bool = False) -> None:
+        """
+        Record progress of one FFmpeg job and, at most every
+        PROGRESS_REPORT_INTERVAL seconds, pass the clip's overall progress
+        and throughput to the progress callback.
+        
+        Args:
+            key: Key identifying the job
+            done: Media seconds processed by the job
+            total: Media seconds the job will process
+            force: Report even if the last report was recent
+        """
+        if not self.progress_callback or not total:
+            return
+        
+        self._progress[key] = (min(done, total), total)
+        now = time.monotonic()
+        if not force and now - self._last_progress_report < PROGRESS_REPORT_INTERVAL:
+            return
+        self._last_progress_report = now
+        
+        done_seconds = sum(job_done for job_done, _ in self._progress.values())
+        total_seconds = sum(job_total for _, job_total in self._progress.values())
+        elapsed = now - self._progress_started
+        throughput = done_seconds / elapsed if elapsed > 0 else None
+        
+        try:
+            await self.progress_callback(done_seconds / total_seconds, throughput)
+        except Exception as e:
+            logger.warning(f"Failed to report extraction progress for clip {self.clip_id}: {str(e)}")
 
-    def _build_filter_complex(self) -> str:
+    async def _duration_for_progress(self) -> Optional[float]:
         """
-        Build filter complex string based on the video config.
+        Clip duration for progress reporting, probed only when someone is
+        listening for progress.
         
         Returns:
-            Filter complex string for FFmpeg
+            Duration in seconds, or None if unknown
         """
-        if self.lut_file:
-            return self._build_lut_filter()
-        elif self.use_eq:
-            return self._build_eq_filter()
-        else:
-            return self._build_basic_filter()
+        if not self.progress_callback:
+            return None
+        try:
+            return await self._probe_duration()
+        except Exception as e:
+            logger.warning(f"Could not probe clip duration for progress reporting: {str(e)}")
+            return None
 
-    def _build_basic_filter(self) -> str:
+    async def _extract_seek_frames(self) -> List[Dict[str, Any]]:
         """
-        Build basic filter string without color correction.
+        Extract one frame every fallback_frame_rate seconds by seeking to each
+        target timestamp on the input side, so only the frames around each
+        target are decoded.
         
         Returns:
-            Filter string
+            List of dictionaries containing frame data
         """
-        return (
-            f"[0:v]split[v1][v2];"
-            f"[v1]select='gt(scene,{self.scene_sensitivity})',showinfo[vout1];"
-            f"[v2]fps=1/{self.fallback_frame_rate},showinfo[vout2]"
+        duration = await self._probe_duration()
+        interval = float(self.fallback_frame_rate)
+        targets = [i * interval for i in range(int(math.ceil(duration / interval)))]
+        logger.info(f"Seeking to {len(targets)} timestamps across {duration:.1f}s")
+        
+        completed = 0
+        
+        async def extract_at(index: int, timestamp: float) -> Optional[Dict[str, Any]]:
+            nonlocal completed
+            frame_path = self.output_dir / f"frame_{index:06d}.png"
+            ffmpeg_cmd = self._build_ffmpeg_command(start=timestamp, frame_path=frame_path)
+            try:
+                await self._execute_ffmpeg(ffmpeg_cmd)
+            except RuntimeError as e:
+                logger.warning(f"Failed to extract frame at {timestamp:.3f}s: {str(e)}")
+                return None
+            finally:
+                completed += 1
+                await self._report_progress("seek", min(completed * interval, duration), duration,
+                                            force=(completed == len(targets)))
+            if not frame_path.exists():
+                # Seeking past the last decodable frame produces no output
+                return None
+            return {
+                'timestamp': timestamp,
+                'path': frame_path,
+                'selection_reason': "interval"
+            }
+        
+        # A fixed set of workers pulls targets, so long clips do not queue thousands of tasks
+        results: List[Optional[Dict[str, Any]]] = [None] * len(targets)
+        pending = iter(enumerate(targets))
+        
+        async def worker() -> None:
+            for index, timestamp in pending:
+                results[index] = await extract_at(index, timestamp)
+        
+        worker_count = min(len(targets), max(1, int(ENV["MAX_FFMPEG_PROCESSES"])))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        return [frame for frame in results if frame is not None]
+
+    async def _extract_segment(self, index: int, start: float, end: float, is_last: bool) -> List[Dict[str, Any]]:
+        """
+        Extract frames from one time range of the clip.
+        
+        Decoding starts one fallback interval before the segment so scene
+        detection has the preceding frames to compare against; frames from
+        that pre-roll are discarded, as are frames at or after the segment
+        end, which belong to the next segment.
+        
+        Args:
+            index: Index of the segment within the clip
+            start: Segment start time in seconds
+            end: Segment end time in seconds
+            is_last: Whether this is the final segment of the clip
+            
+        Returns:
+            List of frame dictionaries with absolute timestamps
+        """
+        segment_dir = self.output_dir / f"segment_{index:03d}"
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        
+        preroll = min(start, float(self.fallback_frame_rate))
+        seek_start = start - preroll
+        ffmpeg_cmd = self._build_ffmpeg_command(
+            output_dir=segment_dir,
+            start=seek_start,
+            duration=None if is_last else end - seek_start
         )
+        segment_total = (min(end, self.duration) if self.duration else end) - seek_start
+        self._progress[index] = (0.0, segment_total)
+        frame_data = await self._run_ffmpeg(ffmpeg_cmd, segment_dir, progress_key=index, progress_total=segment_total)
+        
+        frames = []
+        for data in frame_data:
+            if data['timestamp'] is None:
+                logger.warning(f"Dropping frame without timestamp from segment {index}: {data['path']}")
+                continue
+            # Output timestamps restart at zero after input seeking
+            data['timestamp'] += seek_start
+            if data['timestamp'] < start or (not is_last and data['timestamp'] >= end):
+                continue
+            frames.append(data)
         
-    def _build_eq_filter(self) -> str:
+        logger.info(f"Segment {index} ({start:.1f}s-{end:.1f}s) produced {len(frames)} frames")
+        return frames
+
+    async def _plan_segments(self) -> List[Tuple[float, float]]:
         """
-        Build filter string for histogram equalization.
+        Split the clip into time ranges for parallel extraction.
+        
+        Segment boundaries fall on multiples of the fallback interval so
+        interval sampling stays close to a single-pass extraction.
         
         Returns:
-            Filter string
+            List of (start, end) times in seconds; a single range means no split
         """
-        return (
-            f"[0:v]split[v1][v2];"
-            f"[v1]eq=contrast=1.5:saturation=1.5,select='gt(scene,{self.scene_sensitivity})',showinfo[vout1];"
-            f"[v2]eq=contrast=1.5:saturation=1.5,fps=1/{self.fallback_frame_rate},showinfo[vout2]"
+        if self.extraction_segments <= 1 or self.sampling_mode == "seek":
+            return [(0.0, float("inf"))]
+        
+        try:
+            duration = await self._probe_duration()
+        except Exception as e:
+            logger.warning(f"Could not probe clip duration, extracting in one pass: {str(e)}")
+            return [(0.0, float("inf"))]
+        
+        segment_count = min(self.extraction_segments, int(duration // self.min_segment_duration))
+        if segment_count <= 1:
+            return [(0.0, float("inf"))]
+        
+        interval = float(self.fallback_frame_rate)
+        segment_length = math.ceil(duration / segment_count / interval) * interval
+        
+        segments = []
+        start = 0.0
+        while start < duration:
+            segments.append((start, start + segment_length))
+            start += segment_length
+        return segments
+
+    async def stream_frames(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Decode sampled frames and yield them as BGR numpy arrays without
+        writing anything to disk. FFmpeg writes raw frames to stdout while
+        showinfo timestamps are read from stderr alongside them.
+        
+        Yields:
+            Dictionaries containing frame data and the decoded image
+        """
+        width, height = await self._probe_frame_size()
+        frame_size = width * height * 3
+        progress_total = await self._duration_for_progress()
+        
+        ffmpeg_cmd = self._build_streaming_command()
+        logger.info(f"=== Starting streaming frame extraction for clip: {self.clip_id} ({width}x{height}) ===")
+        logger.info(f"FFmpeg command: {' '.join(ffmpeg_cmd)}")
+        
+        await _ffmpeg_slots.acquire()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception:
+            _ffmpeg_slots.release()
+            raise
+        
+        # Timestamps arrive on stderr in the same order frames arrive on stdout
+        timestamps: asyncio.Queue = asyncio.Queue()
+        stderr_tail = deque(maxlen=50)
+        
+        async def read_stderr() -> None:
+            parser = FrameLogParser()
+            async for raw_line in process.stderr:
+                line = raw_line.decode(errors="replace").rstrip()
+                stderr_tail.append(line)
+                parsed = parser.feed(line)
+                if parsed:
+                    await timestamps.put(parsed)
+            await timestamps.put(None)
+        
+        stderr_task = asyncio.create_task(read_stderr())
+        last_pts_time = 0.0
+        index = 0
+        
+        try:
+            while True:
+                try:
+                    buffer = await process.stdout.readexactly(frame_size)
+                except asyncio.IncompleteReadError as e:
+                    if e.partial:
+                        logger.warning(f"Discarding incomplete trailing frame ({len(e.partial)} bytes)")
+                    break
+                
+                frame_info = await timestamps.get()
+                if frame_info is None:
+                    logger.warning(f"Missing timestamp for streamed frame {index}, reusing previous timestamp")
+                    frame_info = (last_pts_time, None)
+                    timestamps.put_nowait(None)
+                pts_time, scene_score = frame_info
+                last_pts_time = pts_time
+                
+                yield {
+                    "frame_id": str(uuid.uuid4()),
+                    "clip_id": self.clip_id,
+                    "index": index,
+                    "pts_time": pts_time,
+                    "timestamp": self._format_timecode(pts_time),
+                    "selection_reason": self._selection_reason(scene_score),
+                    "image": np.frombuffer(buffer, dtype=np.uint8).reshape((height, width, 3)),
+                }
+                index += 1
+                await self._report_progress("stream", pts_time, progress_total)
+            
+            await process.wait()
+            await stderr_task
+            
+            if process.returncode != 0:
+                logger.error("FFmpeg process failed!")
+                for line in stderr_tail:
+                    logger.error(f"FFmpeg: {line}")
+                raise RuntimeError(f"FFmpeg failed with exit code {process.returncode}")
+            
+            logger.info(f"=== Streaming frame extraction completed: {index} frames ===")
+        
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if not stderr_task.done():
+                stderr_task.cancel()
+            _ffmpeg_slots.release()
+
+    def grade_image(self, image: np.ndarray) -> np.ndarray:
+        """
+        Apply the configured LUT to a decoded frame when grading in process.
+        
+        Args:
+            image: BGR uint8 frame
+            
+        Returns:
+            The graded frame, or the frame unchanged if there is nothing to apply
+        """
+        if not self.grade_in_process:
+            return image
+        return apply_lut(image, load_cube_lut(self.lut_file))
+    
+    def _grade_frames(self, frame_data: List[Dict[str, Any]]) -> None:
+        """
+        Apply the configured LUT to extracted frames and their detection proxies.
+        
+        The graded image is written to a new file that then replaces the
+        frame, because the frame may be a hard link into the extraction cache,
+        which must keep the un-graded image.
+        
+        Args:
+            frame_data: Frame data returned by the extraction
+        """
+        lut = load_cube_lut(self.lut_file)
+        for data in frame_data:
+            proxy_path = data['path'].parent / "proxy" / data['path'].name
+            for path in (data['path'], proxy_path):
+                if not path.exists():
+                    continue
+                image = cv2.imread(str(path))
+                if image is None:
+                    logger.warning(f"Could not read frame {path} for grading")
+                    continue
+                graded_path = path.with_name(f".graded_{path.name}")
+                cv2.imwrite(str(graded_path), apply_lut(image, lut))
+                os.replace(graded_path, path)
+        logger.info(f"Applied LUT {Path(self.lut_file).name} to {len(frame_data)} frames")
+    
+    def save_frame(self, frame: Dict[str, Any]) -> str:
+        """
+        Write a streamed frame to the output directory as a PNG.
+        
+        Args:
+            frame: Frame dictionary yielded by stream_frames
+            
+        Returns:
+            Absolute path of the written image
+        """
+        frame_path = self.output_dir / f"frame_{frame['index']:06d}.png"
+        if not cv2.imwrite(str(frame_path), frame["image"]):
+            raise RuntimeError(f"Failed to write frame image: {frame_path}")
+        return str(frame_path.absolute())
+
+    async def _run_ffprobe(self, args: List[str]) -> Dict[str, Any]:
+        """
+        Run ffprobe on the clip without blocking the event loop.
+        
+        Args:
+            args: ffprobe options, the clip path is appended
+            
+        Returns:
+            The parsed JSON output
+        """
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", *args, "-of", "json", str(self.clip_path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffprobe failed with code {process.returncode}: {stderr.decode(errors='replace').strip()}")
+        return json.loads(stdout)
+
+    async def _probe_frame_size(self) -> Tuple[int, int]:
+        """
+        Get the decoded frame size of the first video stream using ffprobe.
+        
+        ffmpeg autorotates by default, so for clips whose rotation metadata
+        is a quarter turn (typically phone footage) the coded width and
+        height are swapped.
+        
+        Returns:
+            Tuple of (width, height)
+        """
+        result = await self._run_ffprobe([
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height:stream_side_data=rotation:stream_tags=rotate"
+        ])
+        stream = result["streams"][0]
+        width, height = int(stream["width"]), int(stream["height"])
         
-    def _build_lut_filter(self) -> str:
+        rotation = stream.get("tags", {}).get("rotate")
+        for side_data in stream.get("side_data_list", []):
+            if "rotation" in side_data:
+                rotation = side_data["rotation"]
+        if rotation is not None and int(float(rotation)) % 180 != 0:
+            width, height = height, width
+        return width, height
+
+    async def _probe_duration(self) -> float:
         """
-        Build filter string for LUT application.
+        Get the duration of the clip in seconds using ffprobe.
         
         Returns:
-            Filter string
+            Clip duration in seconds
+        """
+        if self.duration is not None:
+            return self.duration
+        
+        result = await self._run_ffprobe(["-show_entries", "format=duration"])
+        self.duration = float(result["format"]["duration"])
+        return self.duration
+
+    def _build_streaming_command(self) -> List[str]:
+        """
+        Build ffmpeg command that writes sampled frames to stdout as raw BGR.
+        
+        Returns:
+            List of command components
+        """
+        return [
+            "ffmpeg", "-hide_banner", "-nostats", "-nostdin",
+            *self._input_options(),
+            "-i", str(self.clip_path),
+            "-vf", self._build_filter_chain(),
+            "-vsync", "vfr",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "pipe:1"
+        ]
+
+    def _build_colour_filter(self) -> str:
+        """
+        Build the colour correction filter for the configured settings.
+        
+        Returns:
+            Filter string, or an empty string if no correction is applied
+        """
+        if self.lut_file:
+            # An in-process LUT is applied to the extracted frames instead
+            return "" if self.grade_in_process else f"lut3d='{self.lut_file}'"
+        elif self.use_eq:
+            return "eq=contrast=1.5:saturation=1.5"
+        return ""
+
+    def _build_select_expression(self) -> str:
+        """
+        Build a select expression that keeps scene changes plus at least one
+        frame every fallback_frame_rate seconds, in a single output stream.
+        
+        Returns:
+            Select expression for FFmpeg
         """
         return (
-            f"[0:v]split[v1][v2];"
-            f"[v1]lut3d='{self.lut_file}',select='gt(scene,{self.scene_sensitivity})',showinfo[vout1];"
-            f"[v2]lut3d='{self.lut_file}',fps=1/{self.fallback_frame_rate},showinfo[vout2]"
+            f"gt(scene,{self.scene_sensitivity})"
+            f"+isnan(prev_selected_t)"
+            f"+gte(t-prev_selected_t,{self.fallback_frame_rate})"
         )
 
-    def _parse_ffmpeg_output(self, ffmpeg_output: str) -> List[Dict[str, Any]]:
+    def _build_ffmpeg_command(
+        self,
+        output_dir: Optional[Path] = None,
+        start: Optional[float] = None,
+        duration: Optional[float] = None,
+        frame_path: Optional[Path] = None
+    ) -> List[str]:
         """
-        Parse ffmpeg output to extract frame information.
+        Build ffmpeg command with appropriate filters.
         
         Args:
-            ffmpeg_output: Output from FFmpeg
+            output_dir: Directory to write frames to, defaults to the clip output directory
+            start: Optional input-side seek position in seconds
+            duration: Optional input duration to decode in seconds
+            frame_path: When given, write only the first frame at start to this path
             
         Returns:
-            List of dictionaries containing frame data
+            List of command components
         """
-        frame_data = []
+        output_dir = output_dir or self.output_dir
+        
+        # Base command with input, seeking on the input side so skipped footage is not decoded.
+        # Progress is written to stdout as key=value blocks, the log (with showinfo) to stderr
+        cmd = ["ffmpeg", "-hide_banner", "-nostats", "-nostdin", "-progress", "pipe:1"]
+        if start:
+            cmd += ["-ss", f"{start:.3f}"]
+        if duration is not None:
+            cmd += ["-t", f"{duration:.3f}"]
+        cmd += self._input_options() + ["-i", str(self.clip_path)]
         
-        # Extract timestamps from showinfo filter output
-        timestamps = []
-        for line in ffmpeg_output.splitlines():
-            if 'pts_time:' in line:
-                # Updated regex to handle both integer and decimal timestamps
-                match = re.search(r'pts_time:(\d+(?:\.\d+)?)', line)
-                if match:
-                    timestamps.append(float(match.group(1)))
+        # Add filter and output options
+        if frame_path is not None:
+            filter_chain = self._build_filter_chain(include_select=False)
+            frame_pattern = str(frame_path)
+            proxy_dir = frame_path.parent / "proxy"
+            proxy_pattern = str(proxy_dir / frame_path.name)
+            output_options = ["-frames:v", "1", "-q:v", "2"]
+        else:
+            filter_chain = self._build_filter_chain()
+            frame_pattern = str(output_dir / "frame_%06d.png")
+            proxy_dir = output_dir / "proxy"
+            proxy_pattern = str(proxy_dir / "frame_%06d.png")
+            output_options = ["-vsync", "vfr", "-q:v", "2"]
+
+        if not self.detection_resolution:
+            return cmd + ["-vf", filter_chain] + output_options + [frame_pattern]
+
+        # Also write a copy of every frame scaled down for face detection
+        proxy_dir.mkdir(parents=True, exist_ok=True)
+        size = self.detection_resolution
+        filter_complex = (
+            f"[0:v]{filter_chain},split=2[vfull][vproxy_in];"
+            f"[vproxy_in]scale=w='if(gt(iw,ih),min({size},iw),-2)':h='if(gt(iw,ih),-2,min({size},ih))'[vproxy]"
+        )
+        return (
+            cmd + ["-filter_complex", filter_complex]
+            + ["-map", "[vfull]"] + output_options + [frame_pattern]
+            + ["-map", "[vproxy]"] + output_options + [proxy_pattern]
+        )
+
+    def _input_options(self) -> List[str]:
+        """
+        Input options for the configured sampling mode.
         
-        # Get all output files
-        frame_files = sorted(self.output_dir.glob('*.png'))
+        Returns:
+            List of options to place before the input
+        """
+        if self.sampling_mode == "keyframes":
+            # Have the decoder drop everything except keyframes
+            return ["-skip_frame", "nokey"]
+        return []
+
+    def _build_filter_chain(self, include_select: bool = True) -> str:
+        """
+        Build the single-output filter chain: colour correction is applied
+        once, then one select keeps both scene changes and interval frames,
+        so a moment picked by both conditions is only emitted once. The
+        scene score is printed per frame so the reason for each pick can
+        be recovered from the log.
         
-        # If we have timestamps, create frame data with them
+        Args:
+            include_select: Whether to add frame selection after colour correction
+            
+        Returns:
+            Filter chain string for FFmpeg
+        """
+        filters = [self._build_colour_filter()]
+        if include_select:
+            filters += [
+                f"select='{self._build_select_expression()}'",
+                "metadata=mode=print:key=lavfi.scene_score",
+                "showinfo"
+            ]
+        return ",".join(f for f in filters if f) or "null"
+
+    def _selection_reason(self, scene_score: Optional[float]) -> str:
+        """
+        Work out why the select filter kept a frame.
+        
+        Args:
+            scene_score: Scene change score reported for the frame
+            
+        Returns:
+            'scene' for scene changes, 'interval' for fallback sampling
+        """
+        if scene_score is not None and scene_score > float(self.scene_sensitivity):
+            return "scene"
+        return "interval"
+
+    def _collect_frames(self, frame_info: List[Tuple[float, Optional[float]]], output_dir: Path) -> List[Dict[str, Any]]:
+        """
+        Pair the frames written to disk with the timestamps parsed from FFmpeg.
+        
+        Args:
+            frame_info: (pts_time, scene_score) for each frame, in output order
+            output_dir: Directory the frames were written to
+            
+        Returns:
+            List of dictionaries containing frame data
+        """
+        frame_files = sorted(output_dir.glob('frame_*.png'))
+        if len(frame_info) != len(frame_files):
+            logger.warning(f"Timestamp count mismatch: {len(frame_info)} timestamps for {len(frame_files)} frames")
+        
+        frame_data = []
         for i, frame_path in enumerate(frame_files):
-            if i < len(timestamps):
-                timestamp = timestamps[i]
-                is_scene = 'scene_' in frame_path.name
-                
-                frame_data.append({
-                    'timestamp': timestamp,
-                    'path': frame_path,
-                    'is_scene_change': is_scene
-                })
-        
-        # Sort all frames by timestamp
-        frame_data.sort(key=lambda x: x['timestamp'])
+            timestamp, score = frame_info[i] if i < len(frame_info) else (None, None)
+            frame_data.append({
+                'timestamp': timestamp,
+                'path': frame_path,
+                'selection_reason': self._selection_reason(score)
+            })
         
         return frame_data
 
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import asyncio
+import logging
+from pathlib import Path
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+from src.config import ENV
+from src.utils.face_matcher import ConsentGallery
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+
+# Consent faces whose embeddings are downloaded per request when a snapshot is refreshed
+EMBEDDING_FETCH_BATCH = 500
+
+
+class GallerySnapshotStore:
+    """
+    On-disk snapshots of the consent galleries, one per project. A consent
+    face stores a single embedding, so every card of a project shares its
+    snapshot whatever model it is configured with.
+
+    A snapshot is the float32 embeddings matrix and its L2-normalized copy
+    saved as .npy files, and a manifest with the face id, profile and
+    last_updated version of every row. Snapshots are opened with mmap, so
+    every process matching against a project shares one copy of the
+    matrices through the page cache.
+
+    Refreshing a snapshot only asks Hasura for face ids and versions; the
+    embeddings of new and changed faces are downloaded and the rows of the
+    others are reused. The versions are checked with one database round
+    trip on the first use after refresh_seconds, or after invalidate is
+    called; in between, a gallery is served from disk.
+    """
+
+    def __init__(self, root: str, refresh_seconds: float):
+        """
+        Initialize the snapshot store.
+
+        Args:
+            root: Directory the snapshots are stored in
+            refresh_seconds: How long a snapshot is served before its versions are checked again
+        """
+        self.root = Path(root)
+        self.refresh_seconds = refresh_seconds
+        self._checked_at: Dict[str, float] = {}
+        self._opened: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, project_id: Optional[str] = None) -> None:
+        """
+        Check the versions of a project's snapshots on their next use.
+
+        Args:
+            project_id: Project whose consent faces changed, None for every project
+        """
+        if project_id is None:
+            self._checked_at.clear()
+        else:
+            self._checked_at.pop(project_id, None)
+
+    async def get_embeddings_cache(self, graphql_client: Any, project_id: str) -> Dict[str, Any]:
+        """
+        Get a project's consent gallery, refreshing its snapshot if it is due.
+
+        Args:
+            graphql_client: Client used to check versions and fetch changed embeddings
+            project_id: ID of the project
+
+        Returns:
+            Dictionary with the profiles and their faces, and the compiled gallery
+        """
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            checked_at = self._checked_at.get(project_id)
+            if checked_at is None or time.time() - checked_at > self.refresh_seconds:
+                try:
+                    await self._refresh(graphql_client, project_id)
+                    self._checked_at[project_id] = time.time()
+                except Exception as e:
+                    logger.error(f"Error refreshing consent gallery snapshot of project {project_id}: {str(e)}")
+            return self._open(project_id)
+
+    def _snapshot_dir(self, project_id: str) -> Path:
+        """
+        Directory of a snapshot.
+
+        Args:
+            project_id: ID of the project
+
+        Returns:
+            Path of the directory
+        """
+        return self.root / re.sub(r"[^A-Za-z0-9_.-]", "_", project_id)
+
+    @contextmanager
+    def _locked(self, snapshot_dir: Path, exclusive: bool):
+        """
+        Hold the snapshot's file lock, shared for readers and exclusive for writers.
+
+        Args:
+            snapshot_dir: Directory of the snapshot
+            exclusive: Whether to take the lock exclusively
+        """
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        with open(snapshot_dir / LOCK_NAME, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(snapshot_dir: Path) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Read a snapshot's manifest and map its matrices. Call with the lock held.
+
+        Args:
+            snapshot_dir: Directory of the snapshot
+
+        Returns:
+            The manifest, the embeddings and the normalized embeddings, all None if there is no snapshot
+        """
+        manifest_path = snapshot_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return None, None, None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        generation = manifest["generation"]
+        embeddings = np.load(snapshot_dir / f"embeddings-{generation}.npy", mmap_mode="r")
+        normalized = np.load(snapshot_dir / f"normalized-{generation}.npy", mmap_mode="r")
+        return manifest, embeddings, normalized
+
+    def _open(self, project_id: str) -> Dict[str, Any]:
+        """
+        Build the embeddings cache from a snapshot on disk, reusing the one
+        already open in this process while the snapshot is unchanged.
+
+        Args:
+            project_id: ID of the project
+
+        Returns:
+            Dictionary with the profiles and their faces, and the compiled gallery
+        """
+        snapshot_dir = self._snapshot_dir(project_id)
+        try:
+            with self._locked(snapshot_dir, exclusive=False):
+                manifest, embeddings, normalized = self._read(snapshot_dir)
+        except Exception as e:
+            logger.error(f"Error reading consent gallery snapshot {snapshot_dir}: {str(e)}")
+            return {"profiles": []}
+        if manifest is None:
+            return {"profiles": []}
+
+        opened = self._opened.get(project_id)
+        if opened and opened[0] == manifest["generation"]:
+            return opened[1]
+
+        profiles: List[Dict[str, Any]] = []
+        for face in manifest["faces"]:
+            if not profiles or profiles[-1]["profile_id"] != face["profile_id"]:
+                profiles.append({
+                    "profile_id": face["profile_id"],
+                    "person_name": face["person_name"],
+                    "faces": []
+                })
+            if face["row"] is not None:
+                profiles[-1]["faces"].append({"consent_face_id": face["consent_face_id"]})
+
+        rows = [face for face in manifest["faces"] if face["row"] is not None]
+        gallery = ConsentGallery(
+            embeddings,
+            [face["consent_face_id"] for face in rows],
+            [face["profile_id"] for face in rows],
+            normalized=normalized
+        )
+        embeddings_cache = {"profiles": profiles, "gallery": gallery}
+        self._opened[project_id] = (manifest["generation"], embeddings_cache)
+        return embeddings_cache
+
+    async def _refresh(self, graphql_client: Any, project_id: str) -> None:
+        """
+        Bring a snapshot up to date with the database, downloading only the
+        embeddings of faces that are new or changed since it was written.
+
+        Args:
+            graphql_client: Client used to check versions and fetch changed embeddings
+            project_id: ID of the project
+        """
+        faces = await self._fetch_versions(graphql_client, project_id)
+        snapshot_dir = self._snapshot_dir(project_id)
+
+        with self._locked(snapshot_dir, exclusive=False):
+            manifest, embeddings, _ = self._read(snapshot_dir)
+        previous = {face["consent_face_id"]: face for face in (manifest["faces"] if manifest else [])}
+
+        def unchanged(face: Dict[str, Any]) -> bool:
+            # Faces left out of the gallery are fetched again, in case their size now matches
+            known = previous.get(face["consent_face_id"])
+            return known is not None and known["row"] is not None and known["version"] == face["version"]
+
+        if manifest and len(faces) == len(previous) and all(
+            unchanged(face) and previous[face["consent_face_id"]]["profile_id"] == face["profile_id"]
+            and previous[face["consent_face_id"]]["person_name"] == face["person_name"]
+            for face in faces
+        ):
+            return
+
+        changed_ids = [face["consent_face_id"] for face in faces if not unchanged(face)]
+        fetched = await self._fetch_embeddings(graphql_client, changed_ids)
+
+        vectors = []
+        reused = 0
+        for face in faces:
+            if unchanged(face):
+                vector = embeddings[previous[face["consent_face_id"]]["row"]]
+                reused += 1
+            else:
+                vector = fetched.get(face["consent_face_id"])
+            vectors.append(vector)
+
+        # The size most of the current embeddings have, so a gallery regenerated with another model is kept
+        sizes = Counter(len(vector) for vector in vectors if vector is not None)
+        dimensions = sizes.most_common(1)[0][0] if sizes else None
+        rows, skipped = [], 0
+        for face, vector in zip(faces, vectors):
+            face["row"] = None
+            if vector is None:
+                continue
+            if len(vector) != dimensions:
+                skipped += 1
+                continue
+            face["row"] = len(rows)
+            rows.append(vector)
+
+        if skipped:
+            logger.warning(f"Left {skipped} consent embeddings of a different size out of the gallery")
+        matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), dimensions or 0)
+        await asyncio.to_thread(self._write, snapshot_dir, faces, matrix)
+        logger.info(f"Refreshed consent gallery snapshot of project {project_id}: "
+                    f"{len(changed_ids)} new or changed faces fetched, {reused} reused")
+
+    def _write(self, snapshot_dir: Path, faces: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """
+        Write a new generation of a snapshot and switch the manifest to it.
+        Processes that still map the previous generation keep reading it
+        until they reopen the snapshot.
+
+        Args:
+            snapshot_dir: Directory of the snapshot
+            faces: Manifest entry of every face, in gallery row order
+            embeddings: The embeddings matrix
+        """
+        generation = uuid.uuid4().hex
+        norms = np.linalg.norm(embeddings, axis=1)
+        normalized = embeddings / np.maximum(norms, 1e-12)[:, np.newaxis]
+        manifest = {"generation": generation, "dimensions": int(embeddings.shape[1]), "faces": faces}
+
+        with self._locked(snapshot_dir, exclusive=True):
+            np.save(snapshot_dir / f"embeddings-{generation}.npy", embeddings)
+            np.save(snapshot_dir / f"normalized-{generation}.npy", normalized)
+            tmp_path = snapshot_dir / f"{MANIFEST_NAME}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, snapshot_dir / MANIFEST_NAME)
+
+            for path in snapshot_dir.glob("*.npy"):
+                if generation not in path.name:
+                    path.unlink(missing_ok=True)
+
+    @staticmethod
+    async def _fetch_versions(graphql_client: Any, project_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the id and version of every consent face with an embedding, without the embeddings.
+
+        Args:
+            graphql_client: GraphQL client
+            project_id: ID of the project
+
+        Returns:
+            Manifest entries grouped by profile, with consent_face_id, profile_id, person_name and version
+        """
+        query = """
+        query GetConsentFaceVersions($project_id: uuid!) {
+            consent_profiles(where: {project_id: {_eq: $project_id}}, order_by: {profile_id: asc}) {
+                profile_id
+                person_name
+                consent_faces(where: {face_embedding: {_is_null: false}}, order_by: {consent_face_id: asc}) {
+                    consent_face_id
+                    last_updated
+                }
+            }
+        }
+        """
+        result = await graphql_client.execute_async(query, {"project_id": project_id})
+        if not result or "consent_profiles" not in result:
+            raise ValueError(f"No consent profiles returned for project {project_id}")
+
+        return [
+            {
+                "consent_face_id": face["consent_face_id"],
+                "profile_id": profile["profile_id"],
+                "person_name": profile["person_name"],
+                "version": face["last_updated"],
+            }
+            for profile in result["consent_profiles"]
+            for face in profile.get("consent_faces", [])
+        ]
+
+    @staticmethod
+    async def _fetch_embeddings(graphql_client: Any, face_ids: List[str]) -> Dict[str, List[float]]:
+        """
+        Download the embeddings of the given consent faces.
+
+        Args:
+            graphql_client: GraphQL client
+            face_ids: IDs of the consent faces
+
+        Returns:
+            Embedding of each face that has one, by consent_face_id
+        """
+        query = """
+        query GetConsentFaceEmbeddings($face_ids: [uuid!]!) {
+            consent_faces(where: {consent_face_id: {_in: $face_ids}}) {
+                consent_face_id
+                face_embedding
+            }
+        }
+        """
+        embeddings = {}
+        for start in range(0, len(face_ids), EMBEDDING_FETCH_BATCH):
+            batch = face_ids[start:start + EMBEDDING_FETCH_BATCH]
+            result = await graphql_client.execute_async(query, {"face_ids": batch})
+            for face in (result or {}).get("consent_faces", []):
+                if face.get("face_embedding") is not None:
+                    embeddings[face["consent_face_id"]] = face["face_embedding"]
+        return embeddings
+
+
+# Global instance
+gallery_snapshots = GallerySnapshotStore(
+    ENV["GALLERY_SNAPSHOT_DIR"],
+    refresh_seconds=float(ENV["GALLERY_REFRESH_SECONDS"])
+)
@@ -0,0 +1,356 @@
+import os
+import time
+import asyncio
+import logging
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Dict, Optional, Any, Tuple, Union, Callable
+
+import numpy as np
+
+from src.config import ENV
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A frame handed to a worker: a file path, or (shared memory name, shape, dtype) of a decoded array
+ImageRef = Union[str, Tuple[str, Tuple[int, ...], str]]
+
+
+def default_worker_count() -> int:
+    """
+    Number of inference workers when INFERENCE_WORKERS is not set. Each
+    worker holds its own copy of the models, so half the cores are used,
+    leaving the rest for FFmpeg and the API.
+
+    Returns:
+        Worker count
+    """
+    configured = int(ENV["INFERENCE_WORKERS"] or 0)
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _init_worker(
+    model_name: Optional[str],
+    detector_backend: Optional[str],
+    threads_per_worker: int,
+    events: Any
+) -> None:
+    """
+    Load and warm up the models once when a worker process starts, so no frame pays for it.
+
+    Args:
+        model_name: Recognition model to preload, or None
+        detector_backend: Face detector to preload
+        threads_per_worker: TensorFlow threads each worker may use
+        events: Queue the worker's model registry reports residency to
+    """
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads_per_worker)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except Exception as e:
+        logger.warning(f"Could not limit TensorFlow threads in inference worker: {str(e)}")
+
+    from src.utils import onnx_engine
+    from src.services.model_registry import model_registry
+
+    if onnx_engine.onnx_enabled():
+        onnx_engine.set_intra_op_threads(threads_per_worker)
+    model_registry.set_reporter(events)
+    if model_name:
+        model_registry.acquire(model_name, detector_backend)
+    logger.info(f"Inference worker {os.getpid()} ready with {model_name} and {detector_backend}")
+
+
+def _ping_job() -> int:
+    """
+    Do nothing, so submitting it starts a worker.
+
+    Returns:
+        The worker's pid
+    """
+    return os.getpid()
+
+
+def _resolve_image(ref: Optional[Union[ImageRef, List[Optional[ImageRef]]]]) -> Any:
+    """
+    Turn an image reference back into something DeepFace accepts.
+
+    Args:
+        ref: Path or shared memory reference, a list of them, or None
+
+    Returns:
+        The path, a private copy of the shared array, a list of those, or None
+    """
+    if ref is None or isinstance(ref, str):
+        return ref
+    if isinstance(ref, list):
+        return [_resolve_image(item) for item in ref]
+
+    name, shape, dtype = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _detect_faces_job(
+    img_refs: Union[ImageRef, List[ImageRef]],
+    detection_refs: Optional[Union[ImageRef, List[Optional[ImageRef]]]],
+    options: Dict[str, Any]
+) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    Detect faces in a batch of frames in a worker process, measure their
+    quality and preprocess their crops for the recognition model, so only
+    small model-sized crops travel back.
+
+    Args:
+        img_refs: The full resolution frames
+        detection_refs: Optional downscaled proxies to detect on
+        options: Detection options, plus model_name and normalization for preprocessing
+
+    Returns:
+        Per frame, a list of dicts with facial_area, confidence, quality and
+        face (preprocessed, shape (1, h, w, 3)), or None if detection failed
+    """
+    from src.utils.recognition_utils import detect_faces_for_embedding_batch, preprocess_face
+    from src.utils.face_quality import measure_face_quality
+    from src.services.model_registry import model_registry
+
+    detection_options = dict(options)
+    model_name = detection_options.pop("model_name")
+    normalization = detection_options.pop("normalization")
+    model_registry.acquire(model_name, detection_options["detector_backend"])
+
+    results = detect_faces_for_embedding_batch(
+        _resolve_image(img_refs),
+        detection_imgs=_resolve_image(detection_refs),
+        **detection_options
+    )
+    for faces in results:
+        for face in faces or []:
+            face["quality"] = measure_face_quality(face["facial_area"], face["face"])
+            face["face"] = preprocess_face(face["face"], model_name=model_name, normalization=normalization)
+    return results
+
+
+def _embed_faces_job(batch_ref: ImageRef, model_name: str) -> List[List[float]]:
+    """
+    Embed a batch of preprocessed faces in a worker process.
+
+    Args:
+        batch_ref: Shared memory reference to an (n, h, w, 3) batch
+        model_name: Face recognition model to use
+
+    Returns:
+        One embedding per face, in batch order
+    """
+    from src.utils.recognition_utils import embed_preprocessed_faces
+    from src.services.model_registry import model_registry
+
+    model_registry.acquire(model_name)
+    return embed_preprocessed_faces(_resolve_image(batch_ref), model_name=model_name)
+
+
+class InferencePool:
+    """
+    Pool of long-lived worker processes running face detection and embedding.
+
+    TensorFlow forward passes block the thread that runs them, so running
+    them on the event loop froze the API while a card was processing.
+    Each worker preloads a model pair at startup and keeps further pairs
+    in its model registry as cards ask for them, so switching models does
+    not restart the workers. Frames are passed by path or, for frames
+    already decoded in memory, through shared memory.
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        Initialize the pool. Worker processes are started on first use.
+
+        Args:
+            max_workers: Number of worker processes
+        """
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._events: Optional[Any] = None
+        self._worker_models: Dict[int, Dict[str, Any]] = {}
+
+    def _get_executor(self, model_name: Optional[str], detector_backend: Optional[str]) -> ProcessPoolExecutor:
+        """
+        Return the executor, starting the workers if needed. Workers started
+        here preload the given models; a running pool loads other models on
+        demand instead of restarting.
+
+        Args:
+            model_name: Recognition model the job needs
+            detector_backend: Face detector the job needs
+
+        Returns:
+            The process pool executor
+        """
+        if self._executor is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.max_workers)
+            context = multiprocessing.get_context("spawn")
+            self._events = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # TensorFlow is not fork-safe once initialized in the parent
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(model_name, detector_backend, threads_per_worker, self._events)
+            )
+            logger.info(f"Started inference pool with {self.max_workers} workers")
+        return self._executor
+
+    async def start(self, model_name: Optional[str], detector_backend: Optional[str]) -> None:
+        """
+        Start every worker now and wait until they have loaded and warmed up
+        their models, instead of on the first frame.
+
+        Args:
+            model_name: Recognition model to preload
+            detector_backend: Face detector to preload
+        """
+        started = time.perf_counter()
+        executor = self._get_executor(model_name, detector_backend)
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*[
+            loop.run_in_executor(executor, _ping_job) for _ in range(self.max_workers)
+        ])
+        logger.info(f"Inference workers {sorted(set(pids))} warmed up with {model_name} and "
+                    f"{detector_backend} in {time.perf_counter() - started:.1f}s")
+
+    def model_stats(self) -> List[Dict[str, Any]]:
+        """
+        Latest model residency reported by each worker, keyed by the pid in
+        its report. Workers are only replaced by restarting the pool, which
+        drops the reports of the old ones.
+
+        Returns:
+            One registry snapshot per worker, see ModelRegistry.stats
+        """
+        while self._events is not None:
+            try:
+                snapshot = self._events.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            self._worker_models[snapshot["pid"]] = snapshot
+
+        return [snapshot for _, snapshot in sorted(self._worker_models.items())]
+
+    async def detect_faces_batch(
+        self,
+        imgs: List[Union[str, np.ndarray]],
+        options: Dict[str, Any],
+        detection_imgs: Optional[List[Optional[Union[str, np.ndarray]]]] = None
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Detect faces in a batch of frames with one job in a worker process.
+        Embeddings are generated separately by embed_faces, so crops from
+        many frames can share a forward pass.
+
+        Args:
+            imgs: Paths to the frame images or decoded BGR frame arrays
+            options: Keyword arguments for detect_faces_for_embedding_batch, plus model_name and normalization
+            detection_imgs: Optional downscaled proxy per frame to detect on
+
+        Returns:
+            Per frame, a list of dicts with facial_area, confidence, quality and
+            face (preprocessed crop), or None if detection failed
+        """
+        executor = self._get_executor(options["model_name"], options["detector_backend"])
+        return await self._run(executor, _detect_faces_job, [imgs, detection_imgs], options)
+
+    async def embed_faces(self, batch: np.ndarray, model_name: str) -> List[List[float]]:
+        """
+        Embed a batch of preprocessed faces with one forward pass in a worker process.
+
+        Args:
+            batch: Array of shape (n, h, w, 3) of preprocess_face outputs
+            model_name: Face recognition model to use
+
+        Returns:
+            One embedding per face, in batch order
+        """
+        executor = self._get_executor(model_name, None)
+        return await self._run(executor, _embed_faces_job, [batch], model_name)
+
+    async def _run(
+        self,
+        executor: ProcessPoolExecutor,
+        job: Callable[..., Any],
+        images: List[Optional[Union[str, np.ndarray]]],
+        *args: Any
+    ) -> Any:
+        """
+        Run a job in a worker, passing decoded images through shared memory.
+
+        Args:
+            executor: The process pool executor
+            job: Module-level job function
+            images: Images passed to the job as its leading arguments, by reference
+            args: Remaining job arguments
+
+        Returns:
+            The job's result
+        """
+        shared_blocks = []
+        try:
+            refs = [self._share(image, shared_blocks) for image in images]
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, job, *refs, *args)
+        except BrokenProcessPool:
+            # A worker died (usually out of memory); start fresh workers for the next frame
+            logger.error("Inference worker died, restarting the pool")
+            self.shutdown()
+            raise
+        finally:
+            for shm in shared_blocks:
+                shm.close()
+                shm.unlink()
+
+    @classmethod
+    def _share(cls, img: Any, shared_blocks: List[shared_memory.SharedMemory]) -> Any:
+        """
+        Copy decoded frames into shared memory so they are not pickled through a pipe.
+        A list of same-sized arrays is stacked into a single block.
+
+        Args:
+            img: Path, array, None, or a list of those
+            shared_blocks: List the created blocks are appended to, for cleanup
+
+        Returns:
+            Reference, or list of references, to pass to a worker
+        """
+        if img is None or isinstance(img, str):
+            return img
+        if isinstance(img, list):
+            if img and all(isinstance(item, np.ndarray) for item in img) \
+                    and len({(item.shape, item.dtype) for item in img}) == 1:
+                return cls._share(np.stack(img), shared_blocks)
+            return [cls._share(item, shared_blocks) for item in img]
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+        shared_blocks.append(shm)
+        np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+        return (shm.name, img.shape, img.dtype.str)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._events = None
+            self._worker_models = {}
+
+
+# Global instance
+inference_pool = InferencePool(max_workers=default_worker_count())
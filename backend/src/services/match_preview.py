@@ -0,0 +1,342 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+from src.services.graphql_client import GraphQLClient
+from src.services.processing_service import processing_service
+from src.utils.face_matcher import ConsentGallery, DISTANCE_METRICS, resolve_threshold
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cards whose previews are kept in memory
+PREVIEW_CACHE_SIZE = 8
+
+# Detections fetched per request when a preview is built
+DETECTION_PAGE_SIZE = 5000
+
+
+class MatchPreview:
+    """
+    Best distances of a card's detections to the consent gallery, computed
+    and sorted once per distance metric, the first time it is queried, so
+    that any threshold is answered with binary searches.
+
+    A detection matches at a threshold when its best distance is at most
+    the threshold, as in ConsentGallery.match, so the matched count is the
+    position of the threshold in the sorted distances, per card and per clip.
+    """
+
+    def __init__(
+        self,
+        detections: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        gallery: ConsentGallery,
+        person_names: Dict[str, str],
+        config: Dict[str, Any]
+    ):
+        """
+        Keep a card's detections and embeddings; distances are computed by prepare.
+
+        Args:
+            detections: Per detection, its detection_id, frame_id, timestamp, clip_id and filename
+            embeddings: Detection embeddings of shape (n, d), in detections order
+            gallery: The project's consent gallery
+            person_names: person_name by profile_id
+            config: The card's configuration, whose metric and threshold are the query defaults
+        """
+        self.detections = detections
+        self.gallery = gallery
+        self.person_names = person_names
+        self.config = config
+        self.created_at = time.time()
+
+        clip_ids = [detection["clip_id"] for detection in detections]
+        self.clips = list(dict.fromkeys(clip_ids))
+        self.clip_names = {detection["clip_id"]: detection["filename"] for detection in detections}
+        positions = {clip_id: i for i, clip_id in enumerate(self.clips)}
+        self._clip_index = np.asarray([positions[clip_id] for clip_id in clip_ids], dtype=np.int64)
+        # Dropped once every metric is prepared
+        self._embeddings: Optional[np.ndarray] = embeddings
+
+        # metric -> (sorted best distances, detection order, best gallery row in that order)
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # metric -> sorted best distances of each clip, in self.clips order
+        self._clip_sorted: Dict[str, List[np.ndarray]] = {}
+        # Concurrent requests may prepare metrics in different threads
+        self._lock = threading.Lock()
+
+    def prepare(self, distance_metric: str) -> None:
+        """
+        Compute and sort the best distances of every detection under a
+        metric, unless already done. Blocking; run it off the event loop.
+
+        Args:
+            distance_metric: cosine, euclidean or euclidean_l2
+        """
+        if distance_metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unsupported distance metric: {distance_metric}")
+
+        with self._lock:
+            if distance_metric in self._sorted:
+                return
+            best_rows, best_distances, _ = self.gallery.nearest(self._embeddings, distance_metric, ann_min_size=0)
+            order = np.argsort(best_distances, kind="stable")
+            by_clip = np.lexsort((best_distances, self._clip_index))
+            bounds = np.searchsorted(self._clip_index[by_clip], np.arange(1, len(self.clips)))
+            self._clip_sorted[distance_metric] = np.split(best_distances[by_clip], bounds)
+            self._sorted[distance_metric] = (best_distances[order], order, best_rows[order])
+            if len(self._sorted) == len(DISTANCE_METRICS):
+                self._embeddings = None
+
+    def query(
+        self,
+        distance_metric: Optional[str] = None,
+        threshold: Optional[float] = None,
+        borderline: int = 5
+    ) -> Dict[str, Any]:
+        """
+        What a card's matching would look like at a threshold. The first
+        query of a metric prepares it, so run queries off the event loop.
+
+        Args:
+            distance_metric: cosine, euclidean or euclidean_l2, the card's metric by default
+            threshold: Maximum distance for a match; by default the card's threshold
+                when the metric is the card's, otherwise DeepFace's default for the metric
+            borderline: Examples to return on each side of the threshold
+
+        Returns:
+            Dict with the matched and unmatched counts, the same per clip, and
+            the detections closest to the threshold on either side
+        """
+        card_metric = self.config.get('distance_metric', 'euclidean_l2')
+        distance_metric = distance_metric or card_metric
+        if threshold is None:
+            # The card's threshold is on the card's metric's scale, so other metrics use DeepFace's default
+            config = self.config if distance_metric == card_metric else {**self.config, 'threshold': None}
+            threshold = resolve_threshold({**config, 'distance_metric': distance_metric})
+        self.prepare(distance_metric)
+        distances, order, rows = self._sorted[distance_metric]
+        matched = int(np.searchsorted(distances, threshold, side="right"))
+
+        clips = []
+        for clip_id, clip_distances in zip(self.clips, self._clip_sorted[distance_metric]):
+            clip_matched = int(np.searchsorted(clip_distances, threshold, side="right"))
+            clips.append({
+                "clip_id": clip_id,
+                "filename": self.clip_names[clip_id],
+                "faces": len(clip_distances),
+                "matched": clip_matched,
+                "unmatched": len(clip_distances) - clip_matched,
+            })
+
+        return {
+            "distance_metric": distance_metric,
+            "threshold": threshold,
+            "faces": len(distances),
+            "matched": matched,
+            "unmatched": len(distances) - matched,
+            "clips": clips,
+            "borderline_matched": [
+                self._example(i, distances, order, rows) for i in range(matched - 1, max(0, matched - borderline) - 1, -1)
+            ],
+            "borderline_unmatched": [
+                self._example(i, distances, order, rows) for i in range(matched, min(len(distances), matched + borderline))
+            ],
+        }
+
+    def _example(self, position: int, distances: np.ndarray, order: np.ndarray, rows: np.ndarray) -> Dict[str, Any]:
+        """
+        Describe the detection at a position of a metric's sorted distances.
+
+        Args:
+            position: Position in the sorted distances
+            distances: Sorted best distances
+            order: Detection index at each position
+            rows: Best gallery row at each position
+
+        Returns:
+            The detection with its best distance and closest consent face,
+            which are None when the gallery is empty
+        """
+        detection = self.detections[order[position]]
+        example = {
+            "detection_id": detection["detection_id"],
+            "frame_id": detection["frame_id"],
+            "timestamp": detection["timestamp"],
+            "filename": detection["filename"],
+            "distance": None,
+            "consent_face_id": None,
+            "profile_id": None,
+            "person_name": None,
+        }
+        if np.isfinite(distances[position]):
+            profile_id = self.gallery.profile_ids[rows[position]]
+            example.update({
+                "distance": float(distances[position]),
+                "consent_face_id": self.gallery.face_ids[rows[position]],
+                "profile_id": profile_id,
+                "person_name": self.person_names.get(profile_id),
+            })
+        return example
+
+
+class MatchPreviewService:
+    """
+    Builds and caches the match previews of cards. A preview is rebuilt when
+    asked to, or when the project's consent gallery has changed since it
+    was built.
+    """
+
+    def __init__(self, graphql_client: GraphQLClient, cache_size: int = PREVIEW_CACHE_SIZE):
+        """
+        Initialize the service.
+
+        Args:
+            graphql_client: Client used to load detections
+            cache_size: Cards whose previews are kept in memory
+        """
+        self.graphql_client = graphql_client
+        self.cache_size = cache_size
+        self._previews: "OrderedDict[str, MatchPreview]" = OrderedDict()
+
+    async def get_preview(self, card_id: str, refresh: bool = False) -> Optional[MatchPreview]:
+        """
+        Get the preview of a card, building it on first use.
+
+        Args:
+            card_id: ID of the card
+            refresh: Rebuild the preview, e.g. after the card was processed again
+
+        Returns:
+            The preview, or None if the card has no configuration
+        """
+        preview = self._previews.get(card_id)
+        config = preview.config if preview and not refresh else await processing_service.get_card_config(card_id)
+        if not config:
+            return None
+
+        # The snapshot store hands out the same gallery until the consent faces change
+        embeddings_cache = await processing_service.get_consent_embeddings_cache(config['project_id'])
+        if 'gallery' not in embeddings_cache:
+            embeddings_cache['gallery'] = ConsentGallery.from_embeddings_cache(embeddings_cache)
+        gallery = embeddings_cache['gallery']
+
+        if preview is None or refresh or preview.gallery is not gallery:
+            preview = await self._build(card_id, gallery, embeddings_cache, config)
+            self._previews[card_id] = preview
+        self._previews.move_to_end(card_id)
+        while len(self._previews) > self.cache_size:
+            self._previews.popitem(last=False)
+        return preview
+
+    async def _build(
+        self,
+        card_id: str,
+        gallery: ConsentGallery,
+        embeddings_cache: Dict[str, Any],
+        config: Dict[str, Any]
+    ) -> MatchPreview:
+        """
+        Load a card's detection embeddings and compute its preview for the
+        card's metric, off the event loop.
+
+        Args:
+            card_id: ID of the card
+            gallery: The project's consent gallery
+            embeddings_cache: Dictionary of consent profile embeddings, for the person names
+            config: The card's configuration
+
+        Returns:
+            The preview
+        """
+        started = time.perf_counter()
+        detections, rows = [], []
+        after = "00000000-0000-0000-0000-000000000000"
+        while True:
+            page = await self._get_detections(card_id, after)
+            if not page:
+                break
+            after = page[-1]["detection_id"]
+            for face in page:
+                embedding = face["face_embeddings"]
+                if gallery.size and len(embedding) != gallery.dimensions:
+                    continue
+                detections.append({
+                    "detection_id": face["detection_id"],
+                    "frame_id": face["frame_id"],
+                    "timestamp": face["frame"]["timestamp"],
+                    "clip_id": face["frame"]["clip"]["clip_id"],
+                    "filename": face["frame"]["clip"]["filename"],
+                })
+                rows.append(embedding)
+
+        person_names = {
+            profile["profile_id"]: profile.get("person_name") for profile in embeddings_cache.get("profiles", [])
+        }
+
+        def build() -> MatchPreview:
+            embeddings = np.asarray(rows, dtype=np.float32).reshape(len(rows), len(rows[0]) if rows else gallery.dimensions)
+            preview = MatchPreview(detections, embeddings, gallery, person_names, config)
+            # The card's own metric is the one asked for first; the others are prepared on demand
+            preview.prepare(config.get('distance_metric', 'euclidean_l2'))
+            return preview
+
+        preview = await asyncio.to_thread(build)
+        logger.info(f"Built match preview of card {card_id}: {len(detections)} detections against "
+                    f"{gallery.size} consent faces in {time.perf_counter() - started:.2f}s")
+        return preview
+
+    async def _get_detections(self, card_id: str, after: str) -> List[Dict[str, Any]]:
+        """
+        Get a page of a card's detected faces that have an embedding, in detection_id order.
+
+        Args:
+            card_id: ID of the card
+            after: detection_id of the last face of the previous page
+
+        Returns:
+            List of detected faces with their frame and clip
+        """
+        query = """
+        query GetPreviewDetections($card_id: uuid!, $after: uuid!, $limit: Int!) {
+            detected_faces(
+                where: {
+                    frame: {clip: {card_id: {_eq: $card_id}}},
+                    face_embeddings: {_is_null: false},
+                    detection_id: {_gt: $after}
+                },
+                order_by: {detection_id: asc},
+                limit: $limit
+            ) {
+                detection_id
+                frame_id
+                face_embeddings
+                frame {
+                    timestamp
+                    clip {
+                        clip_id
+                        filename
+                    }
+                }
+            }
+        }
+        """
+
+        variables = {
+            "card_id": card_id,
+            "after": after,
+            "limit": DETECTION_PAGE_SIZE
+        }
+
+        result = await self.graphql_client.execute_async(query, variables)
+        return result.get("detected_faces", [])
+
+
+# Global instance
+match_preview_service = MatchPreviewService(GraphQLClient())
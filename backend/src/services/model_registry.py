@@ -0,0 +1,230 @@
+import os
+import gc
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+import psutil
+
+from src.config import ENV
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A detector and recognition model used together; the detector may be None
+ModelPair = Tuple[str, Optional[str]]
+
+
+class ModelRegistry:
+    """
+    Loads, warms up and keeps track of the models used in this process.
+
+    Models are loaded a (recognition model, detector) pair at a time and
+    run once on a blank input, so the first real frame does not pay for
+    graph building. Pairs are kept in LRU order; when the models they use
+    take more memory than the budget, the least recently used pairs are
+    dropped and models no other pair needs are released. Each worker
+    process has its own registry and reports its residency to the parent
+    through an optional queue.
+    """
+
+    def __init__(self, memory_budget_bytes: int):
+        """
+        Initialize the registry.
+
+        Args:
+            memory_budget_bytes: Memory the loaded models may use, measured as the RSS growth while loading
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self._pairs: "OrderedDict[ModelPair, float]" = OrderedDict()
+        self._models: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._reporter: Optional[Any] = None
+
+    def set_reporter(self, queue: Any) -> None:
+        """
+        Send a residency snapshot to queue whenever models are loaded or released.
+
+        Args:
+            queue: A multiprocessing queue read by the parent process
+        """
+        self._reporter = queue
+
+    def acquire(self, model_name: str, detector_backend: Optional[str] = None) -> None:
+        """
+        Make sure a model pair is loaded and warm, and mark it most recently used.
+
+        Args:
+            model_name: Face recognition model
+            detector_backend: Face detector, or None/"skip" for none
+        """
+        if detector_backend == "skip":
+            detector_backend = None
+        pair = (model_name, detector_backend)
+
+        with self._lock:
+            if pair in self._pairs:
+                self._pairs.move_to_end(pair)
+                self._pairs[pair] = time.time()
+                for key in self._pair_models(pair):
+                    self._models[key]["last_used"] = self._pairs[pair]
+                return
+
+            changed = False
+            for task, name in self._pair_models(pair):
+                if (task, name) not in self._models:
+                    self._models[(task, name)] = self._load(task, name)
+                    changed = True
+            self._pairs[pair] = time.time()
+            changed = self._evict() or changed
+
+        if changed:
+            self._report()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Residency snapshot of this process.
+
+        Returns:
+            Dict with pid, the loaded pairs in LRU order, the loaded models and the memory budget
+        """
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "memory_used_bytes": sum(model["memory_bytes"] for model in self._models.values()),
+                "pairs": [
+                    {"model_name": model_name, "detector_backend": detector_backend, "last_used": last_used}
+                    for (model_name, detector_backend), last_used in self._pairs.items()
+                ],
+                "models": [dict(model) for model in self._models.values()],
+            }
+
+    @staticmethod
+    def _pair_models(pair: ModelPair) -> List[Tuple[str, str]]:
+        """
+        Models a pair is made of, as (task, name).
+
+        Args:
+            pair: (model_name, detector_backend)
+
+        Returns:
+            List of (task, name)
+        """
+        model_name, detector_backend = pair
+        models = [("facial_recognition", model_name)]
+        if detector_backend:
+            models.append(("face_detector", detector_backend))
+        return models
+
+    def _load(self, task: str, name: str) -> Dict[str, Any]:
+        """
+        Load one model and run a warm-up inference.
+
+        Args:
+            task: "facial_recognition" or "face_detector"
+            name: Model name
+
+        Returns:
+            The model's registry entry
+        """
+        from deepface.modules import modeling
+        from src.utils import onnx_engine
+        from src.utils.recognition_utils import (
+            detect_faces_for_embedding, embed_preprocessed_faces, preprocess_face
+        )
+
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        started = time.perf_counter()
+
+        if task == "facial_recognition":
+            engine = "onnx" if onnx_engine.supports(name) else "tensorflow"
+            if engine == "tensorflow":
+                modeling.build_model(task=task, model_name=name)
+        else:
+            modeling.build_model(task=task, model_name=name)
+            engine = "onnx" if onnx_engine.onnx_enabled() and onnx_engine.install_detector(name) else "tensorflow"
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            if task == "facial_recognition":
+                blank = preprocess_face(np.zeros((112, 112, 3), dtype=np.float32), model_name=name)
+                embed_preprocessed_faces(blank, model_name=name)
+            else:
+                detect_faces_for_embedding(np.zeros((224, 224, 3), dtype=np.uint8), detector_backend=name)
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {str(e)}")
+        warmup_seconds = time.perf_counter() - started
+
+        memory_bytes = max(0, process.memory_info().rss - rss_before)
+        logger.info(f"Loaded {task} model {name} on {engine} in {load_seconds:.1f}s, "
+                    f"warm-up {warmup_seconds:.2f}s, ~{memory_bytes / 1024 ** 2:.0f} MB")
+        now = time.time()
+        return {
+            "task": task,
+            "name": name,
+            "engine": engine,
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(warmup_seconds, 3),
+            "memory_bytes": memory_bytes,
+            "loaded_at": now,
+            "last_used": now,
+        }
+
+    def _evict(self) -> bool:
+        """
+        Drop least recently used pairs while over the memory budget. The most
+        recently used pair is always kept.
+
+        Returns:
+            True if anything was released
+        """
+        evicted = False
+        while len(self._pairs) > 1 and \
+                sum(model["memory_bytes"] for model in self._models.values()) > self.memory_budget_bytes:
+            pair, _ = self._pairs.popitem(last=False)
+            in_use = {key for remaining in self._pairs for key in self._pair_models(remaining)}
+            for key in self._pair_models(pair):
+                if key not in in_use and key in self._models:
+                    self._release(*key)
+                    del self._models[key]
+            logger.info(f"Evicted model pair {pair} to stay within the model memory budget")
+            evicted = True
+
+        if evicted:
+            gc.collect()
+        return evicted
+
+    @staticmethod
+    def _release(task: str, name: str) -> None:
+        """
+        Drop a model from DeepFace's and the ONNX engine's caches.
+
+        Args:
+            task: "facial_recognition" or "face_detector"
+            name: Model name
+        """
+        from deepface.modules import modeling
+        from src.utils import onnx_engine
+
+        cached = getattr(modeling, "cached_models", {})
+        cached.get(task, {}).pop(name, None)
+        onnx_engine.release_model(name)
+
+    def _report(self) -> None:
+        """Send a residency snapshot to the parent process, if one is listening."""
+        if self._reporter is None:
+            return
+        try:
+            self._reporter.put_nowait(self.stats())
+        except Exception as e:
+            logger.debug(f"Could not report model residency: {str(e)}")
+
+
+# Global instance
+model_registry = ModelRegistry(memory_budget_bytes=int(float(ENV["MODEL_MEMORY_BUDGET_MB"]) * 1024 ** 2))
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from src.services.graphql_client import GraphQLClient
+from src.services.frame_analysis_service import FrameAnalysisService
+from src.services.inference_pool import inference_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ProcessingPipeline:
+    """
+    Streams a card's frames through detection, matching and visualization
+    while its clips are still being extracted.
+
+    Each stage is a set of workers reading from a bounded queue, so a full
+    downstream queue slows the stage feeding it instead of piling up work
+    in memory. Frames and faces move through the same DB statuses as in
+    the phased loop of ProcessingService.process_card, so anything left
+    unfinished (a cancellation, a crash, a failed stage) is picked up by
+    that loop on the next run.
+    """
+
+    def __init__(
+        self,
+        graphql_client: GraphQLClient,
+        task_id: str,
+        config: Dict[str, Any],
+        embeddings_cache: Dict[str, Any]
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            graphql_client: The GraphQL client for database operations
+            task_id: ID of the processing task, checked for cancellation
+            config: Configuration for processing
+            embeddings_cache: Consent profile embeddings to match against
+        """
+        self.frame_analysis_service = FrameAnalysisService(graphql_client)
+        self.task_id = task_id
+        self.config = config
+        self.embeddings_cache = embeddings_cache
+        self.cancelled = False
+
+        queue_size = max(1, int(config.get("pipeline_queue_size", 16)))
+        batch_size = max(1, int(config.get("detection_batch_size", 8)))
+        # Frames of one clip, faces of one frame, frames ready to visualize
+        self.detect_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.match_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size * batch_size)
+        self.persist_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size * batch_size)
+        # Keep every inference worker busy, with a batch queued behind each, whichever clips they come from
+        self.batch_slots = asyncio.Semaphore(inference_pool.max_workers * 2)
+
+        self.counts = {"filtered": 0, "frames": 0, "detected": 0, "faces": 0, "matched": 0, "visualized": 0, "failed": 0}
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the stage workers."""
+        detect_workers = inference_pool.max_workers * 2
+        match_workers = max(1, int(self.config.get("pipeline_match_workers", 4)))
+        persist_workers = max(1, int(self.config.get("pipeline_persist_workers", 2)))
+
+        self._workers = (
+            [asyncio.create_task(self._run_stage(self.detect_queue, self._detect_clip)) for _ in range(detect_workers)]
+            + [asyncio.create_task(self._run_stage(self.match_queue, self._match_frame)) for _ in range(match_workers)]
+            + [asyncio.create_task(self._run_stage(self.persist_queue, self._visualize_frame)) for _ in range(persist_workers)]
+        )
+        logger.info(f"Started processing pipeline with {detect_workers} detect, "
+                    f"{match_workers} match and {persist_workers} persist workers")
+
+    async def submit_frames(self, frames: List[Dict[str, Any]]) -> None:
+        """
+        Filter a clip's newly extracted frames and queue the rest for
+        detection. Blocks while the detection queue is full, which holds
+        back further extraction.
+
+        Args:
+            frames: Frame records of one clip, ordered by timestamp
+        """
+        submitted = len(frames)
+        frames = await self.frame_analysis_service.filter_blank_frames(frames, self.config)
+        self.counts["filtered"] += submitted - len(frames)
+        frames = await self.frame_analysis_service.suppress_duplicate_frames(frames, self.config)
+        self.counts["frames"] += len(frames)
+        if frames:
+            await self.detect_queue.put(frames)
+
+    async def finish(self) -> bool:
+        """
+        Wait for every queued item to pass through all stages, then stop the workers.
+
+        Returns:
+            bool: False if the task was cancelled while the pipeline was draining
+        """
+        try:
+            # Each stage queues its output before marking its input done, so joining in order drains everything
+            await self.detect_queue.join()
+            await self.match_queue.join()
+            await self.persist_queue.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+
+        logger.info(f"Pipeline finished: {self.counts['filtered']} frames filtered, "
+                    f"{self.counts['detected']}/{self.counts['frames']} frames detected, "
+                    f"{self.counts['matched']}/{self.counts['faces']} faces matched, "
+                    f"{self.counts['visualized']} frames visualized, {self.counts['failed']} failures")
+        return not self.cancelled
+
+    async def _run_stage(self, queue: asyncio.Queue, handler: Callable[[Any], Awaitable[None]]) -> None:
+        """
+        Worker loop of one stage.
+
+        Args:
+            queue: Queue the stage reads from
+            handler: Coroutine handling one item
+        """
+        while True:
+            item = await queue.get()
+            try:
+                # After a cancellation items are drained untouched and keep their DB status for the next run
+                if not self.cancelled:
+                    await handler(item)
+            except Exception as e:
+                logger.exception(f"Pipeline stage {handler.__name__} failed: {str(e)}")
+                self.counts["failed"] += 1
+            finally:
+                queue.task_done()
+
+    async def _detect_clip(self, frames: List[Dict[str, Any]]) -> None:
+        """
+        Detect faces in the frames of one clip, linking them into face tracks
+        across its detection batches, and pass them on to matching.
+
+        Args:
+            frames: Frames of one clip, ordered by timestamp
+        """
+        if not await self.frame_analysis_service.process_clip_frames(
+            frames, self.config, self.task_id, self.batch_slots, self._queue_detected
+        ):
+            self.cancelled = True
+
+    async def _queue_detected(self, finished: List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]]) -> None:
+        """
+        Record the outcome of detection for finished frames and queue them for matching.
+
+        Args:
+            finished: Pairs of a frame and its stored faces, which are None if detection failed
+        """
+        for frame, faces in finished:
+            if faces is None:
+                await self.frame_analysis_service.update_frame_status(frame["frame_id"], "error")
+                self.counts["failed"] += 1
+                continue
+
+            await self.frame_analysis_service.update_frame_status(frame["frame_id"], "detection_complete")
+            self.counts["detected"] += 1
+            # Faces that failed the quality gate are stored without an embedding and never matched
+            faces = [face for face in faces if face.get("status") != "low_quality"]
+            if faces:
+                self.counts["faces"] += len(faces)
+                await self.match_queue.put((frame, faces))
+            else:
+                await self.persist_queue.put(frame)
+
+    async def _match_frame(self, item: Tuple[Dict[str, Any], List[Dict[str, Any]]]) -> None:
+        """
+        Match the faces of one frame against the consent profiles, then pass
+        the frame on to visualization.
+
+        Args:
+            item: The frame and its stored faces
+        """
+        frame, faces = item
+        # One gallery search and bulk writes for all the faces of the frame
+        completed, failed = await self.frame_analysis_service.match_detected_faces(
+            faces, self.embeddings_cache, self.config
+        )
+        self.counts["matched"] += len(completed)
+        self.counts["failed"] += len(failed)
+
+        await self.persist_queue.put(frame)
+
+    async def _visualize_frame(self, frame: Dict[str, Any]) -> None:
+        """
+        Draw the frame's detections and mark it recognition_complete.
+
+        Args:
+            frame: Frame whose faces have all been matched
+        """
+        processed_path = await self.frame_analysis_service.visualize_frame(
+            frame["frame_id"], frame["raw_frame_image_path"]
+        )
+        if processed_path:
+            await self.frame_analysis_service.update_frame_with_processed_image(
+                frame["frame_id"], processed_path, "recognition_complete"
+            )
+            self.counts["visualized"] += 1
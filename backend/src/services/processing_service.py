@@ -1,13 +1,19 @@
 import logging
 import asyncio
-from typing import Dict, Any, List, Set, Optional
+import time
+from typing import Dict, Any, List, Set, Optional, Tuple
 import uuid
+from datetime import datetime
 import numpy as np
 
 from src.services.graphql_client import GraphQLClient
-from src.services.frame_extraction_service import FrameExtractionService
+from src.services.frame_extraction_service import FrameExtractionService, FrameSink
 from src.services.frame_analysis_service import FrameAnalysisService
+from src.services.processing_pipeline import ProcessingPipeline
 from src.utils.recognition_utils import find_bulk_embeddings
+from src.services.model_registry import model_registry
+from src.services.gallery_snapshots import gallery_snapshots
+from src.utils.datetime_utils import format_for_database
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +106,7 @@ class ProcessingService:
                 config_id
                 scene_sensitivity
                 fallback_frame_rate
+                sampling_mode
                 use_eq
                 lut_file
                 model_name
@@ -114,6 +121,15 @@ class ProcessingService:
                 refresh_database
                 anti_spoofing
                 detection_confidence_threshold
+                cascade_detector
+                cascade_mode
+                cascade_confidence_threshold
+                cascade_region_padding
+                min_face_size
+                min_face_sharpness
+                min_face_brightness
+                max_face_brightness
+                max_face_yaw
             }
             cards_by_pk(card_id: $card_id) {
                 project_id
@@ -212,7 +228,7 @@ class ProcessingService:
         mutation UpdateFaceEmbedding($face_id: uuid!, $embedding: jsonb!) {
             update_consent_faces_by_pk(
                 pk_columns: {consent_face_id: $face_id},
-                _set: {face_embedding: $embedding}
+                _set: {face_embedding: $embedding, last_updated: "now()"}
             ) {
                 consent_face_id
             }
@@ -282,7 +298,10 @@ class ProcessingService:
             # Check for cancellation before starting bulk embedding
             if await self._check_for_cancellation(task_id): return False
 
-            results = find_bulk_embeddings(
+            # Loading the models and embedding are blocking, so keep them off the event loop
+            await asyncio.to_thread(model_registry.acquire, model_name, detector_backend)
+            results = await asyncio.to_thread(
+                find_bulk_embeddings,
                 image_paths=face_paths,
                 model_name=model_name,
                 detector_backend=detector_backend,
@@ -314,6 +333,8 @@ class ProcessingService:
 
 
             logger.info(f"Finished generating consent embeddings: {updated_count} updated, {failed_count} failed.")
+            if updated_count:
+                gallery_snapshots.invalidate(project_id)
             if failed_count > 0:
                  await self.graphql_client.update_db_task(task_id, message=f"Completed embedding generation with {failed_count} failures.")
             return True
@@ -491,60 +512,179 @@ class ProcessingService:
 
     async def get_consent_embeddings_cache(self, project_id: str) -> Dict[str, Any]:
         """
-        Get all consent face embeddings for a project and structure them for quick matching
+        Get all consent face embeddings for a project and structure them for quick matching.
+        The gallery is read from its memory-mapped snapshot, which is only
+        refreshed from the database when it is due or invalidated.
         
         Args:
             project_id: ID of the project
             
         Returns:
-            Dictionary with profiles and their face embeddings
+            Dictionary with profiles and their faces, and the compiled gallery
         """
+        return await gallery_snapshots.get_embeddings_cache(self.graphql_client, project_id)
+
+    async def get_changed_consent_faces(
+        self,
+        project_id: str,
+        consent_face_ids: Optional[List[str]] = None,
+        since: Optional[datetime] = None
+    ) -> List[str]:
+        """
+        Resolve which consent faces of a project a re-match should compare against
+
+        Args:
+            project_id: ID of the project
+            consent_face_ids: Explicit consent faces, used as given
+            since: Take the consent faces updated at or after this time
+
+        Returns:
+            IDs of the consent faces; without ids or since, the faces still
+            waiting for an embedding, i.e. newly added consent forms
+        """
+        if consent_face_ids:
+            return list(consent_face_ids)
+        if since is None:
+            return [face["consent_face_id"] for face in await self.get_consent_faces_without_embeddings(project_id)]
+
         query = """
-        query GetConsentProfilesWithEmbeddings($project_id: uuid!) {
+        query GetConsentFacesUpdatedSince($project_id: uuid!, $since: timestamptz!) {
             consent_profiles(where: {project_id: {_eq: $project_id}}) {
-                profile_id
-                person_name
-                consent_faces {
+                consent_faces(where: {last_updated: {_gte: $since}}) {
                     consent_face_id
-                    face_image_path
-                    face_embedding
                 }
             }
         }
         """
-        
+
         variables = {
-            "project_id": project_id
+            "project_id": project_id,
+            "since": format_for_database(since)
         }
-        
+
         try:
             result = await self.graphql_client.execute_async(query, variables)
-            
-            if not result or "consent_profiles" not in result:
-                logger.warning(f"No consent profiles found for project: {project_id}")
-                return {"profiles": []}
-            
-            # Format the data for efficient matching
-            profiles = []
-            for profile in result["consent_profiles"]:
-                faces = []
-                for face in profile.get("consent_faces", []):
-                    faces.append({
-                        "consent_face_id": face["consent_face_id"],
-                        "embedding": face["face_embedding"]
-                    })
-                
-                profiles.append({
-                    "profile_id": profile["profile_id"],
-                    "person_name": profile["person_name"],
-                    "faces": faces
-                })
-            
-            return {"profiles": profiles}
-            
+            return [
+                face["consent_face_id"]
+                for profile in result.get("consent_profiles", [])
+                for face in profile.get("consent_faces", [])
+            ]
         except Exception as e:
-            logger.error(f"Error getting consent embeddings: {str(e)}")
-            return {"profiles": []}
+            logger.error(f"Error getting consent faces updated since {since}: {str(e)}")
+            return []
+
+    async def get_project_cards(self, project_id: str, status: str) -> List[str]:
+        """
+        Get the cards of a project in a given status
+
+        Args:
+            project_id: ID of the project
+            status: Card status to filter on
+
+        Returns:
+            List of card IDs
+        """
+        query = """
+        query GetProjectCards($project_id: uuid!, $status: String!) {
+            cards(where: {project_id: {_eq: $project_id}, status: {_eq: $status}}) {
+                card_id
+            }
+        }
+        """
+
+        variables = {
+            "project_id": project_id,
+            "status": status
+        }
+
+        try:
+            result = await self.graphql_client.execute_async(query, variables)
+            return [card["card_id"] for card in result.get("cards", [])]
+        except Exception as e:
+            logger.error(f"Error getting cards of project {project_id}: {str(e)}")
+            return []
+
+    async def rematch_project(
+        self,
+        project_id: str,
+        consent_face_ids: List[str],
+        card_tasks: List[Dict[str, Any]]
+    ) -> bool:
+        """
+        Re-match the processed cards of a project against new or changed
+        consent faces, one card after the other. Missing consent embeddings
+        are generated first; no frame is extracted or detected again.
+
+        Args:
+            project_id: ID of the project
+            consent_face_ids: IDs of the consent faces that were added or changed
+            card_tasks: One dict per card with task_id, card_id and config
+
+        Returns:
+            True if every card was re-matched
+        """
+        # Consent faces may have changed outside this process since the snapshot was checked
+        gallery_snapshots.invalidate(project_id)
+        overall_success = True
+
+        for i, card_task in enumerate(card_tasks):
+            task_id, card_id, config = card_task["task_id"], card_task["card_id"], card_task["config"]
+            try:
+                # Consent embeddings are shared by the project's cards, so they are generated once
+                if i == 0 and not await self.generate_consent_embeddings(task_id, card_id, config):
+                    await self._abandon_rematch(card_tasks, "error", "Consent embedding generation failed")
+                    return False
+
+                await self.update_card_status(card_id, "processing")
+                await self.graphql_client.update_db_task(
+                    task_id,
+                    status="processing_clips",
+                    stage="Re-matching Faces",
+                    progress=0.0,
+                    message=f"Re-matching against {len(consent_face_ids)} new or changed consent faces"
+                )
+
+                embeddings_cache = await self.get_consent_embeddings_cache(project_id)
+                frame_analysis_service = FrameAnalysisService(self.graphql_client)
+                changed_faces = await frame_analysis_service.rematch_faces(
+                    card_id, task_id, config, embeddings_cache, consent_face_ids
+                )
+
+                if changed_faces is None:
+                    if await self._check_for_cancellation(task_id):
+                        await self._abandon_rematch(card_tasks[i:], "cancelled", "Re-matching cancelled")
+                        return False
+                    raise RuntimeError("Re-matching failed")
+
+                await self.graphql_client.update_db_task(
+                    task_id,
+                    status="complete",
+                    stage="Complete",
+                    progress=1.0,
+                    message=f"Re-matched against {len(consent_face_ids)} consent faces, {changed_faces} matches changed."
+                )
+                await self.update_card_status(card_id, "complete")
+
+            except Exception as e:
+                logger.exception(f"Error re-matching card {card_id}, task {task_id}: {e}")
+                await self.graphql_client.update_db_task(task_id, status="error", stage="Error", message=f"Re-matching error: {e}")
+                await self.update_card_status(card_id, "error")
+                overall_success = False
+
+        return overall_success
+
+    async def _abandon_rematch(self, card_tasks: List[Dict[str, Any]], status: str, message: str) -> None:
+        """
+        End the tasks of a re-match that stopped early and return their cards to complete
+
+        Args:
+            card_tasks: The card tasks that were not finished
+            status: Final task status, error or cancelled
+            message: Task message
+        """
+        for card_task in card_tasks:
+            await self.graphql_client.update_db_task(card_task["task_id"], status=status, stage="Stopped", message=message)
+            await self.update_card_status(card_task["card_id"], "complete")
 
     async def process_card(self, task_id: str, card_id: str, config: Dict[str, Any]) -> bool:
         """
@@ -588,13 +728,23 @@ class ProcessingService:
             frame_extraction_service = FrameExtractionService(self.graphql_client)
             frame_analysis_service = FrameAnalysisService(self.graphql_client)
             
-            # 2. Process in a continuous loop until all work is complete
+            await self.update_card_status(card_id, "processing")
+            
+            # 2. Stream queued clips through extraction, detection and matching at once
+            if config.get("pipelined_processing", True):
+                pipeline_success = await self._run_pipeline(
+                    task_id, card_id, project_id, frame_extraction_service, config
+                )
+                if not pipeline_success:
+                    return False
+            
+            # 3. Process in a continuous loop until all work is complete. After the
+            # pipeline this only picks up leftovers, such as work resumed from an
+            # earlier run or faces found by streaming extraction
             processing_complete = False
             iteration = 0
             max_iterations = 20  # Prevent infinite loops
             
-            await self.update_card_status(card_id, "processing")
-            
             while not processing_complete and iteration < max_iterations:
                 iteration += 1
                 logger.info(f"Starting iteration {iteration} for card {card_id}, task {task_id}")
@@ -622,41 +772,12 @@ class ProcessingService:
                     )
                     
                     clips_to_process = await self.get_queued_clips(card_id)
-                    processed_clips = 0
-                    failed_clips = 0
-                    
-                    for i, clip in enumerate(clips_to_process):
-                        clip_id = clip['clip_id']
-                        clip_filename = clip['filename']
-                        
-                        # Check for cancellation periodically
-                        if i % 3 == 0 and await self._check_for_cancellation(task_id): 
-                            return False
-                            
-                        try:
-                            # Extract frames from the clip
-                            clip_success = await frame_extraction_service.process_clip(clip_id, config)
-                            
-                            if clip_success:
-                                logger.info(f"Successfully processed clip {clip_id}")
-                                processed_clips += 1
-                                await frame_extraction_service.update_clip_status(clip_id, "extraction_complete")
-                            else:
-                                logger.warning(f"Failed to process clip {clip_id}")
-                                failed_clips += 1
-                                
-                        except Exception as clip_error:
-                            logger.exception(f"Error processing clip {clip_id}: {clip_error}")
-                            failed_clips += 1
-                            await frame_extraction_service.update_clip_status(clip_id, "error", str(clip_error))
-                            
-                        # Update progress
-                        progress = (i + 1) / len(clips_to_process)
-                        await self.graphql_client.update_db_task(
-                            task_id, 
-                            progress=progress,
-                            message=f"Processed {i+1}/{len(clips_to_process)} clips. {failed_clips} failures."
-                        )
+                    clip_results = await self._extract_clips(
+                        task_id, clips_to_process, frame_extraction_service, config
+                    )
+                    if clip_results is None:
+                        return False
+                    processed_clips, failed_clips = clip_results
                     
                     if processed_clips > 0:
                         work_done = True
@@ -734,7 +855,7 @@ class ProcessingService:
                     logger.warning(f"Processing stopped with {final_status['total_items']} items still pending")
                     overall_success = False
             
-            # 3. Finalize
+            # 4. Finalize
             final_message = f"Processing complete after {iteration} iterations."
             if not overall_success:
                 final_message += " Some items may not have been processed completely."
@@ -757,6 +878,166 @@ class ProcessingService:
             await self.update_card_status(card_id, "error")
             return False
 
+    async def _run_pipeline(
+        self,
+        task_id: str,
+        card_id: str,
+        project_id: str,
+        frame_extraction_service: FrameExtractionService,
+        config: Dict[str, Any]
+    ) -> bool:
+        """
+        Extract the card's queued clips while their frames flow through face
+        detection, matching and visualization in a ProcessingPipeline.
+        
+        Args:
+            task_id: The ID of the task record in the database.
+            card_id: ID of the card to process
+            project_id: ID of the project the card belongs to
+            frame_extraction_service: Service used to extract each clip
+            config: Configuration for processing
+            
+        Returns:
+            bool: False if the task was cancelled
+        """
+        clips_to_process = await self.get_queued_clips(card_id)
+        if not clips_to_process:
+            return True
+        
+        await self.graphql_client.update_db_task(
+            task_id,
+            status="processing_clips",
+            stage="Extracting Frames and Detecting Faces",
+            progress=0.0,
+            message=f"Processing {len(clips_to_process)} queued clips"
+        )
+        
+        embeddings_cache = await self.get_consent_embeddings_cache(project_id)
+        pipeline = ProcessingPipeline(self.graphql_client, task_id, config, embeddings_cache)
+        pipeline.start()
+        
+        try:
+            clip_results = await self._extract_clips(
+                task_id, clips_to_process, frame_extraction_service, config,
+                frame_sink=pipeline.submit_frames
+            )
+        finally:
+            await self.graphql_client.update_db_task(
+                task_id,
+                stage="Detecting and Matching Faces",
+                message="Finishing face detection and matching for extracted frames"
+            )
+            pipeline_success = await pipeline.finish()
+        
+        await self._update_clip_statuses(card_id)
+        
+        if clip_results is None:
+            return False
+        if not pipeline_success:
+            # The pipeline only observes a cancellation; let the usual check record it and pause the card
+            await self._check_for_cancellation(task_id)
+            return False
+        return True
+
+    async def _extract_clips(
+        self,
+        task_id: str,
+        clips: List[Dict[str, Any]],
+        frame_extraction_service: FrameExtractionService,
+        config: Dict[str, Any],
+        frame_sink: Optional[FrameSink] = None
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Extract frames from clips concurrently. At most max_concurrent_extractions
+        clips from this card are extracted at once; the FFmpeg processes they start
+        are further limited machine-wide by FrameExtractor.
+        
+        Args:
+            task_id: The ID of the task record in the database.
+            clips: Clips to extract frames from
+            frame_extraction_service: Service used to extract each clip
+            config: Configuration for processing
+            frame_sink: Optional coroutine receiving each clip's frame records once extracted
+            
+        Returns:
+            Tuple of (processed, failed) clip counts, or None if the task was cancelled
+        """
+        card_slots = asyncio.Semaphore(max(1, int(config.get("max_concurrent_extractions", 4))))
+        total_clips = len(clips)
+        counts = {"processed": 0, "failed": 0, "finished": 0}
+        cancelled = False
+        
+        # Fraction extracted and throughput (media seconds per second) of each clip in flight
+        clip_progress: Dict[str, Tuple[float, Optional[float]]] = {}
+        last_report = 0.0
+        
+        async def report_clip_progress(clip_id: str, fraction: float, throughput: Optional[float]) -> None:
+            nonlocal last_report
+            clip_progress[clip_id] = (fraction, throughput)
+            now = time.monotonic()
+            if now - last_report < 1.0:
+                return
+            last_report = now
+            
+            in_flight = sum(clip_fraction for clip_fraction, _ in clip_progress.values())
+            message = (f"Processed {counts['finished']}/{total_clips} clips, "
+                       f"{len(clip_progress)} extracting")
+            total_throughput = sum(rate for _, rate in clip_progress.values() if rate)
+            if total_throughput:
+                message += f" at {total_throughput:.1f}x realtime"
+            await self.graphql_client.update_db_task(
+                task_id,
+                progress=min((counts["finished"] + in_flight) / total_clips, 1.0),
+                message=message
+            )
+        
+        async def extract_clip(clip: Dict[str, Any]) -> None:
+            nonlocal cancelled
+            clip_id = clip['clip_id']
+            
+            async def progress_callback(fraction: float, throughput: Optional[float]) -> None:
+                await report_clip_progress(clip_id, fraction, throughput)
+            
+            async with card_slots:
+                if cancelled:
+                    return
+                if await self._check_for_cancellation(task_id):
+                    cancelled = True
+                    return
+                
+                try:
+                    # Extract frames from the clip; it is marked extraction_complete as soon as its FFmpeg run ends
+                    clip_success = await frame_extraction_service.process_clip(
+                        clip_id, config, progress_callback, frame_sink
+                    )
+                    
+                    if clip_success:
+                        logger.info(f"Successfully processed clip {clip_id}")
+                        counts["processed"] += 1
+                    else:
+                        logger.warning(f"Failed to process clip {clip_id}")
+                        counts["failed"] += 1
+                        
+                except Exception as clip_error:
+                    logger.exception(f"Error processing clip {clip_id}: {clip_error}")
+                    counts["failed"] += 1
+                    await frame_extraction_service.update_clip_status(clip_id, "error", str(clip_error))
+            
+            # Update progress
+            clip_progress.pop(clip_id, None)
+            counts["finished"] += 1
+            await self.graphql_client.update_db_task(
+                task_id, 
+                progress=counts["finished"] / total_clips,
+                message=f"Processed {counts['finished']}/{total_clips} clips. {counts['failed']} failures."
+            )
+        
+        await asyncio.gather(*(extract_clip(clip) for clip in clips))
+        
+        if cancelled:
+            return None
+        return counts["processed"], counts["failed"]
+
     async def _update_clip_statuses(self, card_id: str) -> bool:
         """
         Check if all frames for clips are processed, and if so,
@@ -0,0 +1,409 @@
+import math
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+from deepface.modules import verification
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Detections compared against the gallery per matrix product, bounding the distance matrix
+MATCH_CHUNK_ROWS = 4096
+
+DISTANCE_METRICS = ("cosine", "euclidean", "euclidean_l2")
+
+# Galleries smaller than this are always searched exhaustively
+ANN_MIN_GALLERY_SIZE = 5000
+# Inverted lists searched per detection, and candidates kept for exact re-ranking
+ANN_PROBES = 8
+ANN_TOP_K = 10
+
+
+def search_options(config: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Read the gallery search settings from a card config.
+
+    Args:
+        config: Configuration parameters for face matching
+
+    Returns:
+        Keyword arguments for ConsentGallery.nearest and match
+    """
+    return {
+        "ann_min_size": int(config.get('ann_min_gallery_size', ANN_MIN_GALLERY_SIZE)),
+        "n_probe": int(config.get('ann_probes', ANN_PROBES)),
+        "top_k": int(config.get('ann_top_k', ANN_TOP_K)),
+    }
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving zero rows at zero."""
+    norms = np.linalg.norm(vectors, axis=1)
+    return vectors / np.maximum(norms, 1e-12)[:, np.newaxis]
+
+
+class IVFIndex:
+    """
+    Inverted file index over L2-normalized embeddings.
+
+    Spherical k-means splits the gallery into about sqrt(n) lists; a
+    detection is only compared with the rows of the lists whose centroids
+    are closest to it. The index only picks candidates: their distances
+    are computed exactly by the gallery.
+    """
+
+    def __init__(self, normalized: np.ndarray, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """
+        Build the index.
+
+        Args:
+            normalized: L2-normalized gallery rows of shape (n, d)
+            n_lists: Number of inverted lists, about sqrt(n) by default
+            iterations: k-means iterations
+            seed: Seed for picking the initial centroids
+        """
+        count = len(normalized)
+        n_lists = min(count, n_lists or max(1, int(round(math.sqrt(count)))))
+        rng = np.random.default_rng(seed)
+
+        centroids = normalized[rng.choice(count, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = self._assign(normalized, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, normalized)
+            members = np.bincount(assignments, minlength=n_lists)
+            empty = members == 0
+            # Reseed empty lists on random rows so every list stays in use
+            sums[empty] = normalized[rng.choice(count, int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+
+        assignments = self._assign(normalized, centroids)
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(1, n_lists))
+        self.centroids = centroids
+        self.list_rows = np.split(order, boundaries)
+
+    @staticmethod
+    def _assign(normalized: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """
+        Nearest centroid of each row.
+
+        Args:
+            normalized: L2-normalized rows
+            centroids: L2-normalized centroids
+
+        Returns:
+            Centroid index per row
+        """
+        assignments = np.empty(len(normalized), dtype=np.int64)
+        for start in range(0, len(normalized), MATCH_CHUNK_ROWS):
+            chunk = normalized[start:start + MATCH_CHUNK_ROWS]
+            assignments[start:start + len(chunk)] = (chunk @ centroids.T).argmax(axis=1)
+        return assignments
+
+    def probe(self, normalized_queries: np.ndarray, n_probe: int) -> np.ndarray:
+        """
+        The lists each detection should be compared with.
+
+        Args:
+            normalized_queries: L2-normalized detection embeddings of shape (m, d)
+            n_probe: Lists per detection
+
+        Returns:
+            List indices of shape (m, n_probe)
+        """
+        n_probe = max(1, min(n_probe, len(self.centroids)))
+        if n_probe == len(self.centroids):
+            return np.tile(np.arange(n_probe), (len(normalized_queries), 1))
+        similarity = normalized_queries @ self.centroids.T
+        return np.argpartition(-similarity, n_probe - 1, axis=1)[:, :n_probe]
+
+
+def resolve_threshold(config: Dict[str, Any]) -> float:
+    """
+    The distance threshold for a match: the card's threshold, or DeepFace's
+    default for the model and metric.
+
+    Args:
+        config: Configuration parameters for face matching
+
+    Returns:
+        The threshold
+    """
+    threshold = config.get('threshold')
+    if threshold is None:
+        threshold = verification.find_threshold(
+            config.get('model_name', 'Facenet512'),
+            config.get('distance_metric', 'euclidean_l2')
+        )
+    return float(threshold)
+
+
+class ConsentGallery:
+    """
+    The consent embeddings of a project compiled into one float32 matrix.
+
+    Rows are grouped by profile, with row-to-face and row-to-profile index
+    arrays, and the L2-normalized rows and squared norms are precomputed,
+    so any number of detections is matched with one matrix product per
+    chunk instead of a Python loop over every pair.
+
+    Galleries of at least ann_min_size rows are searched through an
+    IVFIndex built on first use, and the top_k candidates per detection are
+    re-ranked exactly with the configured metric.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        face_ids: List[str],
+        profile_ids: List[str],
+        normalized: Optional[np.ndarray] = None
+    ):
+        """
+        Initialize the gallery.
+
+        Args:
+            embeddings: Consent embeddings of shape (n, d), rows of the same profile adjacent
+            face_ids: consent_face_id of each row
+            profile_ids: profile_id of each row
+            normalized: Precomputed L2-normalized embeddings, e.g. mapped from a snapshot
+        """
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.face_ids = np.asarray(face_ids, dtype=object)
+        self.profile_ids = np.asarray(profile_ids, dtype=object)
+        self.size, self.dimensions = self.embeddings.shape
+
+        norms = np.linalg.norm(self.embeddings, axis=1)
+        self.squared_norms = norms ** 2
+        if normalized is None:
+            normalized = self.embeddings / np.maximum(norms, 1e-12)[:, np.newaxis]
+        self.normalized = np.ascontiguousarray(normalized, dtype=np.float32)
+
+        # Start row of each profile's block, for per-profile minimums
+        boundaries = np.flatnonzero(self.profile_ids[1:] != self.profile_ids[:-1]) + 1 if self.size else []
+        self.profile_starts = np.concatenate([[0], boundaries]).astype(np.int64) if self.size else np.zeros(0, np.int64)
+        self._index: Optional[IVFIndex] = None
+
+    def get_index(self) -> IVFIndex:
+        """
+        The gallery's approximate search index, built on first use.
+
+        Returns:
+            The index
+        """
+        if self._index is None:
+            self._index = IVFIndex(self.normalized)
+            logger.info(f"Built gallery index with {len(self._index.list_rows)} lists over {self.size} consent faces")
+        return self._index
+
+    @classmethod
+    def from_embeddings_cache(cls, embeddings_cache: Dict[str, Any]) -> "ConsentGallery":
+        """
+        Compile a gallery from the consent embeddings cache.
+
+        Args:
+            embeddings_cache: Dict with profiles, each with faces holding consent_face_id and embedding
+
+        Returns:
+            The compiled gallery; faces without an embedding, or with a
+            different length than the first embedding, are left out
+        """
+        rows, face_ids, profile_ids = [], [], []
+        dimensions = None
+        skipped = 0
+        for profile in embeddings_cache.get('profiles', []):
+            for face in profile['faces']:
+                embedding = face.get('embedding')
+                if embedding is None:
+                    continue
+                if dimensions is None:
+                    dimensions = len(embedding)
+                if len(embedding) != dimensions:
+                    skipped += 1
+                    continue
+                rows.append(embedding)
+                face_ids.append(face['consent_face_id'])
+                profile_ids.append(profile['profile_id'])
+
+        if skipped:
+            logger.warning(f"Left {skipped} consent embeddings of a different size out of the gallery")
+        embeddings = np.asarray(rows, dtype=np.float32).reshape(len(rows), dimensions or 0)
+        return cls(embeddings, face_ids, profile_ids)
+
+    def distances(self, queries: np.ndarray, distance_metric: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Distances between detections and gallery rows, with the same
+        definitions as DeepFace's verification.find_distance.
+
+        Args:
+            queries: Detection embeddings of shape (m, d)
+            distance_metric: cosine, euclidean or euclidean_l2
+            rows: Gallery rows to compare with, all of them by default
+
+        Returns:
+            Distance matrix of shape (m, len(rows))
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.shape[1] != self.dimensions:
+            raise ValueError(f"Embeddings have {queries.shape[1]} dimensions, the gallery has {self.dimensions}")
+        if rows is None:
+            rows = slice(None)
+
+        if distance_metric == "euclidean":
+            squared = (queries ** 2).sum(axis=1)[:, np.newaxis] + self.squared_norms[rows] \
+                - 2 * (queries @ self.embeddings[rows].T)
+            return np.sqrt(np.maximum(squared, 0))
+
+        similarity = _normalize_rows(queries) @ self.normalized[rows].T
+        if distance_metric == "cosine":
+            return 1 - similarity
+        if distance_metric == "euclidean_l2":
+            return np.sqrt(np.maximum(2 - 2 * similarity, 0))
+        raise ValueError(f"Unsupported distance metric: {distance_metric}")
+
+    def nearest(
+        self,
+        queries: np.ndarray,
+        distance_metric: str,
+        ann_min_size: int = ANN_MIN_GALLERY_SIZE,
+        n_probe: int = ANN_PROBES,
+        top_k: int = ANN_TOP_K
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Closest gallery row of each detection, and the distance to the
+        closest face of any other profile.
+
+        Args:
+            queries: Detection embeddings of shape (m, d)
+            distance_metric: cosine, euclidean or euclidean_l2
+            ann_min_size: Gallery size from which the approximate index is used
+            n_probe: Inverted lists searched per detection
+            top_k: Candidates per detection re-ranked exactly
+
+        Returns:
+            best_rows (m,), best_distances (m,) and second_distances (m,),
+            the latter inf when no other profile was found, and always inf
+            when the approximate index is used
+        """
+        count = len(queries)
+        best_rows = np.zeros(count, dtype=np.int64)
+        best_distances = np.full(count, np.inf)
+        second_distances = np.full(count, np.inf)
+        if self.size == 0 or count == 0:
+            return best_rows, best_distances, second_distances
+
+        if ann_min_size > 0 and self.size >= ann_min_size:
+            for start in range(0, count, MATCH_CHUNK_ROWS):
+                chunk = slice(start, start + MATCH_CHUNK_ROWS)
+                best_rows[chunk], best_distances[chunk], second_distances[chunk] = self._nearest_approximate(
+                    np.asarray(queries[chunk], dtype=np.float32), distance_metric, n_probe, max(2, top_k)
+                )
+            return best_rows, best_distances, second_distances
+
+        for start in range(0, count, MATCH_CHUNK_ROWS):
+            chunk = slice(start, start + MATCH_CHUNK_ROWS)
+            distances = self.distances(queries[chunk], distance_metric)
+            best_rows[chunk] = distances.argmin(axis=1)
+            best_distances[chunk] = distances[np.arange(distances.shape[0]), best_rows[chunk]]
+            if len(self.profile_starts) > 1:
+                per_profile = np.minimum.reduceat(distances, self.profile_starts, axis=1)
+                second_distances[chunk] = np.partition(per_profile, 1, axis=1)[:, 1]
+        return best_rows, best_distances, second_distances
+
+    def _nearest_approximate(
+        self,
+        queries: np.ndarray,
+        distance_metric: str,
+        n_probe: int,
+        top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        nearest() through the IVF index: each detection keeps its top_k
+        exact distances over the rows of its probed lists. The closest other
+        profile is rarely among those candidates, so its distance is not
+        reported rather than overstated.
+
+        Args:
+            queries: Detection embeddings of shape (m, d), at most MATCH_CHUNK_ROWS
+            distance_metric: cosine, euclidean or euclidean_l2
+            n_probe: Inverted lists searched per detection
+            top_k: Candidates per detection re-ranked exactly
+
+        Returns:
+            best_rows (m,), best_distances (m,) and second_distances (m,), all inf
+        """
+        index = self.get_index()
+        count = len(queries)
+        probes = index.probe(_normalize_rows(queries), n_probe)
+
+        # Invert the probes into the detections each list is compared with
+        probed_lists = probes.ravel()
+        probing_queries = np.repeat(np.arange(count), probes.shape[1])
+        order = np.argsort(probed_lists, kind="stable")
+        starts = np.searchsorted(probed_lists[order], np.arange(len(index.list_rows) + 1))
+
+        top_distances = np.full((count, top_k), np.inf)
+        top_rows = np.full((count, top_k), -1, dtype=np.int64)
+        for list_id, rows in enumerate(index.list_rows):
+            members = probing_queries[order[starts[list_id]:starts[list_id + 1]]]
+            if len(rows) == 0 or len(members) == 0:
+                continue
+
+            distances = self.distances(queries[members], distance_metric, rows)
+            if len(rows) > top_k:
+                keep = np.argpartition(distances, top_k - 1, axis=1)[:, :top_k]
+                distances = np.take_along_axis(distances, keep, axis=1)
+                candidates = rows[keep]
+            else:
+                candidates = np.broadcast_to(rows, distances.shape)
+
+            merged_distances = np.concatenate([top_distances[members], distances], axis=1)
+            merged_rows = np.concatenate([top_rows[members], candidates], axis=1)
+            keep = np.argpartition(merged_distances, top_k - 1, axis=1)[:, :top_k]
+            top_distances[members] = np.take_along_axis(merged_distances, keep, axis=1)
+            top_rows[members] = np.take_along_axis(merged_rows, keep, axis=1)
+
+        # Exact re-rank of the candidates
+        best = top_distances.argmin(axis=1)
+        best_rows = np.maximum(top_rows[np.arange(count), best], 0)
+        best_distances = top_distances[np.arange(count), best]
+        return best_rows, best_distances, np.full(count, np.inf)
+
+    def match(
+        self,
+        queries: np.ndarray,
+        distance_metric: str,
+        threshold: float,
+        **search: int
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Match detections against the gallery.
+
+        Args:
+            queries: Detection embeddings of shape (m, d)
+            distance_metric: cosine, euclidean or euclidean_l2
+            threshold: Maximum distance for a match
+            search: Search settings for nearest(), see search_options
+
+        Returns:
+            Per detection, a dict with consent_face_id, profile_id, distance,
+            second_distance (closest other profile, or None when there is
+            none or the approximate index was used) and threshold,
+            or None if no consent face is within the threshold
+        """
+        best_rows, best_distances, second_distances = self.nearest(queries, distance_metric, **search)
+        matches: List[Optional[Dict[str, Any]]] = []
+        for row, distance, second in zip(best_rows, best_distances, second_distances):
+            if distance > threshold:
+                matches.append(None)
+                continue
+            matches.append({
+                'consent_face_id': self.face_ids[row],
+                'profile_id': self.profile_ids[row],
+                'distance': float(distance),
+                'second_distance': float(second) if np.isfinite(second) else None,
+                'threshold': threshold,
+            })
+        return matches
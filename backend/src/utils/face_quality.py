@@ -0,0 +1,110 @@
+import math
+from typing import Dict, List, Any
+
+import cv2
+import numpy as np
+
+# Side the crop is resized to before measuring sharpness, so faces of any size are comparable
+SHARPNESS_SIZE = 112
+
+# Default gate thresholds; a threshold set to None or 0 is not applied
+DEFAULT_QUALITY_THRESHOLDS = {
+    "min_face_size": 24,
+    "min_face_sharpness": 10.0,
+    "min_face_brightness": 30.0,
+    "max_face_brightness": 235.0,
+    "max_face_yaw": 60.0,
+}
+
+
+def measure_face_quality(facial_area: Dict[str, Any], face: np.ndarray) -> Dict[str, float]:
+    """
+    Measure how usable a detected face is for recognition.
+
+    Args:
+        facial_area: Facial area in full resolution coordinates, with optional eye landmarks
+        face: RGB float face crop in [0, 1], as returned by detect_faces_for_embedding
+
+    Returns:
+        Dict with size (shorter side of the box in pixels), sharpness
+        (Laplacian variance), brightness (mean grey level 0-255), and yaw
+        and roll in degrees estimated from the eye landmarks (0 when the
+        detector gives no landmarks)
+    """
+    gray = cv2.cvtColor((np.clip(face, 0.0, 1.0) * 255).astype(np.uint8), cv2.COLOR_RGB2GRAY)
+    brightness = float(gray.mean())
+    sharpness = float(cv2.Laplacian(
+        cv2.resize(gray, (SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA), cv2.CV_64F
+    ).var())
+
+    yaw = roll = 0.0
+    left_eye, right_eye = facial_area.get("left_eye"), facial_area.get("right_eye")
+    if left_eye and right_eye and facial_area["w"] > 0:
+        # The midpoint of the eyes drifts from the box centre as the head turns
+        eyes_mid_x = (left_eye[0] + right_eye[0]) / 2
+        box_mid_x = facial_area["x"] + facial_area["w"] / 2
+        offset = min(1.0, 2 * abs(eyes_mid_x - box_mid_x) / facial_area["w"])
+        yaw = math.degrees(math.asin(offset))
+        roll = abs(math.degrees(math.atan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0])))
+        roll = min(roll, 180.0 - roll)
+
+    return {
+        "size": float(min(facial_area["w"], facial_area["h"])),
+        "sharpness": round(sharpness, 2),
+        "brightness": round(brightness, 2),
+        "yaw": round(yaw, 1),
+        "roll": round(roll, 1),
+    }
+
+
+def quality_thresholds(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read the gate thresholds from a card config, falling back to the defaults.
+
+    Args:
+        config: Configuration parameters for face detection
+
+    Returns:
+        Threshold name to value
+    """
+    return {name: config.get(name, default) for name, default in DEFAULT_QUALITY_THRESHOLDS.items()}
+
+
+def quality_failures(quality: Dict[str, float], thresholds: Dict[str, Any]) -> List[str]:
+    """
+    Check measured quality against the gate thresholds.
+
+    Args:
+        quality: Metrics from measure_face_quality
+        thresholds: Thresholds from quality_thresholds
+
+    Returns:
+        The reasons the face fails the gate, empty if it passes
+    """
+    failures = []
+    if thresholds.get("min_face_size") and quality["size"] < float(thresholds["min_face_size"]):
+        failures.append("too_small")
+    if thresholds.get("min_face_sharpness") and quality["sharpness"] < float(thresholds["min_face_sharpness"]):
+        failures.append("blurred")
+    if thresholds.get("min_face_brightness") and quality["brightness"] < float(thresholds["min_face_brightness"]):
+        failures.append("too_dark")
+    if thresholds.get("max_face_brightness") and quality["brightness"] > float(thresholds["max_face_brightness"]):
+        failures.append("too_bright")
+    if thresholds.get("max_face_yaw") and quality["yaw"] > float(thresholds["max_face_yaw"]):
+        failures.append("extreme_pose")
+    return failures
+
+
+def face_quality_score(quality: Dict[str, float]) -> float:
+    """
+    Rank detections of the same face by how good they are for recognition:
+    larger, sharper and more frontal faces score higher.
+
+    Args:
+        quality: Metrics from measure_face_quality
+
+    Returns:
+        Quality score, higher is better
+    """
+    frontalness = math.cos(math.radians(quality["yaw"]))
+    return quality["size"] ** 2 * (1.0 + quality["sharpness"]) * (0.1 + frontalness)
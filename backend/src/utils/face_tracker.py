@@ -0,0 +1,158 @@
+import uuid
+from typing import List, Dict, Optional, Any
+
+import cv2
+import numpy as np
+
+# Side of the grayscale thumbnails compared to confirm two detections show the same face
+APPEARANCE_THUMBNAIL_SIZE = 16
+
+
+def box_iou(area_a: Dict[str, Any], area_b: Dict[str, Any]) -> float:
+    """
+    Intersection over union of two facial areas.
+
+    Args:
+        area_a: First facial area with x, y, w, h
+        area_b: Second facial area with x, y, w, h
+
+    Returns:
+        IoU between 0 and 1
+    """
+    x1 = max(area_a["x"], area_b["x"])
+    y1 = max(area_a["y"], area_b["y"])
+    x2 = min(area_a["x"] + area_a["w"], area_b["x"] + area_b["w"])
+    y2 = min(area_a["y"] + area_a["h"], area_b["y"] + area_b["h"])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = area_a["w"] * area_a["h"] + area_b["w"] * area_b["h"] - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _thumbnail(face: np.ndarray) -> np.ndarray:
+    """
+    Zero-mean, unit-norm grayscale thumbnail of a preprocessed face crop.
+
+    Args:
+        face: Face crop of shape (1, h, w, 3) or (h, w, 3)
+
+    Returns:
+        Flattened thumbnail
+    """
+    img = np.asarray(face, dtype=np.float32).reshape(face.shape[-3:])
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (APPEARANCE_THUMBNAIL_SIZE, APPEARANCE_THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+    small = small.flatten() - small.mean()
+    norm = np.linalg.norm(small)
+    return small / norm if norm > 0 else small
+
+
+def appearance_similarity(face_a: np.ndarray, face_b: np.ndarray) -> float:
+    """
+    Cheap appearance check between two face crops, used instead of an
+    embedding because the point of tracking is to avoid embedding every face.
+
+    Args:
+        face_a: First preprocessed face crop
+        face_b: Second preprocessed face crop
+
+    Returns:
+        Normalized correlation of the thumbnails, between -1 and 1
+    """
+    return float(np.dot(_thumbnail(face_a), _thumbnail(face_b)))
+
+
+class FaceTrackLinker:
+    """
+    Links the detections of one clip's frames into tracks, one batch of
+    consecutive frames at a time, so that tracks carry on from one batch
+    to the next.
+
+    A detection continues a track from the previous frame when their boxes
+    overlap by at least iou_threshold and their crops look alike; pairs are
+    taken greedily, highest IoU first. Tracks end at frames that failed
+    detection, at frames without faces and at frames starting a new shot.
+    Every face gets a track_id, which is also written into its facial_area.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, similarity_threshold: float = 0.5):
+        """
+        Initialize a linker with no open tracks.
+
+        Args:
+            iou_threshold: Minimum box overlap to continue a track
+            similarity_threshold: Minimum appearance similarity to continue a track
+        """
+        self.iou_threshold = iou_threshold
+        self.similarity_threshold = similarity_threshold
+        # Tracks that the next frame may continue, each a list of faces in frame order
+        self.active: List[List[Dict[str, Any]]] = []
+
+    def link(
+        self,
+        frames_faces: List[Optional[List[Dict[str, Any]]]],
+        shot_starts: Optional[List[bool]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Link the detections of the frames following those linked so far.
+
+        Args:
+            frames_faces: Per frame in timestamp order, the detected faces (with
+                facial_area and preprocessed face), or None if detection failed
+            shot_starts: Per frame, whether it starts a new shot
+
+        Returns:
+            The tracks that ended within these frames; the others stay in active
+        """
+        ended: List[List[Dict[str, Any]]] = []
+
+        for i, faces in enumerate(frames_faces):
+            if not faces or (shot_starts and shot_starts[i]):
+                ended += self.active
+                self.active = []
+                if not faces:
+                    continue
+
+            candidates = sorted(
+                (
+                    (box_iou(track[-1]["facial_area"], face["facial_area"]), t, f)
+                    for t, track in enumerate(self.active)
+                    for f, face in enumerate(faces)
+                ),
+                key=lambda candidate: candidate[0],
+                reverse=True
+            )
+
+            continued: Dict[int, List[Dict[str, Any]]] = {}
+            used_tracks = set()
+            for overlap, t, f in candidates:
+                if overlap < self.iou_threshold:
+                    break
+                if t in used_tracks or f in continued:
+                    continue
+                if appearance_similarity(self.active[t][-1]["face"], faces[f]["face"]) < self.similarity_threshold:
+                    continue
+                used_tracks.add(t)
+                continued[f] = self.active[t]
+
+            ended += [track for t, track in enumerate(self.active) if t not in used_tracks]
+
+            next_active = []
+            for f, face in enumerate(faces):
+                track = continued.get(f, [])
+                face["track_id"] = track[0]["track_id"] if track else str(uuid.uuid4())
+                face["facial_area"]["track_id"] = face["track_id"]
+                track.append(face)
+                next_active.append(track)
+            self.active = next_active
+
+        return ended
+
+    def close(self) -> List[List[Dict[str, Any]]]:
+        """
+        End every open track, at the end of the clip.
+
+        Returns:
+            The tracks that were still open
+        """
+        ended, self.active = self.active, []
+        return ended
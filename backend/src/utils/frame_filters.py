@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Any
+
+import cv2
+import numpy as np
+
+# Side of the thumbnails the filters look at; enough to tell a slate from a scene
+FILTER_THUMBNAIL_SIZE = 64
+
+# Rules in the order they are checked; a frame is reported under the first rule it fails
+FILTER_RULES = ("black", "blank", "no_skin")
+
+# Default thresholds; a threshold of 0 disables its rule
+DEFAULT_FILTER_THRESHOLDS = {
+    # Mean luma (0-255) below which a frame is black leader or a fade
+    "min_frame_luminance": 10.0,
+    # Luma standard deviation below which a frame is a flat field, e.g. a blank slate
+    "min_frame_contrast": 3.0,
+    # Fraction of skin-toned pixels below which a frame cannot show a face; off by default
+    "min_skin_fraction": 0.0,
+}
+
+# BT.601 luma weights in OpenCV's BGR channel order
+_LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+def frame_thumbnail(img: np.ndarray) -> np.ndarray:
+    """
+    Shrink a frame to the thumbnail the filters work on.
+
+    Args:
+        img: BGR uint8 frame
+
+    Returns:
+        BGR uint8 thumbnail of FILTER_THUMBNAIL_SIZE x FILTER_THUMBNAIL_SIZE
+    """
+    return cv2.resize(img, (FILTER_THUMBNAIL_SIZE, FILTER_THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def filter_thresholds(config: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Read the filter thresholds from a card config, falling back to the defaults.
+
+    Args:
+        config: Configuration parameters for face detection
+
+    Returns:
+        Threshold name to value
+    """
+    return {
+        name: float(config.get(name, default) or 0)
+        for name, default in DEFAULT_FILTER_THRESHOLDS.items()
+    }
+
+
+def classify_frames(thumbnails: np.ndarray, thresholds: Dict[str, float]) -> List[Optional[str]]:
+    """
+    Find frames that cannot contain a detectable face, all frames at once.
+
+    Args:
+        thumbnails: Stacked BGR uint8 thumbnails of shape (n, h, w, 3)
+        thresholds: Thresholds from filter_thresholds
+
+    Returns:
+        Per frame, the first rule in FILTER_RULES it fails, or None to keep it
+    """
+    if len(thumbnails) == 0:
+        return []
+
+    pixels = thumbnails.astype(np.float32)
+    luma = pixels @ _LUMA_WEIGHTS
+    rejected = {
+        "black": luma.mean(axis=(1, 2)) < thresholds["min_frame_luminance"],
+        "blank": luma.std(axis=(1, 2)) < thresholds["min_frame_contrast"],
+    }
+
+    if thresholds["min_skin_fraction"] > 0:
+        # Skin falls in a compact box of the YCrCb chroma plane whatever the ethnicity
+        cr = (pixels[..., 2] - luma) * 0.713 + 128
+        cb = (pixels[..., 0] - luma) * 0.564 + 128
+        skin = (cr >= 133) & (cr <= 173) & (cb >= 77) & (cb <= 127)
+        rejected["no_skin"] = skin.mean(axis=(1, 2)) < thresholds["min_skin_fraction"]
+
+    reasons: List[Optional[str]] = [None] * len(thumbnails)
+    for rule in reversed(FILTER_RULES):
+        if rule in rejected:
+            for i in np.flatnonzero(rejected[rule]):
+                reasons[i] = rule
+    return reasons
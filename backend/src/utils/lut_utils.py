@@ -0,0 +1,158 @@
+import os
+import logging
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows of an image graded per step, bounding the temporary arrays of the interpolation
+GRADE_CHUNK_ROWS = 256
+
+# Parsed LUTs keyed by (path, mtime_ns), so an edited file is parsed again
+_lut_cache: Dict[Tuple[str, int], "CubeLut"] = {}
+_lut_cache_lock = threading.Lock()
+
+
+class CubeLut:
+    """
+    A parsed 3D lookup table from an Adobe/Resolve .cube file.
+
+    The table is indexed [r, g, b] and holds output RGB values.
+    """
+
+    def __init__(self, title: str, table: np.ndarray, domain_min: np.ndarray, domain_max: np.ndarray):
+        self.title = title
+        self.table = table
+        self.size = table.shape[0]
+        self.domain_min = domain_min
+        self.domain_max = domain_max
+
+
+def parse_cube_lut(path: str) -> CubeLut:
+    """
+    Parse a .cube file into a 3D lookup table.
+
+    Args:
+        path: Path to the .cube file
+
+    Returns:
+        The parsed LUT
+
+    Raises:
+        ValueError: If the file is not a valid 3D .cube LUT
+    """
+    title = os.path.basename(path)
+    size = None
+    domain_min = np.zeros(3, dtype=np.float32)
+    domain_max = np.ones(3, dtype=np.float32)
+    values = []
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = line.split(None, 1)
+            keyword = parts[0]
+            if keyword == "TITLE":
+                # Some exporters write the keyword with no title, which keeps the file name
+                if len(parts) > 1 and parts[1].strip('"'):
+                    title = parts[1].strip('"')
+            elif keyword == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+            elif keyword == "LUT_1D_SIZE":
+                raise ValueError(f"{path} is a 1D LUT, only 3D LUTs are supported")
+            elif keyword == "DOMAIN_MIN":
+                domain_min = np.array(line.split()[1:4], dtype=np.float32)
+            elif keyword == "DOMAIN_MAX":
+                domain_max = np.array(line.split()[1:4], dtype=np.float32)
+            elif keyword[0].isdigit() or keyword[0] in "-.":
+                values.append(line.split()[:3])
+
+    if size is None:
+        raise ValueError(f"{path} has no LUT_3D_SIZE")
+    if len(values) != size ** 3:
+        raise ValueError(f"{path} has {len(values)} entries, expected {size ** 3}")
+
+    # Red varies fastest in the file, so the rows come out indexed [b, g, r]
+    table = np.array(values, dtype=np.float32).reshape(size, size, size, 3)
+    table = np.ascontiguousarray(table.transpose(2, 1, 0, 3))
+
+    return CubeLut(title, table, domain_min, domain_max)
+
+
+def load_cube_lut(path: str) -> CubeLut:
+    """
+    Load a .cube LUT, reusing the parsed table while the file is unchanged.
+
+    Args:
+        path: Path to the .cube file
+
+    Returns:
+        The parsed LUT
+    """
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    with _lut_cache_lock:
+        lut = _lut_cache.get(key)
+    if lut is None:
+        lut = parse_cube_lut(path)
+        logger.info(f"Loaded LUT '{lut.title}' ({lut.size}^3) from {path}")
+        with _lut_cache_lock:
+            _lut_cache[key] = lut
+    return lut
+
+
+def apply_lut(img: np.ndarray, lut: CubeLut) -> np.ndarray:
+    """
+    Colour grade an image with a 3D LUT using trilinear interpolation.
+
+    Args:
+        img: BGR uint8 image, as loaded by OpenCV
+        lut: LUT to apply
+
+    Returns:
+        Graded BGR uint8 image of the same shape
+    """
+    graded = np.empty_like(img)
+    for start in range(0, img.shape[0], GRADE_CHUNK_ROWS):
+        rows = img[start:start + GRADE_CHUNK_ROWS]
+        graded[start:start + GRADE_CHUNK_ROWS] = _apply_lut_chunk(rows, lut)
+    return graded
+
+
+def _apply_lut_chunk(img: np.ndarray, lut: CubeLut) -> np.ndarray:
+    """
+    Grade a block of image rows with trilinear interpolation.
+
+    Args:
+        img: BGR uint8 image rows
+        lut: LUT to apply
+
+    Returns:
+        Graded BGR uint8 image rows
+    """
+    n = lut.size
+    rgb = img[..., ::-1].astype(np.float32) / 255.0
+    rgb = (rgb - lut.domain_min) / (lut.domain_max - lut.domain_min)
+    position = np.clip(rgb, 0.0, 1.0) * (n - 1)
+
+    lower = np.minimum(position.astype(np.int32), n - 2)
+    fraction = position - lower
+    r0, g0, b0 = lower[..., 0], lower[..., 1], lower[..., 2]
+    fr, fg, fb = fraction[..., 0:1], fraction[..., 1:2], fraction[..., 2:3]
+
+    table = lut.table
+    # Interpolate along blue, then green, then red between the eight surrounding lattice points
+    c00 = table[r0, g0, b0] + (table[r0, g0, b0 + 1] - table[r0, g0, b0]) * fb
+    c01 = table[r0, g0 + 1, b0] + (table[r0, g0 + 1, b0 + 1] - table[r0, g0 + 1, b0]) * fb
+    c10 = table[r0 + 1, g0, b0] + (table[r0 + 1, g0, b0 + 1] - table[r0 + 1, g0, b0]) * fb
+    c11 = table[r0 + 1, g0 + 1, b0] + (table[r0 + 1, g0 + 1, b0 + 1] - table[r0 + 1, g0 + 1, b0]) * fb
+    c0 = c00 + (c01 - c00) * fg
+    c1 = c10 + (c11 - c10) * fg
+    out = c0 + (c1 - c0) * fr
+
+    return (np.clip(out, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)[..., ::-1]
@@ -0,0 +1,374 @@
+import os
+import fcntl
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+from src.config import ENV
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Detectors whose network can be swapped for an ONNX session
+ONNX_DETECTORS = {"retinaface"}
+
+# Opened sessions keyed by (artifact name, quantized)
+_sessions: Dict[Tuple[str, bool], "OnnxModel"] = {}
+_sessions_lock = threading.Lock()
+# Models that failed to convert or load, which stay on TensorFlow
+_unsupported: set = set()
+# Threads per session, 0 lets ONNX Runtime use every core
+_intra_op_threads = 0
+
+
+@lru_cache(maxsize=None)
+def onnx_enabled() -> bool:
+    """
+    Whether INFERENCE_ENGINE selects ONNX Runtime and it is installed.
+
+    Returns:
+        True if models should run through ONNX Runtime
+    """
+    if ENV["INFERENCE_ENGINE"].lower() != "onnx":
+        return False
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("INFERENCE_ENGINE is onnx but onnxruntime is not installed, using TensorFlow")
+        return False
+
+
+def set_intra_op_threads(threads: int) -> None:
+    """
+    Limit the threads of sessions opened from now on, for worker processes
+    that share the machine.
+
+    Args:
+        threads: Threads per session
+    """
+    global _intra_op_threads
+    _intra_op_threads = threads
+
+
+def quantize_enabled() -> bool:
+    """
+    Whether ONNX models should be dynamically quantized to int8.
+
+    Returns:
+        True if ONNX_QUANTIZE is set
+    """
+    return ENV["ONNX_QUANTIZE"].lower() in ("1", "true", "yes")
+
+
+class OnnxModel:
+    """
+    A converted model running on ONNX Runtime's CPU provider.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open an inference session.
+
+        Args:
+            path: Path to the .onnx file
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = _intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_shape = self.session.get_inputs()[0].shape
+
+    def run(self, batch: np.ndarray) -> List[np.ndarray]:
+        """
+        Run a forward pass.
+
+        Args:
+            batch: Model input
+
+        Returns:
+            The model outputs, in the order of the source network
+        """
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})
+
+
+class _OnnxOutput:
+    """An ONNX output that quacks like the eager tensors retinaface expects."""
+
+    def __init__(self, value: np.ndarray):
+        self.value = value
+
+    def numpy(self) -> np.ndarray:
+        return self.value
+
+
+class OnnxRetinaFaceNet:
+    """
+    Stands in for the Keras network held by DeepFace's RetinaFace client.
+    The retinaface package calls the network on a preprocessed image and
+    reads each output with .numpy(), so anchor decoding and NMS stay as they are.
+    """
+
+    def __init__(self, model: OnnxModel):
+        self.model = model
+
+    def __call__(self, im_tensor: Any) -> List[_OnnxOutput]:
+        return [_OnnxOutput(output) for output in self.model.run(np.asarray(im_tensor))]
+
+
+def _artifact_path(name: str, quantized: bool) -> str:
+    """
+    Path of a converted model in the ONNX cache.
+
+    Args:
+        name: Model name
+        quantized: Whether this is the int8 variant
+
+    Returns:
+        Path to the .onnx file
+    """
+    import deepface
+
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return os.path.join(ENV["ONNX_MODEL_DIR"], f"{name}-deepface{deepface.__version__}{suffix}")
+
+
+def _keras_network(name: str, task: str) -> Tuple[Any, Tuple[Optional[int], ...]]:
+    """
+    Load the Keras network to convert and the input shape to export it with.
+
+    Args:
+        name: Model name
+        task: "facial_recognition" or "face_detector"
+
+    Returns:
+        The Keras network and its input shape, batch dimension first
+    """
+    from deepface.modules import modeling
+
+    client = modeling.build_model(task=task, model_name=name)
+    if task == "face_detector":
+        # RetinaFace takes any image size, one image at a time
+        return client.model, (1, None, None, 3)
+    return client.model, (None,) + tuple(client.model.input_shape[1:])
+
+
+def _convert(name: str, task: str, path: str) -> None:
+    """
+    Convert a DeepFace Keras network to ONNX.
+
+    Args:
+        name: Model name
+        task: "facial_recognition" or "face_detector"
+        path: Where to write the .onnx file
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    network, input_shape = _keras_network(name, task)
+    signature = [tf.TensorSpec(input_shape, tf.float32, name="input")]
+    tmp_path = f"{path}.tmp"
+    tf2onnx.convert.from_keras(network, input_signature=signature, opset=13, output_path=tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Converted {name} to ONNX at {path}")
+
+
+def _quantize(source_path: str, path: str) -> None:
+    """
+    Quantize the weights of an ONNX model to int8.
+
+    Args:
+        source_path: The float model
+        path: Where to write the quantized model
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tmp_path = f"{path}.tmp"
+    quantize_dynamic(source_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, path)
+    logger.info(f"Quantized {source_path} to int8 at {path}")
+
+
+def export_model(name: str, task: str = "facial_recognition", quantized: bool = False) -> str:
+    """
+    Return the cached ONNX artifact of a model, converting it first if needed.
+
+    Conversion loads the TensorFlow model once; later runs only read the
+    .onnx file. A file lock keeps concurrent workers from converting the
+    same model twice.
+
+    Args:
+        name: Model name, e.g. Facenet512 or retinaface
+        task: "facial_recognition" or "face_detector"
+        quantized: Whether to return the int8 variant
+
+    Returns:
+        Path to the .onnx file
+    """
+    path = _artifact_path(name, quantized)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(ENV["ONNX_MODEL_DIR"], exist_ok=True)
+    with open(os.path.join(ENV["ONNX_MODEL_DIR"], f"{name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            float_path = _artifact_path(name, False)
+            if not os.path.exists(float_path):
+                _convert(name, task, float_path)
+            if quantized and not os.path.exists(path):
+                _quantize(float_path, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
+
+
+def get_model(name: str, task: str = "facial_recognition", quantized: Optional[bool] = None) -> OnnxModel:
+    """
+    Return an open session for a model, exporting it on first use.
+
+    Args:
+        name: Model name
+        task: "facial_recognition" or "face_detector"
+        quantized: Whether to use the int8 variant, defaults to ONNX_QUANTIZE
+
+    Returns:
+        The ONNX model
+    """
+    if quantized is None:
+        quantized = quantize_enabled()
+    key = (name, quantized)
+    with _sessions_lock:
+        model = _sessions.get(key)
+        if model is None:
+            model = OnnxModel(export_model(name, task, quantized))
+            _sessions[key] = model
+            logger.info(f"Loaded ONNX model {model.path}")
+    return model
+
+
+def release_model(name: str) -> None:
+    """
+    Close the sessions of a model, float and quantized.
+
+    Args:
+        name: Model name
+    """
+    with _sessions_lock:
+        for key in [key for key in _sessions if key[0] == name]:
+            del _sessions[key]
+
+
+def supports(name: str, task: str = "facial_recognition") -> bool:
+    """
+    Whether a model should run on ONNX Runtime: the engine is enabled and
+    the model converted and loaded. A model that fails is logged once and
+    left on TensorFlow.
+
+    Args:
+        name: Model name
+        task: "facial_recognition" or "face_detector"
+
+    Returns:
+        True if the model runs on ONNX Runtime
+    """
+    if not onnx_enabled() or name in _unsupported:
+        return False
+    try:
+        get_model(name, task)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not run {name} on ONNX Runtime, using TensorFlow: {str(e)}")
+        _unsupported.add(name)
+        return False
+
+
+def recognition_input_size(model_name: str) -> Tuple[int, int]:
+    """
+    Input size of a converted recognition model, in DeepFace's (width, height) order.
+
+    Args:
+        model_name: Face recognition model
+
+    Returns:
+        (width, height)
+    """
+    _, height, width, _ = get_model(model_name).input_shape
+    return int(width), int(height)
+
+
+def embed(batch: np.ndarray, model_name: str) -> List[List[float]]:
+    """
+    Embed a batch of preprocessed faces with ONNX Runtime.
+
+    Args:
+        batch: Array of shape (n, height, width, 3) of preprocess_face outputs
+        model_name: Face recognition model
+
+    Returns:
+        One embedding per face, in batch order
+    """
+    return get_model(model_name).run(batch)[0].astype(np.float64).tolist()
+
+
+def install_detector(detector_backend: str) -> bool:
+    """
+    Swap the network inside DeepFace's cached detector client for its ONNX
+    session. Detection keeps going through DeepFace, so its pre and
+    post-processing are unchanged.
+
+    Args:
+        detector_backend: Face detector backend
+
+    Returns:
+        True if the detector now runs on ONNX Runtime
+    """
+    if detector_backend not in ONNX_DETECTORS or not supports(detector_backend, task="face_detector"):
+        return False
+
+    from deepface.modules import modeling
+
+    client = modeling.build_model(task="face_detector", model_name=detector_backend)
+    if not isinstance(client.model, OnnxRetinaFaceNet):
+        client.model = OnnxRetinaFaceNet(get_model(detector_backend, task="face_detector"))
+    return True
+
+
+def parity_report(batch: np.ndarray, model_name: str, quantized: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Compare ONNX embeddings with the TensorFlow embeddings of the same faces.
+
+    Args:
+        batch: Array of shape (n, height, width, 3) of preprocess_face outputs
+        model_name: Face recognition model
+        quantized: Whether to check the int8 variant, defaults to ONNX_QUANTIZE
+
+    Returns:
+        Dict with the face count and the min, mean and max cosine similarity
+        between the two engines, plus the largest absolute difference
+    """
+    from deepface.modules import modeling
+
+    reference = np.asarray(
+        modeling.build_model(task="facial_recognition", model_name=model_name).model(batch, training=False)
+    )
+    converted = get_model(model_name, quantized=quantized).run(batch)[0]
+
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(converted, axis=1)
+    cosine = np.sum(reference * converted, axis=1) / np.maximum(norms, 1e-12)
+    return {
+        "model_name": model_name,
+        "quantized": quantize_enabled() if quantized is None else quantized,
+        "faces": len(batch),
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_max": float(cosine.max()),
+        "max_abs_diff": float(np.abs(reference - converted).max()),
+    }
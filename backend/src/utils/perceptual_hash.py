@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+
+def dhash(img: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right-hand
+    neighbour, so visually similar frames produce hashes that differ in
+    only a few bits.
+
+    Args:
+        img: BGR or grayscale image
+        hash_size: Number of bits per row and column of the hash
+
+    Returns:
+        The hash as an integer of hash_size * hash_size bits
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """
+    Count the bits that differ between two hashes.
+
+    Args:
+        hash_a: First hash
+        hash_b: Second hash
+
+    Returns:
+        Number of differing bits
+    """
+    return bin(hash_a ^ hash_b).count("1")
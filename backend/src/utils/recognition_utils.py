@@ -21,12 +21,18 @@ from werkzeug.datastructures import FileStorage
 
 # project dependencies
 from deepface.commons import image_utils
-from deepface.modules import representation, detection, verification
+from deepface.modules import detection, verification, modeling, preprocessing
 from deepface.commons.logger import Logger
 
+from src.utils import onnx_engine
+from src.utils.face_tracker import box_iou
+
 IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
 PIL_EXTS = {"jpeg", "png"}
 
+# Long edge, in pixels, of the image the cascade's cheap detector screens
+CASCADE_SCREEN_SIZE = 640
+
 
 
 
@@ -258,6 +264,9 @@ def find_bulk_embeddings(
     Returns:
         List of dicts containing image metadata and embeddings
     """
+    if onnx_engine.onnx_enabled():
+        onnx_engine.install_detector(detector_backend)
+
     representations = []
     for image_path in tqdm(
         image_paths,
@@ -294,16 +303,10 @@ def find_bulk_embeddings(
             for img_obj in img_objs:
                 img_content = img_obj["face"]
                 img_region = img_obj["facial_area"]
-                embedding_obj = representation.represent(
-                    img_path=img_content,
+                img_representation = embed_preprocessed_faces(
+                    preprocess_face(img_content, model_name=model_name, normalization=normalization),
                     model_name=model_name,
-                    enforce_detection=enforce_detection,
-                    detector_backend="skip",
-                    align=align,
-                    normalization=normalization,
-                )
-
-                img_representation = embedding_obj[0]["embedding"]
+                )[0]
                 representations.append({
                     "identity": image_path,
                     "hash": file_hash,
@@ -314,4 +317,423 @@ def find_bulk_embeddings(
                     "target_h": img_region["h"],
                 })
 
-    return representations
\ No newline at end of file
+    return representations
+
+
+def detect_faces_for_embedding(
+    img: Union[str, np.ndarray],
+    detector_backend: str = "retinaface",
+    enforce_detection: bool = False,
+    align: bool = True,
+    expand_percentage: int = 0,
+    confidence_threshold: float = 0.5,
+    detection_img: Optional[Union[str, np.ndarray]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Detect faces in a single frame and return the aligned crop of each face
+    that meets the confidence threshold, ready for preprocess_face.
+
+    Args:
+        img: Path to the frame image or a decoded BGR numpy array
+        detector_backend: Face detector backend
+        enforce_detection: Whether to enforce face detection
+        align: Whether to align detected faces
+        expand_percentage: Percentage to expand detected face area
+        confidence_threshold: Minimum detector confidence for a face to be kept
+        detection_img: Optional downscaled copy of the frame to run detection on
+
+    Returns:
+        List of dicts with facial_area (in full resolution coordinates),
+        confidence and face (RGB float crop in [0, 1]) for each kept face
+    """
+    if onnx_engine.onnx_enabled():
+        onnx_engine.install_detector(detector_backend)
+
+    if detection_img is not None:
+        detection_img, _ = load_image(detection_img)
+
+    face_objs = detection.extract_faces(
+        img_path=img if detection_img is None else detection_img,
+        detector_backend=detector_backend,
+        enforce_detection=enforce_detection,
+        # Proxy crops are discarded, so only align the full resolution crops
+        align=align if detection_img is None else False,
+        expand_percentage=expand_percentage,
+        grayscale=False,
+    )
+
+    full_img = None
+    faces = []
+    for face_obj in face_objs:
+        confidence = face_obj["confidence"]
+        if confidence < confidence_threshold:
+            continue
+
+        facial_area = build_facial_area(face_obj["facial_area"])
+        face_img = face_obj["face"]
+
+        if detection_img is not None:
+            if full_img is None:
+                full_img, _ = load_image(img)
+            facial_area = scale_facial_area(
+                facial_area,
+                full_img.shape[1] / detection_img.shape[1],
+                full_img.shape[0] / detection_img.shape[0],
+            )
+            face_img = crop_face_region(full_img, facial_area, align)
+            if face_img is None:
+                continue
+
+        faces.append({
+            "facial_area": facial_area,
+            "confidence": float(confidence),
+            "face": face_img,
+        })
+
+    return faces
+
+
+def detect_faces_for_embedding_batch(
+    imgs: Union[List[Union[str, np.ndarray]], np.ndarray],
+    detection_imgs: Optional[Union[List[Optional[Union[str, np.ndarray]]], np.ndarray]] = None,
+    detector_backend: str = "retinaface",
+    enforce_detection: bool = False,
+    align: bool = True,
+    expand_percentage: int = 0,
+    confidence_threshold: float = 0.5,
+    cascade_detector: Optional[str] = None,
+    cascade_mode: str = "frame",
+    cascade_confidence_threshold: float = 0.3,
+    cascade_region_padding: float = 0.5,
+) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    Detect faces in several frames in one call.
+
+    The detectors wrapped by DeepFace take a single image per forward
+    pass, so the frames are run through a tight loop with the detector
+    resolved once up front. A frame that fails does not fail the others.
+
+    Args:
+        imgs: Frame paths, decoded BGR arrays, or a stacked (n, h, w, 3) array
+        detection_imgs: Optional downscaled proxy per frame, in the same order
+        detector_backend: Face detector backend
+        enforce_detection: Whether to enforce face detection
+        align: Whether to align detected faces
+        expand_percentage: Percentage to expand detected face area
+        confidence_threshold: Minimum detector confidence for a face to be kept
+        cascade_detector: Optional cheap detector that screens each frame first, see detect_faces_cascade
+        cascade_mode: "frame" or "regions", see detect_faces_cascade
+        cascade_confidence_threshold: Minimum cheap detector confidence for a candidate
+        cascade_region_padding: Padding around candidates in regions mode, as a fraction of the box size
+
+    Returns:
+        Per frame, the list returned by detect_faces_for_embedding, or None if detection failed
+    """
+    if detector_backend != "skip":
+        modeling.build_model(task="face_detector", model_name=detector_backend)
+    if cascade_detector:
+        modeling.build_model(task="face_detector", model_name=cascade_detector)
+
+    detection_options = {
+        "detector_backend": detector_backend,
+        "enforce_detection": enforce_detection,
+        "align": align,
+        "expand_percentage": expand_percentage,
+        "confidence_threshold": confidence_threshold,
+    }
+
+    results = []
+    for i, img in enumerate(imgs):
+        detection_img = detection_imgs[i] if detection_imgs is not None else None
+        try:
+            if cascade_detector:
+                results.append(detect_faces_cascade(
+                    img,
+                    detection_img=detection_img,
+                    cascade_detector=cascade_detector,
+                    cascade_mode=cascade_mode,
+                    cascade_confidence_threshold=cascade_confidence_threshold,
+                    cascade_region_padding=cascade_region_padding,
+                    **detection_options,
+                ))
+            else:
+                results.append(detect_faces_for_embedding(img, detection_img=detection_img, **detection_options))
+        except Exception as err:
+            logger.error(f"Face detection failed for frame {i} of batch: {str(err)}")
+            results.append(None)
+    return results
+
+
+def screen_for_faces(
+    img: Union[str, np.ndarray],
+    cascade_detector: str = "opencv",
+    cascade_confidence_threshold: float = 0.3,
+) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Look for face candidates with a cheap detector on a small copy of the frame.
+    Args:
+        img: Path to the frame image or a decoded BGR numpy array
+        cascade_detector: DeepFace detector backend to screen with, e.g. opencv, ssd or yunet
+        cascade_confidence_threshold: Minimum confidence for a candidate
+    Returns:
+        candidates (list): facial areas in screened image coordinates
+        screen (np.ndarray): the screened image
+    """
+    screen, _ = load_image(img)
+    screen = resize_to_long_edge(screen, CASCADE_SCREEN_SIZE)
+    detector = modeling.build_model(task="face_detector", model_name=cascade_detector)
+    candidates = [
+        build_facial_area({"x": region.x, "y": region.y, "w": region.w, "h": region.h})
+        for region in detector.detect_faces(screen)
+        if (region.confidence or 0) >= cascade_confidence_threshold
+    ]
+    return candidates, screen
+
+
+def detect_faces_cascade(
+    img: Union[str, np.ndarray],
+    detection_img: Optional[Union[str, np.ndarray]] = None,
+    cascade_detector: str = "opencv",
+    cascade_mode: str = "frame",
+    cascade_confidence_threshold: float = 0.3,
+    cascade_region_padding: float = 0.5,
+    **detection_options: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Two-tier detection: a cheap detector screens the frame and the
+    expensive backend only runs where it found candidates.
+
+    In "frame" mode the expensive backend runs on the whole frame when the
+    screen found any candidate. In "regions" mode it runs only on the
+    padded candidate regions of the full resolution frame, and detections
+    from overlapping regions are merged.
+
+    Args:
+        img: Path to the frame image or a decoded BGR numpy array
+        detection_img: Optional downscaled copy of the frame
+        cascade_detector: DeepFace detector backend to screen with
+        cascade_mode: "frame" or "regions"
+        cascade_confidence_threshold: Minimum cheap detector confidence for a candidate
+        cascade_region_padding: Padding around candidates in regions mode, as a fraction of the box size
+        detection_options: Remaining keyword arguments for detect_faces_for_embedding
+
+    Returns:
+        The same as detect_faces_for_embedding
+    """
+    candidates, screen = screen_for_faces(
+        detection_img if detection_img is not None else img,
+        cascade_detector=cascade_detector,
+        cascade_confidence_threshold=cascade_confidence_threshold,
+    )
+    if not candidates:
+        return []
+
+    if cascade_mode != "regions":
+        return detect_faces_for_embedding(img, detection_img=detection_img, **detection_options)
+
+    full_img, _ = load_image(img)
+    img_h, img_w = full_img.shape[:2]
+    scale_x, scale_y = img_w / screen.shape[1], img_h / screen.shape[0]
+
+    faces: List[Dict[str, Any]] = []
+    for candidate in candidates:
+        area = scale_facial_area(candidate, scale_x, scale_y)
+        pad_x = int(area["w"] * cascade_region_padding)
+        pad_y = int(area["h"] * cascade_region_padding)
+        x0, y0 = max(0, area["x"] - pad_x), max(0, area["y"] - pad_y)
+        x1, y1 = min(img_w, area["x"] + area["w"] + pad_x), min(img_h, area["y"] + area["h"] + pad_y)
+        if x1 <= x0 or y1 <= y0:
+            continue
+
+        for face in detect_faces_for_embedding(full_img[y0:y1, x0:x1], **detection_options):
+            face["facial_area"] = offset_facial_area(face["facial_area"], x0, y0)
+            duplicate = next(
+                (kept for kept in faces if box_iou(kept["facial_area"], face["facial_area"]) > 0.5), None
+            )
+            if duplicate is None:
+                faces.append(face)
+            elif face["confidence"] > duplicate["confidence"]:
+                faces[faces.index(duplicate)] = face
+
+    return faces
+
+
+def preprocess_face(face: np.ndarray, model_name: str = "Facenet512", normalization: str = "base") -> np.ndarray:
+    """
+    Prepare a face crop for the recognition model the same way
+    representation.represent does: RGB to BGR, resize and pad to the model's
+    input shape, then normalize.
+
+    Args:
+        face: RGB float face crop in [0, 1], as returned by detect_faces_for_embedding
+        model_name: Face recognition model the face is prepared for
+        normalization: Normalization technique for face images
+
+    Returns:
+        Array of shape (1, height, width, 3)
+    """
+    if onnx_engine.supports(model_name):
+        target_size = onnx_engine.recognition_input_size(model_name)
+    else:
+        target_size = modeling.build_model(task="facial_recognition", model_name=model_name).input_shape
+
+    img = face[:, :, ::-1]
+    img = preprocessing.resize_image(img=img, target_size=(target_size[1], target_size[0]))
+    return preprocessing.normalize_input(img=img, normalization=normalization)
+
+
+def embed_preprocessed_faces(batch: np.ndarray, model_name: str = "Facenet512") -> List[List[float]]:
+    """
+    Generate embeddings for a batch of preprocessed faces with a single
+    forward pass of the recognition model, on ONNX Runtime when
+    INFERENCE_ENGINE selects it.
+
+    Args:
+        batch: Array of shape (n, height, width, 3) built from preprocess_face outputs
+        model_name: Face recognition model to use
+
+    Returns:
+        One embedding per face, in batch order
+    """
+    if onnx_engine.supports(model_name):
+        return onnx_engine.embed(batch, model_name)
+
+    model = modeling.build_model(task="facial_recognition", model_name=model_name)
+    try:
+        return model.model(batch, training=False).numpy().tolist()
+    except Exception:
+        # Models that are not Keras networks (e.g. Dlib, SFace) only embed one face per call
+        return [
+            np.asarray(model.forward(batch[i:i + 1]), dtype=np.float64).tolist()
+            for i in range(len(batch))
+        ]
+
+
+def build_facial_area(region: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the facial area stored for a detection from a detector region.
+    Args:
+        region: facial_area returned by DeepFace
+    Returns:
+        facial_area (dict): integer box with eye coordinates when available
+    """
+    facial_area = {
+        "x": int(region["x"]),
+        "y": int(region["y"]),
+        "w": int(region["w"]),
+        "h": int(region["h"]),
+    }
+    # Add eye coordinates if available
+    if "left_eye" in region:
+        facial_area["left_eye"] = region["left_eye"]
+    if "right_eye" in region:
+        facial_area["right_eye"] = region["right_eye"]
+    return facial_area
+
+
+def scale_facial_area(facial_area: Dict[str, Any], scale_x: float, scale_y: float) -> Dict[str, Any]:
+    """
+    Map a facial area found on a resized frame back to the original frame.
+    Args:
+        facial_area: facial area in resized frame coordinates
+        scale_x: original width divided by resized width
+        scale_y: original height divided by resized height
+    Returns:
+        facial_area (dict): facial area in original frame coordinates
+    """
+    scaled = {
+        "x": int(round(facial_area["x"] * scale_x)),
+        "y": int(round(facial_area["y"] * scale_y)),
+        "w": int(round(facial_area["w"] * scale_x)),
+        "h": int(round(facial_area["h"] * scale_y)),
+    }
+    for eye in ("left_eye", "right_eye"):
+        if eye in facial_area:
+            point = facial_area[eye]
+            scaled[eye] = None if point is None else (
+                int(round(point[0] * scale_x)),
+                int(round(point[1] * scale_y)),
+            )
+    return scaled
+
+
+def offset_facial_area(facial_area: Dict[str, Any], offset_x: int, offset_y: int) -> Dict[str, Any]:
+    """
+    Map a facial area found in a crop back to the frame the crop was taken from.
+    Args:
+        facial_area: facial area in crop coordinates
+        offset_x: left edge of the crop in the frame
+        offset_y: top edge of the crop in the frame
+    Returns:
+        facial_area (dict): facial area in frame coordinates
+    """
+    shifted = dict(facial_area)
+    shifted["x"] = facial_area["x"] + offset_x
+    shifted["y"] = facial_area["y"] + offset_y
+    for eye in ("left_eye", "right_eye"):
+        point = facial_area.get(eye)
+        if point is not None:
+            shifted[eye] = (int(point[0]) + offset_x, int(point[1]) + offset_y)
+    return shifted
+
+
+def crop_face_region(
+    img: np.ndarray, facial_area: Dict[str, Any], align: bool = True
+) -> Optional[np.ndarray]:
+    """
+    Crop a face from a BGR frame in the format DeepFace's extract_faces
+    returns it (RGB, float in [0, 1]), optionally levelling the eyes first.
+    Args:
+        img: BGR frame
+        facial_area: facial area in frame coordinates
+        align: rotate around the face centre so that the eyes are level
+    Returns:
+        face (np.ndarray or None): the cropped face, None if the box is empty
+    """
+    img_h, img_w = img.shape[:2]
+    x, y, w, h = facial_area["x"], facial_area["y"], facial_area["w"], facial_area["h"]
+    if w <= 0 or h <= 0:
+        return None
+
+    # Work on a padded sub image so rotation never pulls in empty corners
+    # and a 4K frame is never rotated as a whole
+    pad = max(w, h)
+    x1, y1 = max(0, x - pad), max(0, y - pad)
+    x2, y2 = min(img_w, x + w + pad), min(img_h, y + h + pad)
+    sub_img = img[y1:y2, x1:x2]
+
+    left_eye = facial_area.get("left_eye")
+    right_eye = facial_area.get("right_eye")
+    if align and left_eye is not None and right_eye is not None:
+        angle = float(np.degrees(np.arctan2(
+            left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]
+        )))
+        center = (x + w / 2 - x1, y + h / 2 - y1)
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        sub_img = cv2.warpAffine(
+            sub_img, rotation, (sub_img.shape[1], sub_img.shape[0]), flags=cv2.INTER_CUBIC
+        )
+
+    face = sub_img[max(0, y - y1):max(0, y - y1) + h, max(0, x - x1):max(0, x - x1) + w]
+    if face.size == 0:
+        return None
+    return face[:, :, ::-1].astype(np.float32) / 255.0
+
+
+def resize_to_long_edge(img: np.ndarray, max_size: int) -> np.ndarray:
+    """
+    Downscale an image so that its longer side is at most max_size pixels.
+    Args:
+        img: image to resize
+        max_size: maximum length of the longer side
+    Returns:
+        img (np.ndarray): the resized image, or the input if already small enough
+    """
+    img_h, img_w = img.shape[:2]
+    factor = max_size / max(img_h, img_w)
+    if factor >= 1:
+        return img
+    return cv2.resize(
+        img, (max(1, int(round(img_w * factor))), max(1, int(round(img_h * factor)))),
+        interpolation=cv2.INTER_AREA,
+    )
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from deepface.modules import verification
+
+from src.utils.face_matcher import DISTANCE_METRICS, ConsentGallery, IVFIndex
+
+
+def random_gallery(profiles: int = 5, faces_per_profile: int = 3, dimensions: int = 16, seed: int = 0) -> ConsentGallery:
+    """Gallery of random embeddings, faces_per_profile adjacent rows per profile."""
+    embeddings = np.random.default_rng(seed).normal(size=(profiles * faces_per_profile, dimensions)).astype(np.float32)
+    face_ids = [f"face-{row}" for row in range(len(embeddings))]
+    profile_ids = [f"profile-{row // faces_per_profile}" for row in range(len(embeddings))]
+    return ConsentGallery(embeddings, face_ids, profile_ids)
+
+
+def random_queries(count: int = 7, dimensions: int = 16, seed: int = 1) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+
+@pytest.mark.parametrize("metric", DISTANCE_METRICS)
+def test_distances_match_deepface(metric):
+    gallery = random_gallery()
+    queries = random_queries()
+
+    expected = [
+        [verification.find_distance(query, row, metric) for row in gallery.embeddings]
+        for query in queries
+    ]
+
+    np.testing.assert_allclose(gallery.distances(queries, metric), expected, atol=1e-5)
+
+
+def test_distances_reject_other_sizes():
+    with pytest.raises(ValueError):
+        random_gallery().distances(random_queries(dimensions=8), "cosine")
+
+
+@pytest.mark.parametrize("metric", DISTANCE_METRICS)
+def test_nearest_finds_closest_face_and_closest_other_profile(metric):
+    gallery = random_gallery()
+    queries = random_queries()
+    distances = gallery.distances(queries, metric)
+
+    best_rows, best_distances, second_distances = gallery.nearest(queries, metric)
+
+    np.testing.assert_array_equal(best_rows, distances.argmin(axis=1))
+    np.testing.assert_allclose(best_distances, distances.min(axis=1))
+    for i, row in enumerate(best_rows):
+        other_profile = gallery.profile_ids != gallery.profile_ids[row]
+        assert second_distances[i] == pytest.approx(distances[i, other_profile].min())
+
+
+def test_match_applies_threshold():
+    gallery = random_gallery()
+    queries = gallery.embeddings[[0, 4]] + 0.01
+    queries[1] = -queries[1]
+
+    first, second = gallery.match(queries, "cosine", threshold=0.1)
+
+    assert first["consent_face_id"] == "face-0"
+    assert first["profile_id"] == "profile-0"
+    assert first["distance"] <= 0.1
+    assert first["second_distance"] > first["distance"]
+    assert first["threshold"] == 0.1
+    assert second is None
+
+
+def test_empty_gallery_matches_nothing():
+    gallery = ConsentGallery.from_embeddings_cache({"profiles": []})
+
+    best_rows, best_distances, second_distances = gallery.nearest(random_queries(count=3), "cosine")
+
+    assert gallery.size == 0
+    assert np.isinf(best_distances).all()
+    assert np.isinf(second_distances).all()
+    assert gallery.match(random_queries(count=3), "cosine", threshold=10.0) == [None, None, None]
+
+
+def test_single_profile_has_no_second_distance():
+    gallery = random_gallery(profiles=1, faces_per_profile=4)
+    queries = gallery.embeddings[:2]
+
+    matches = gallery.match(queries, "euclidean_l2", threshold=0.1)
+
+    assert [match["consent_face_id"] for match in matches] == ["face-0", "face-1"]
+    assert all(match["second_distance"] is None for match in matches)
+
+
+def test_from_embeddings_cache_skips_faces_of_other_sizes():
+    cache = {"profiles": [
+        {"profile_id": "a", "faces": [
+            {"consent_face_id": "a1", "embedding": [1.0, 0.0]},
+            {"consent_face_id": "a2", "embedding": None},
+        ]},
+        {"profile_id": "b", "faces": [
+            {"consent_face_id": "b1", "embedding": [0.0, 1.0, 0.0]},
+            {"consent_face_id": "b2", "embedding": [0.0, 1.0]},
+        ]},
+    ]}
+
+    gallery = ConsentGallery.from_embeddings_cache(cache)
+
+    assert gallery.face_ids.tolist() == ["a1", "b2"]
+    assert gallery.profile_ids.tolist() == ["a", "b"]
+    np.testing.assert_array_equal(gallery.profile_starts, [0, 1])
+
+
+def test_ivf_lists_partition_the_gallery():
+    gallery = random_gallery(profiles=50, faces_per_profile=4)
+
+    index = IVFIndex(gallery.normalized)
+
+    assert len(index.list_rows) == 14
+    np.testing.assert_array_equal(np.sort(np.concatenate(index.list_rows)), np.arange(gallery.size))
+
+
+@pytest.mark.parametrize("metric", DISTANCE_METRICS)
+def test_approximate_search_probing_every_list_is_exact(metric):
+    gallery = random_gallery(profiles=50, faces_per_profile=4)
+    queries = random_queries(count=20)
+    n_lists = len(gallery.get_index().list_rows)
+
+    exact_rows, exact_distances, _ = gallery.nearest(queries, metric, ann_min_size=0)
+    rows, distances, second_distances = gallery.nearest(queries, metric, ann_min_size=1, n_probe=n_lists)
+
+    np.testing.assert_array_equal(rows, exact_rows)
+    np.testing.assert_allclose(distances, exact_distances, atol=1e-5)
+    assert np.isinf(second_distances).all()
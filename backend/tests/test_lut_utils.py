@@ -0,0 +1,127 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.utils.lut_utils import CubeLut, apply_lut, parse_cube_lut
+
+LUT_DIR = Path(__file__).resolve().parent.parent / "luts"
+SHIPPED_LUTS = sorted(LUT_DIR.glob("*.cube"))
+
+
+def write_cube(path: Path, table: np.ndarray, header: str = "") -> Path:
+    """Write a table indexed [r, g, b] as a .cube file, red varying fastest."""
+    size = table.shape[0]
+    rows = table.transpose(2, 1, 0, 3).reshape(-1, 3)
+    lines = [header, f"LUT_3D_SIZE {size}"] + [" ".join(f"{v:.6f}" for v in row) for row in rows]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def lattice(size: int) -> np.ndarray:
+    """Identity table of a size, indexed [r, g, b]."""
+    axis = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    return np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1)
+
+
+def random_image(seed: int = 0, shape=(37, 53, 3)) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("path", SHIPPED_LUTS, ids=lambda path: path.name)
+def test_parses_shipped_luts(path):
+    lut = parse_cube_lut(str(path))
+
+    assert lut.title
+    assert lut.table.shape == (lut.size, lut.size, lut.size, 3)
+    assert np.isfinite(lut.table).all()
+
+
+@pytest.mark.parametrize("path", SHIPPED_LUTS, ids=lambda path: path.name)
+def test_identity_lut_of_shipped_size_leaves_image_unchanged(path):
+    shipped = parse_cube_lut(str(path))
+    identity = CubeLut("identity", lattice(shipped.size), shipped.domain_min, shipped.domain_max)
+    img = random_image()
+
+    assert np.array_equal(apply_lut(img, identity), img)
+
+
+def test_title_without_value_keeps_file_name(tmp_path):
+    path = write_cube(tmp_path / "untitled.cube", lattice(2), header="TITLE \t")
+
+    assert parse_cube_lut(str(path)).title == "untitled.cube"
+
+
+def test_title_is_unquoted(tmp_path):
+    path = write_cube(tmp_path / "titled.cube", lattice(2), header='TITLE "Rec 709"')
+
+    assert parse_cube_lut(str(path)).title == "Rec 709"
+
+
+def test_parse_keeps_red_fastest_order(tmp_path):
+    table = np.random.default_rng(1).random((3, 3, 3, 3), dtype=np.float32)
+    path = write_cube(tmp_path / "random.cube", table)
+
+    np.testing.assert_allclose(parse_cube_lut(str(path)).table, table, atol=1e-6)
+
+
+def test_rejects_wrong_entry_count(tmp_path):
+    path = tmp_path / "short.cube"
+    path.write_text("LUT_3D_SIZE 2\n0 0 0\n1 1 1\n")
+
+    with pytest.raises(ValueError):
+        parse_cube_lut(str(path))
+
+
+def test_rejects_1d_lut(tmp_path):
+    path = tmp_path / "curve.cube"
+    path.write_text("LUT_1D_SIZE 2\n0 0 0\n1 1 1\n")
+
+    with pytest.raises(ValueError):
+        parse_cube_lut(str(path))
+
+
+def test_channel_swap_works_on_bgr_images():
+    # Output RGB = input BGR, so a BGR image comes back with its channels reversed
+    table = lattice(5)[..., ::-1].copy()
+    lut = CubeLut("swap", table, np.zeros(3, np.float32), np.ones(3, np.float32))
+    img = random_image(2)
+
+    assert np.array_equal(apply_lut(img, lut), img[..., ::-1])
+
+
+def test_trilinear_interpolation_is_exact_for_affine_tables():
+    # Trilinear interpolation reproduces any affine map between lattice points
+    matrix = np.array([[0.5, 0.2, 0.1], [0.1, 0.6, 0.2], [0.0, 0.3, 0.4]], dtype=np.float32)
+    offset = np.array([0.05, 0.1, 0.2], dtype=np.float32)
+    lut = CubeLut("affine", lattice(4) @ matrix.T + offset, np.zeros(3, np.float32), np.ones(3, np.float32))
+    img = random_image(3)
+
+    rgb = img[..., ::-1].astype(np.float32) / 255.0
+    expected = (np.clip(rgb @ matrix.T + offset, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)[..., ::-1]
+
+    assert np.abs(apply_lut(img, lut).astype(int) - expected.astype(int)).max() <= 1
+
+
+def test_trilinear_interpolation_matches_hand_computed_value():
+    table = np.random.default_rng(4).random((2, 2, 2, 3), dtype=np.float32)
+    lut = CubeLut("random", table, np.zeros(3, np.float32), np.ones(3, np.float32))
+    r, g, b = 51, 102, 204
+    img = np.array([[[b, g, r]]], dtype=np.uint8)
+
+    fr, fg, fb = r / 255.0, g / 255.0, b / 255.0
+    expected = np.zeros(3)
+    for i, wr in ((0, 1 - fr), (1, fr)):
+        for j, wg in ((0, 1 - fg), (1, fg)):
+            for k, wb in ((0, 1 - fb), (1, fb)):
+                expected += wr * wg * wb * table[i, j, k]
+
+    graded = apply_lut(img, lut)[0, 0, ::-1]
+    assert np.abs(graded.astype(int) - np.round(expected * 255.0)).max() <= 1
+
+
+def test_grades_images_taller_than_one_chunk():
+    lut = CubeLut("identity", lattice(3), np.zeros(3, np.float32), np.ones(3, np.float32))
+    img = random_image(5, shape=(600, 7, 3))
+
+    assert np.array_equal(apply_lut(img, lut), img)
@@ -53,6 +53,7 @@ CREATE TABLE card_configs (
     card_id UUID NOT NULL REFERENCES cards(card_id) ON DELETE CASCADE,
     scene_sensitivity NUMERIC DEFAULT 0.2 CHECK (scene_sensitivity >= 0 AND scene_sensitivity <= 1),
     fallback_frame_rate INTEGER DEFAULT 6 CHECK (fallback_frame_rate > 0),
+    sampling_mode TEXT DEFAULT 'scene' CHECK (sampling_mode IN ('scene', 'keyframes', 'seek')),
     use_eq BOOLEAN DEFAULT TRUE,
     lut_file TEXT CHECK (
         lut_file IS NULL OR 
@@ -77,6 +78,15 @@ CREATE TABLE card_configs (
     refresh_database BOOLEAN DEFAULT TRUE,
     anti_spoofing BOOLEAN DEFAULT FALSE,
     detection_confidence_threshold NUMERIC DEFAULT 0.5 CHECK (detection_confidence_threshold >= 0 AND detection_confidence_threshold <= 1),
+    cascade_detector TEXT CHECK (cascade_detector IS NULL OR cascade_detector IN ('opencv', 'ssd', 'yunet')),
+    cascade_mode TEXT DEFAULT 'frame' CHECK (cascade_mode IN ('frame', 'regions')),
+    cascade_confidence_threshold NUMERIC DEFAULT 0.3 CHECK (cascade_confidence_threshold >= 0),
+    cascade_region_padding NUMERIC DEFAULT 0.5 CHECK (cascade_region_padding >= 0),
+    min_face_size INTEGER DEFAULT 24 CHECK (min_face_size >= 0),
+    min_face_sharpness NUMERIC DEFAULT 10 CHECK (min_face_sharpness >= 0),
+    min_face_brightness NUMERIC DEFAULT 30 CHECK (min_face_brightness >= 0 AND min_face_brightness <= 255),
+    max_face_brightness NUMERIC DEFAULT 235 CHECK (max_face_brightness >= 0 AND max_face_brightness <= 255),
+    max_face_yaw NUMERIC DEFAULT 60 CHECK (max_face_yaw >= 0 AND max_face_yaw <= 90),
     CONSTRAINT video_config_card_id_key UNIQUE (card_id),
     CONSTRAINT eq_lut_constraint CHECK ((use_eq = TRUE AND lut_file IS NULL) OR (use_eq = FALSE AND lut_file IS NOT NULL))
 );
@@ -109,7 +119,10 @@ CREATE TABLE frames (
     timestamp TEXT NOT NULL, -- Timecode format HH:MM:SS:FF
     raw_frame_image_path TEXT NOT NULL,
     processed_frame_image_path TEXT,
-    status TEXT CHECK (status IN ('queued', 'detecting_faces', 'detection_complete', 'recognition_complete', 'error'))
+    status TEXT CHECK (status IN ('queued', 'detecting_faces', 'detection_complete', 'recognition_complete', 'error')),
+    selection_reason TEXT CHECK (selection_reason IS NULL OR selection_reason IN ('scene', 'interval')),
+    filter_reason TEXT CHECK (filter_reason IS NULL OR filter_reason IN ('black', 'blank', 'no_skin')), -- Pre-detection filter that ruled out faces in this frame
+    duplicate_of_frame_id UUID REFERENCES frames(frame_id) ON DELETE CASCADE -- Representative frame this near-duplicate was skipped in favour of
 );
 
 -- Create detected_face table
@@ -119,7 +132,8 @@ CREATE TABLE detected_faces (
     confidence DOUBLE PRECISION CHECK (confidence >= 0 AND confidence <= 1),
     facial_area JSONB NOT NULL,
     face_embeddings JSONB,
-    status TEXT CHECK (status IN ('queued', 'matching_faces', 'matching_complete', 'error'))
+    quality JSONB,
+    status TEXT CHECK (status IN ('queued', 'matching_faces', 'matching_complete', 'low_quality', 'error'))
 );
 
 -- Create face_match table
@@ -128,6 +142,7 @@ CREATE TABLE face_matches (
     detection_id UUID NOT NULL REFERENCES detected_faces(detection_id) ON DELETE CASCADE,
     consent_face_id UUID NOT NULL REFERENCES consent_faces(consent_face_id) ON DELETE CASCADE,
     distance NUMERIC NOT NULL,
+    second_distance NUMERIC, -- Distance to the closest face of any other consent profile
     threshold NUMERIC NOT NULL,
     target_x INTEGER NOT NULL,
     target_y INTEGER NOT NULL,